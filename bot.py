@@ -13,9 +13,21 @@ from telegram.ext import (
     CallbackQueryHandler, 
     MessageHandler, 
     filters, 
-    ConversationHandler
+    ConversationHandler,
+    TypeHandler
+)
+from config import (
+    BOT_TOKEN, PRODUCTS_DIR, LOCATIONS_DIR, DB_NAME, ADMIN_ID, BOT_PASSWORD,
+    CONVERSATION_TIMEOUT, USER_STATE_IDLE_TIMEOUT, USER_STATE_MAX_USERS, PERSISTENCE_INTERVAL,
+    BACKUP_DIR, BACKUP_KEEP, MAINTENANCE_INTERVAL,
+    PAYMENT_PROVIDER, TRONGRID_API_KEY, PAYMENT_POLL_INTERVAL, PAYMENT_MATCH_WINDOW, PAYMENT_AMOUNT_TOLERANCE,
+    MEDIA_DIR, MEDIA_GC_INTERVAL, IMAGE_MAX_SIDE, IMAGE_QUALITY, IMAGE_WORKERS,
+    LOCATION_LOW_WATERMARK, LOCATION_HIGH_WATERMARK, LOCATION_DIGEST_INTERVAL,
+    GAME_SESSION_TTL, GAME_SESSION_PURGE_INTERVAL,
+    GAME_SERVER_HOST, GAME_SERVER_PORT, COUPON_SWEEP_INTERVAL,
+    METRICS_HOST, METRICS_PORT,
+    QUERY_PROFILING, SLOW_QUERY_MS, QUERY_EXPLAIN_INTERVAL
 )
-from config import BOT_TOKEN, PRODUCTS_DIR, LOCATIONS_DIR, DB_NAME, ADMIN_ID, BOT_PASSWORD
 from handlers.admin.products import (
     handle_product_name,
     handle_product_description,
@@ -35,6 +47,8 @@ from handlers.menu import verify_password
 from handlers.admin.wallets import handle_wallet_input
 from handlers.admin.locations import handle_location_photo
 from handlers.user.cart import handle_discount_code
+from handlers.admin.payments import build_user_notification
+from handlers.admin.stats import show_latency_stats, show_slow_queries
 from handlers import (
     manage_products,
     manage_users,
@@ -64,8 +78,22 @@ from handlers import (
     show_main_menu,
     get_main_menu_keyboard
 )
-from database import Database
+from database import Database, SQLitePersistence, DatabaseMaintenance
+from database.location_pool import set_watermarks, get_location_counts, drain_pool_alerts
+from database.game_sessions import set_session_ttl
+from database.query_profiler import set_query_profiling
 from states import *
+from utils.user_state import user_states, evict_stale_user_data
+from utils.message_manager import message_tracker
+from utils.notification_dispatcher import notification_dispatcher
+from utils.chain_providers import create_provider
+from utils.payment_watcher import PaymentWatcher
+from utils.media_store import media_store
+from utils.image_pipeline import image_pipeline
+from utils.campaign_runner import campaign_runner
+from utils.static_server import StaticServer
+from utils.score_ingestor import score_ingestor
+from utils.metrics import metrics, instrument_handlers, instrument_methods, TimedRequest, MetricsServer
 
 os.makedirs('logs', exist_ok=True)
 
@@ -83,6 +111,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Yavaş sorgu kaydı ayrı bir dönen dosyaya da yazılır
+slow_query_handler = RotatingFileHandler('logs/slow_queries.log', maxBytes=5 * 1024 * 1024, backupCount=3)
+slow_query_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+logging.getLogger('database.slow_queries').addHandler(slow_query_handler)
+
 logging.getLogger('telegram').setLevel(logging.WARNING)  # Telegram kütüphanesi için 
 logging.getLogger('handlers.user.games').setLevel(logging.INFO)  # Oyun modülü için
 logging.getLogger('handlers.admin.payments').setLevel(logging.INFO)  # Ödemeler modülü için
@@ -93,7 +126,11 @@ for handler_name in ['products', 'users', 'orders', 'payments', 'locations']:
     logging.getLogger(f'handlers.user.{handler_name}').setLevel(logging.INFO)
 
 
+set_query_profiling(QUERY_PROFILING, SLOW_QUERY_MS, QUERY_EXPLAIN_INTERVAL)
+# Database metotları sorgu adına göre süre ölçümüyle sarılır (tüm modüllerdeki örnekler dahil)
+instrument_methods(Database)
 db = Database(DB_NAME)
+maintenance = DatabaseMaintenance(DB_NAME, backup_dir=BACKUP_DIR, keep=BACKUP_KEEP)
 application = None
 tasks = []
 
@@ -124,24 +161,33 @@ async def start_monitoring():
             return
 
 async def start_locations_monitoring():
+    # Sayılar ilk yüklemede ve konum eklendikçe/teslim edildikçe güncellenir;
+    # eşik geçişleri toplanıp tek bir özet mesajla gönderilir
+    set_watermarks(LOCATION_LOW_WATERMARK, LOCATION_HIGH_WATERMARK)
+    get_location_counts(db)
     while True:
         try:
-            products = db.get_products()
-            
-            for product in products:
-                product_id = product[0]
-                product_name = product[1]
-                
-                available_locations = db.get_available_location_count(product_id)
-                
-                if available_locations < 3:
-                    await application.bot.send_message(
-                        chat_id=ADMIN_ID,
-                        text=f"⚠️ Konum Havuzu Uyarısı!\n\n"
-                             f"Ürün: {product_name}\n"
-                             f"Müsait konum sayısı: {available_locations}\n\n"
-                             f"Bu ürün için yeni konumlar eklemeniz önerilir."
-                    )
+            # Ürün eklenip silindiyse sayılar yeniden yüklenir
+            get_location_counts(db)
+            alerts = drain_pool_alerts()
+            if alerts:
+                low = [a for a in alerts if a.kind == 'low']
+                recovered = [a for a in alerts if a.kind == 'recovered']
+                text = "📍 Konum Havuzu Özeti\n"
+                if low:
+                    text += "\n⚠️ Azalan konumlar:\n"
+                    for alert in sorted(low, key=lambda a: a.count):
+                        product = db.get_product(alert.product_id)
+                        name = product[1] if product else f"#{alert.product_id}"
+                        text += f"• {name}: {alert.count} müsait konum\n"
+                    text += "\nBu ürünler için yeni konumlar eklemeniz önerilir.\n"
+                if recovered:
+                    text += "\n✅ Yeterli seviyeye dönenler:\n"
+                    for alert in recovered:
+                        product = db.get_product(alert.product_id)
+                        name = product[1] if product else f"#{alert.product_id}"
+                        text += f"• {name}: {alert.count} müsait konum\n"
+                await application.bot.send_message(chat_id=ADMIN_ID, text=text)
         except asyncio.CancelledError:
             logger.info("Konum monitoring görevi iptal edildi")
             return
@@ -149,11 +195,193 @@ async def start_locations_monitoring():
             logger.error(f"Error in location pool monitoring: {e}")
         
         try:
-            await asyncio.sleep(12 * 60 * 60)
+            await asyncio.sleep(LOCATION_DIGEST_INTERVAL)
         except asyncio.CancelledError:
             logger.info("Konum monitoring görevi uyku sırasında iptal edildi")
             return
 
+async def touch_user_state(update: Update, context):
+    if update.effective_user:
+        user_states.touch(update.effective_user.id)
+
+async def start_user_state_cleanup():
+    while True:
+        try:
+            await asyncio.sleep(10 * 60)
+        except asyncio.CancelledError:
+            logger.info("Kullanıcı durumu temizleme görevi uyku sırasında iptal edildi")
+            return
+        
+        try:
+            evicted, dropped = evict_stale_user_data(application, user_states, message_tracker)
+            if evicted or dropped:
+                logger.info(f"User state cleanup: {evicted} idle records evicted, {dropped} user_data entries dropped")
+        except asyncio.CancelledError:
+            logger.info("Kullanıcı durumu temizleme görevi iptal edildi")
+            return
+        except Exception as e:
+            logger.error(f"Error in user state cleanup: {e}")
+
+async def start_maintenance():
+    while True:
+        try:
+            # Yedek, vacuum ve optimize ayrı thread'de; bot çalışmaya devam eder
+            result = await asyncio.to_thread(maintenance.run_all)
+            logger.info(
+                f"Database maintenance done: backup={result['backup']}, "
+                f"released_pages={result['released_pages']}, size={result['size_mb']:.2f} MB"
+            )
+            if result['backup'] is None:
+                await application.bot.send_message(
+                    chat_id=ADMIN_ID,
+                    text="⚠️ Veritabanı yedeği alınamadı! Lütfen logları kontrol edin."
+                )
+        except asyncio.CancelledError:
+            logger.info("Bakım görevi iptal edildi")
+            return
+        except Exception as e:
+            logger.error(f"Error in database maintenance: {e}")
+        
+        try:
+            await asyncio.sleep(MAINTENANCE_INTERVAL)
+        except asyncio.CancelledError:
+            logger.info("Bakım görevi uyku sırasında iptal edildi")
+            return
+
+async def start_notification_dispatcher():
+    try:
+        # Onay/red bildirimleri outbox tablosundan gönderilir
+        await notification_dispatcher.run(application.bot, db.outbox)
+    except asyncio.CancelledError:
+        logger.info("Bildirim gönderim görevi iptal edildi")
+    except Exception as e:
+        logger.error(f"Error in notification dispatcher: {e}")
+
+async def notify_admin_payment(result, tx_id, amount):
+    if result.ok:
+        text = (f"🤖 Ödeme otomatik eşleşti!\n\n"
+                f"🛍️ Sipariş #{result.request_id} onaylandı\n"
+                f"💰 Tutar: {amount} USDT\n"
+                f"🔗 TX: {tx_id}")
+    else:
+        text = (f"⚠️ Ödeme geldi ama sipariş tamamlanamadı!\n\n"
+                f"🛍️ Sipariş #{result.request_id}\n"
+                f"💰 Tutar: {amount} USDT\n"
+                f"🔗 TX: {tx_id}\n"
+                f"❗️ Sebep: {result.reason}\n\n"
+                f"Lütfen siparişi manuel olarak kontrol edin.")
+    await application.bot.send_message(chat_id=ADMIN_ID, text=text)
+
+async def start_payment_watcher():
+    provider = create_provider(PAYMENT_PROVIDER, TRONGRID_API_KEY)
+    if provider is None:
+        logger.info("Otomatik ödeme eşleştirme kapalı (PAYMENT_PROVIDER ayarlanmamış)")
+        return
+    watcher = PaymentWatcher(
+        provider,
+        interval=PAYMENT_POLL_INTERVAL,
+        window=PAYMENT_MATCH_WINDOW,
+        tolerance=PAYMENT_AMOUNT_TOLERANCE,
+        notify=build_user_notification,
+        on_result=notify_admin_payment
+    )
+    try:
+        await watcher.run(db, on_cycle=notification_dispatcher.wake)
+    except asyncio.CancelledError:
+        logger.info("Ödeme izleme görevi iptal edildi")
+    except Exception as e:
+        logger.error(f"Error in payment watcher: {e}")
+
+async def start_media_gc():
+    while True:
+        try:
+            await asyncio.sleep(MEDIA_GC_INTERVAL)
+        except asyncio.CancelledError:
+            logger.info("Medya temizleme görevi uyku sırasında iptal edildi")
+            return
+        
+        try:
+            result = await media_store.collect_garbage(db)
+            logger.info(f"Media GC done: {result}")
+        except asyncio.CancelledError:
+            logger.info("Medya temizleme görevi iptal edildi")
+            return
+        except Exception as e:
+            logger.error(f"Error in media garbage collection: {e}")
+
+async def start_game_session_purge():
+    while True:
+        try:
+            await asyncio.sleep(GAME_SESSION_PURGE_INTERVAL)
+        except asyncio.CancelledError:
+            logger.info("Oyun oturumu temizleme görevi uyku sırasında iptal edildi")
+            return
+        
+        try:
+            purged = db.game_sessions.purge()
+            if purged:
+                logger.info(f"Purged {purged} used or expired game sessions")
+        except asyncio.CancelledError:
+            logger.info("Oyun oturumu temizleme görevi iptal edildi")
+            return
+        except Exception as e:
+            logger.error(f"Error purging game sessions: {e}")
+
+async def start_coupon_sweeper():
+    while True:
+        try:
+            await asyncio.sleep(COUPON_SWEEP_INTERVAL)
+        except asyncio.CancelledError:
+            logger.info("Kupon süpürme görevi uyku sırasında iptal edildi")
+            return
+        
+        try:
+            retired = db.coupons.sweep()
+            if retired:
+                logger.info(f"Retired {retired} expired discount coupons")
+        except asyncio.CancelledError:
+            logger.info("Kupon süpürme görevi iptal edildi")
+            return
+        except Exception as e:
+            logger.error(f"Error sweeping coupons: {e}")
+
+async def start_campaign_resume():
+    try:
+        # Yeniden başlatma yüzünden yarım kalan toplu bildirimler kaldığı yerden devam eder
+        await campaign_runner.resume(application.bot, db, ADMIN_ID)
+    except asyncio.CancelledError:
+        logger.info("Toplu bildirim devam görevi iptal edildi")
+    except Exception as e:
+        logger.error(f"Error resuming campaigns: {e}")
+
+async def start_game_server():
+    if not GAME_SERVER_PORT:
+        logger.info("Oyun sunucusu kapalı (GAME_SERVER_PORT ayarlanmamış)")
+        return
+    server = StaticServer('Static', GAME_SERVER_HOST, GAME_SERVER_PORT)
+    try:
+        await server.serve_forever()
+    except asyncio.CancelledError:
+        logger.info("Oyun sunucusu görevi iptal edildi")
+    except Exception as e:
+        logger.error(f"Error in game server: {e}")
+    finally:
+        await server.stop()
+
+async def start_metrics_server():
+    if not METRICS_PORT:
+        logger.info("Metrik uç noktası kapalı (METRICS_PORT ayarlanmamış)")
+        return
+    server = MetricsServer(METRICS_HOST, METRICS_PORT)
+    try:
+        await server.serve_forever()
+    except asyncio.CancelledError:
+        logger.info("Metrik sunucusu görevi iptal edildi")
+    except Exception as e:
+        logger.error(f"Error in metrics server: {e}")
+    finally:
+        await server.stop()
+
 async def start_game_monitoring():
     try:
         from handlers.user.games import schedule_monthly_reset
@@ -178,7 +406,13 @@ async def handle_shutdown():
         await asyncio.gather(*tasks, return_exceptions=True)
         logger.info("All tasks have been properly canceled")
 
+    image_pipeline.shutdown()
+
     if db:
+        try:
+            db.conn.execute("PRAGMA optimize")
+        except Exception as e:
+            logger.error(f"Error optimizing database on shutdown: {e}")
         db.close()
         logger.info("Database connection closed")
 
@@ -218,18 +452,41 @@ if __name__ == '__main__':
         
         os.makedirs(LOCATIONS_DIR, exist_ok=True)
         logger.info(f"Locations directory ensured at {LOCATIONS_DIR}")
+        
+        # Yeni görseller medya deposuna yazılır; eski klasörler GC tarafından taranır
+        media_store.root = MEDIA_DIR
+        media_store.legacy_dirs = (PRODUCTS_DIR, LOCATIONS_DIR)
+        os.makedirs(MEDIA_DIR, exist_ok=True)
+        image_pipeline.max_side = IMAGE_MAX_SIDE
+        image_pipeline.quality = IMAGE_QUALITY
+        image_pipeline.workers = IMAGE_WORKERS
+        set_session_ttl(GAME_SESSION_TTL)
+        
+        # Bot polling başlamadan önce tek seferlik: boş sayfalar artık parça parça geri kazanılır
+        if maintenance.enable_incremental_vacuum():
+            logger.info("Incremental auto-vacuum enabled")
 
         application = (
             Application.builder()
             .token(BOT_TOKEN)
-            .connect_timeout(30.0)
-            .read_timeout(30.0)
-            .write_timeout(30.0)
-            .pool_timeout(30.0)
+            # Bot API çağrıları yöntem adına göre ölçülür
+            .request(TimedRequest(
+                connection_pool_size=256,
+                connect_timeout=30.0,
+                read_timeout=30.0,
+                write_timeout=30.0,
+                pool_timeout=30.0
+            ))
+            .persistence(SQLitePersistence(DB_NAME, state_store=user_states, update_interval=PERSISTENCE_INTERVAL))
             .build()
         )
         logger.info("Bot application initialized")
         
+        user_states.idle_timeout = USER_STATE_IDLE_TIMEOUT
+        user_states.max_users = USER_STATE_MAX_USERS
+        # Her güncellemede kullanıcının son aktivite zamanını işaretle
+        application.add_handler(TypeHandler(Update, touch_user_state), group=-1)
+        
         conv_handler = ConversationHandler(
             entry_points=[
                 CommandHandler('start', start),
@@ -248,7 +505,10 @@ if __name__ == '__main__':
                 EDIT_PRICE: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_edit_price)],
                 CART_QUANTITY: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_cart_quantity)],
                 BROADCAST_MESSAGE: [MessageHandler(filters.TEXT & ~filters.COMMAND, send_broadcast)],
-                WALLET_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_wallet_input)],
+                WALLET_INPUT: [
+                    MessageHandler(filters.TEXT & ~filters.COMMAND, handle_wallet_input),
+                    MessageHandler(filters.Document.ALL, handle_wallet_input)
+                ],
                 CATEGORY_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_category_name)],
                 CATEGORY_DESCRIPTION: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_category_description)],
                 STOCK_CHANGE: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_stock_input)],
@@ -262,9 +522,17 @@ if __name__ == '__main__':
             ],
             per_message=False,
             per_chat=True,
-            per_user=True
+            per_user=True,
+            conversation_timeout=CONVERSATION_TIMEOUT,
+            name='main_conversation',
+            persistent=True
         )
         application.add_handler(conv_handler)
+        application.add_handler(CommandHandler('perf', show_latency_stats))
+        application.add_handler(CommandHandler('slowq', show_slow_queries))
+        instrument_handlers(application)
+        metrics.gauge('bot_update_queue_depth', 'Updates waiting to be processed', application.update_queue.qsize)
+        metrics.gauge('score_ingestor_pending', 'Game scores waiting for the next batch commit', lambda: score_ingestor.pending)
         logger.info("Handlers added to application")
         
         loop = asyncio.get_event_loop()
@@ -281,6 +549,46 @@ if __name__ == '__main__':
         game_monitoring_task = loop.create_task(start_game_monitoring())
         tasks.append(game_monitoring_task)
         
+        user_state_task = loop.create_task(start_user_state_cleanup())
+        user_state_task.set_name("User-State-Cleanup")
+        tasks.append(user_state_task)
+        
+        maintenance_task = loop.create_task(start_maintenance())
+        maintenance_task.set_name("Database-Maintenance")
+        tasks.append(maintenance_task)
+        
+        notification_task = loop.create_task(start_notification_dispatcher())
+        notification_task.set_name("Notification-Dispatcher")
+        tasks.append(notification_task)
+        
+        payment_watcher_task = loop.create_task(start_payment_watcher())
+        payment_watcher_task.set_name("Payment-Watcher")
+        tasks.append(payment_watcher_task)
+        
+        media_gc_task = loop.create_task(start_media_gc())
+        media_gc_task.set_name("Media-GC")
+        tasks.append(media_gc_task)
+        
+        game_session_task = loop.create_task(start_game_session_purge())
+        game_session_task.set_name("Game-Session-Purge")
+        tasks.append(game_session_task)
+        
+        coupon_task = loop.create_task(start_coupon_sweeper())
+        coupon_task.set_name("Coupon-Sweeper")
+        tasks.append(coupon_task)
+        
+        campaign_task = loop.create_task(start_campaign_resume())
+        campaign_task.set_name("Campaign-Resume")
+        tasks.append(campaign_task)
+        
+        game_server_task = loop.create_task(start_game_server())
+        game_server_task.set_name("Game-Server")
+        tasks.append(game_server_task)
+        
+        metrics_task = loop.create_task(start_metrics_server())
+        metrics_task.set_name("Metrics-Server")
+        tasks.append(metrics_task)
+        
         loop.create_task(setup_signal_handlers())
         
         logger.info("Monitoring tasks started")
@@ -38,4 +38,58 @@ logger.info(f"Configuration loaded:")
 logger.info(f"- Admin ID: {ADMIN_ID}")
 logger.info(f"- Database: {DB_NAME}")
 logger.info(f"- Products directory: {PRODUCTS_DIR}")
-logger.info(f"- Locations directory: {LOCATIONS_DIR}")
\ No newline at end of file
+logger.info(f"- Locations directory: {LOCATIONS_DIR}")
+# Konuşma ve kullanıcı durumu zaman aşımları (saniye)
+CONVERSATION_TIMEOUT = int(os.getenv('CONVERSATION_TIMEOUT', 30 * 60))
+USER_STATE_IDLE_TIMEOUT = int(os.getenv('USER_STATE_IDLE_TIMEOUT', 6 * 60 * 60))
+USER_STATE_MAX_USERS = int(os.getenv('USER_STATE_MAX_USERS', 10000))
+
+# Kalıcı durumun veritabanına toplu yazılma aralığı (saniye)
+PERSISTENCE_INTERVAL = int(os.getenv('PERSISTENCE_INTERVAL', 60))
+
+# Veritabanı bakımı: yedek klasörü, saklanacak yedek sayısı ve bakım aralığı (saniye)
+BACKUP_DIR = os.getenv('BACKUP_DIR', 'backups')
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', 7))
+MAINTENANCE_INTERVAL = int(os.getenv('MAINTENANCE_INTERVAL', 24 * 60 * 60))
+
+# Otomatik ödeme eşleştirme: sağlayıcı ('trongrid', 'fake' veya boş = kapalı)
+PAYMENT_PROVIDER = os.getenv('PAYMENT_PROVIDER', '')
+TRONGRID_API_KEY = os.getenv('TRONGRID_API_KEY')
+PAYMENT_POLL_INTERVAL = int(os.getenv('PAYMENT_POLL_INTERVAL', 60))
+PAYMENT_MATCH_WINDOW = int(os.getenv('PAYMENT_MATCH_WINDOW', 24 * 60 * 60))
+PAYMENT_AMOUNT_TOLERANCE = float(os.getenv('PAYMENT_AMOUNT_TOLERANCE', 0.01))
+
+# İçerik adresli medya deposu ve çöp toplama aralığı (saniye)
+MEDIA_DIR = os.getenv('MEDIA_DIR', 'media')
+MEDIA_GC_INTERVAL = int(os.getenv('MEDIA_GC_INTERVAL', 60 * 60))
+
+# Yüklenen görsellerin normalleştirilmesi: en uzun kenar (px), JPEG kalitesi, işlem sayısı
+IMAGE_MAX_SIDE = int(os.getenv('IMAGE_MAX_SIDE', 1280))
+IMAGE_QUALITY = int(os.getenv('IMAGE_QUALITY', 85))
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
+# Konum havuzu uyarıları: alt/üst eşik (histerezis) ve özet gönderim aralığı (saniye)
+LOCATION_LOW_WATERMARK = int(os.getenv('LOCATION_LOW_WATERMARK', 3))
+LOCATION_HIGH_WATERMARK = int(os.getenv('LOCATION_HIGH_WATERMARK', 6))
+LOCATION_DIGEST_INTERVAL = int(os.getenv('LOCATION_DIGEST_INTERVAL', 5 * 60))
+
+# Oyun oturumlarının geçerlilik süresi ve süresi dolanların temizlenme aralığı (saniye)
+GAME_SESSION_TTL = int(os.getenv('GAME_SESSION_TTL', 2 * 60 * 60))
+GAME_SESSION_PURGE_INTERVAL = int(os.getenv('GAME_SESSION_PURGE_INTERVAL', 30 * 60))
+
+# Oyun sayfasını bot içinden sunan sunucu (0 = kapalı) ve oyunun herkese açık adresi (https)
+GAME_SERVER_HOST = os.getenv('GAME_SERVER_HOST', '0.0.0.0')
+GAME_SERVER_PORT = int(os.getenv('GAME_SERVER_PORT', 0))
+GAME_BASE_URL = os.getenv('GAME_BASE_URL', 'https://mmeekh.github.io/dened/Static').rstrip('/')
+
+# Süresi dolan indirim kuponlarının kapatılma aralığı (saniye)
+COUPON_SWEEP_INTERVAL = int(os.getenv('COUPON_SWEEP_INTERVAL', 60 * 60))
+
+# Yerel Prometheus /metrics uç noktası (0 = kapalı)
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+
+# Sorgu profili (1 = açık): eşiği aşan sorgular logs/slow_queries.log'a planlarıyla yazılır
+QUERY_PROFILING = os.getenv('QUERY_PROFILING', '0') == '1'
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 50))
+QUERY_EXPLAIN_INTERVAL = int(os.getenv('QUERY_EXPLAIN_INTERVAL', 5 * 60))
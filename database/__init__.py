@@ -5,5 +5,18 @@ from .orders import OrdersDB
 from .wallets import WalletsDB
 from .payments import PaymentsDB
 from .stats import StatsDB
+from .cart import CartDB
+from .archive import ArchiveDB
+from .outbox import OutboxDB, OutboxMessage
+from .chain_payments import ChainPaymentsDB
+from .media import MediaDB
+from .scores import ScoresDB
+from .game_quota import GameQuotaDB
+from .game_sessions import GameSessionsDB
+from .campaigns import CampaignsDB
+from .wallet_dashboard import WalletDashboardDB
+from .coupons import CouponsDB
+from .maintenance import DatabaseMaintenance
+from .persistence import SQLitePersistence
 
-__all__ = ['Database', 'ProductsDB', 'UsersDB', 'OrdersDB', 'WalletsDB', 'PaymentsDB', 'StatsDB']
\ No newline at end of file
+__all__ = ['Database', 'ProductsDB', 'UsersDB', 'OrdersDB', 'WalletsDB', 'PaymentsDB', 'StatsDB', 'CartDB', 'ArchiveDB', 'OutboxDB', 'OutboxMessage', 'ChainPaymentsDB', 'MediaDB', 'ScoresDB', 'GameQuotaDB', 'GameSessionsDB', 'CampaignsDB', 'WalletDashboardDB', 'CouponsDB', 'DatabaseMaintenance', 'SQLitePersistence']
\ No newline at end of file
@@ -0,0 +1,154 @@
+from typing import Optional, List, Dict, Any, TYPE_CHECKING
+import os
+import json
+import zlib
+import logging
+
+if TYPE_CHECKING:
+    from .core import Database
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_ALIAS = 'archive'
+
+# Sıcak tablo ile arşivin ortak kolonları
+ORDER_COLUMNS = 'id, user_id, total_amount, wallet, status, created_at, updated_at, discount_percent'
+
+
+def archive_path_for(db_name: str) -> str:
+    """shop.db -> shop_archive.db"""
+    base, ext = os.path.splitext(db_name)
+    return f"{base}_archive{ext or '.db'}"
+
+
+def attach_archive(conn, db_name: str) -> bool:
+    """
+    Attach the archive DB and create TEMP views that union hot and archived orders
+
+    all_purchase_requests always exists; if the archive cannot be attached it
+    only covers the hot table.
+    """
+    attached = False
+    try:
+        attached_names = [row[1] for row in conn.execute("PRAGMA database_list").fetchall()]
+        if ARCHIVE_ALIAS not in attached_names:
+            conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_ALIAS}", (archive_path_for(db_name),))
+        conn.execute(f'''CREATE TABLE IF NOT EXISTS {ARCHIVE_ALIAS}.archived_orders (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            total_amount REAL NOT NULL,
+            wallet TEXT,
+            status TEXT,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP,
+            discount_percent INTEGER DEFAULT 0,
+            items BLOB,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+        conn.execute(f'''CREATE INDEX IF NOT EXISTS {ARCHIVE_ALIAS}.idx_archived_orders_created
+            ON archived_orders (created_at)''')
+        # Kullanıcı ve cüzdan istatistikleri all_purchase_requests üzerinden bu kolonlarla süzülür
+        conn.execute(f'''CREATE INDEX IF NOT EXISTS {ARCHIVE_ALIAS}.idx_archived_orders_user
+            ON archived_orders (user_id)''')
+        conn.execute(f'''CREATE INDEX IF NOT EXISTS {ARCHIVE_ALIAS}.idx_archived_orders_wallet
+            ON archived_orders (wallet)''')
+        attached = True
+    except Exception as e:
+        logger.error(f"Error attaching order archive: {e}")
+
+    conn.execute("DROP VIEW IF EXISTS temp.all_purchase_requests")
+    if attached:
+        conn.execute(f'''CREATE TEMP VIEW all_purchase_requests AS
+            SELECT {ORDER_COLUMNS} FROM main.purchase_requests
+            UNION ALL
+            SELECT {ORDER_COLUMNS} FROM {ARCHIVE_ALIAS}.archived_orders''')
+    else:
+        conn.execute(f'''CREATE TEMP VIEW all_purchase_requests AS
+            SELECT {ORDER_COLUMNS} FROM main.purchase_requests''')
+    conn.commit()
+    return attached
+
+
+def compress_items(items: List[Dict[str, Any]]) -> bytes:
+    return zlib.compress(json.dumps(items, separators=(',', ':')).encode('utf-8'), 9)
+
+
+def decompress_items(blob: Optional[bytes]) -> List[Dict[str, Any]]:
+    if not blob:
+        return []
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+def archive_orders(conn, order_ids: List[int]) -> int:
+    """
+    Copy orders and their compressed items into the archive
+
+    Must run inside the caller's transaction, before the hot rows are deleted.
+    Already archived orders are skipped, so a resumed batch is safe to repeat.
+    """
+    if not order_ids:
+        return 0
+    placeholders = ','.join('?' * len(order_ids))
+
+    items_by_order: Dict[int, List[Dict[str, Any]]] = {}
+    for request_id, product_id, quantity, price in conn.execute(
+        f"""SELECT request_id, product_id, quantity, price
+            FROM purchase_request_items WHERE request_id IN ({placeholders})""",
+        order_ids
+    ):
+        items_by_order.setdefault(request_id, []).append(
+            {'product_id': product_id, 'quantity': quantity, 'price': price}
+        )
+
+    orders = conn.execute(
+        f"SELECT {ORDER_COLUMNS} FROM purchase_requests WHERE id IN ({placeholders})",
+        order_ids
+    ).fetchall()
+    conn.executemany(
+        f"""INSERT OR IGNORE INTO {ARCHIVE_ALIAS}.archived_orders
+            ({ORDER_COLUMNS}, items) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        [order + (compress_items(items_by_order.get(order[0], [])),) for order in orders]
+    )
+    return len(orders)
+
+
+class ArchiveDB:
+    def __init__(self, db: 'Database'):
+        self.db = db
+
+    def get_archived_order(self, order_id: int) -> Optional[Dict[str, Any]]:
+        """Get an archived order with its decompressed items"""
+        try:
+            row = self.db.conn.execute(
+                f"""SELECT {ORDER_COLUMNS}, items, archived_at
+                    FROM {ARCHIVE_ALIAS}.archived_orders WHERE id = ?""",
+                (order_id,)
+            ).fetchone()
+            if not row:
+                return None
+            keys = [column.strip() for column in ORDER_COLUMNS.split(',')]
+            order = dict(zip(keys, row[:len(keys)]))
+            order['items'] = decompress_items(row[len(keys)])
+            order['archived_at'] = row[len(keys) + 1]
+            return order
+        except Exception as e:
+            logger.error(f"Error getting archived order: {e}")
+            return None
+
+    def get_archive_summary(self) -> Dict[str, Any]:
+        """Get archived order count, volume and date range"""
+        try:
+            row = self.db.conn.execute(f"""
+                SELECT COUNT(*), COALESCE(SUM(CASE WHEN status = 'completed' THEN total_amount END), 0),
+                       MIN(created_at), MAX(created_at)
+                FROM {ARCHIVE_ALIAS}.archived_orders
+            """).fetchone()
+            return {
+                'archived_orders': row[0],
+                'archived_revenue': row[1],
+                'oldest': row[2],
+                'newest': row[3]
+            }
+        except Exception as e:
+            logger.error(f"Error getting archive summary: {e}")
+            return {'archived_orders': 0, 'archived_revenue': 0, 'oldest': None, 'newest': None}
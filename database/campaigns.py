@@ -0,0 +1,174 @@
+from typing import Optional, List, Dict, Any, Iterable, Tuple, TYPE_CHECKING
+import json
+import logging
+
+from .transaction import begin_transaction
+
+if TYPE_CHECKING:
+    from .core import Database
+
+logger = logging.getLogger(__name__)
+
+
+class CampaignsDB:
+    """
+    Bulk announcements with a delivery row per recipient
+
+    Delivery rows are the checkpoint: a recipient is marked 'sending' before
+    its message goes out and gets its result right after, so a restarted
+    campaign only sends to recipients that are still pending. A campaign key
+    can only be created once so a scheduler firing twice does not send it twice.
+    """
+
+    def __init__(self, db: 'Database'):
+        self.db = db
+
+    def setup(self):
+        """Create the campaign tables"""
+        cur = self.db.cur
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS campaigns (
+            key TEXT PRIMARY KEY,
+            text TEXT NOT NULL,
+            reply_markup TEXT,
+            status TEXT DEFAULT 'running',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+        ''')
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS campaign_deliveries (
+            campaign_key TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            status TEXT DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            last_error TEXT,
+            PRIMARY KEY (campaign_key, user_id)
+        ) WITHOUT ROWID
+        ''')
+
+    def create(self, key: str, text: str, reply_markup: Optional[Dict[str, Any]],
+               user_ids: Iterable[int]) -> bool:
+        """Register a campaign and its recipients; False if the key already exists"""
+        conn = self.db.conn
+        try:
+            if not begin_transaction(conn):
+                return False
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO campaigns (key, text, reply_markup) VALUES (?, ?, ?)",
+                (key, text, json.dumps(reply_markup) if reply_markup else None)
+            )
+            if cur.rowcount == 0:
+                conn.rollback()
+                return False
+            conn.executemany(
+                "INSERT OR IGNORE INTO campaign_deliveries (campaign_key, user_id) VALUES (?, ?)",
+                ((key, user_id) for user_id in set(user_ids))
+            )
+            conn.commit()
+            return True
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error creating campaign {key}: {e}")
+            return False
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self.db.conn.execute(
+            "SELECT key, text, reply_markup, status FROM campaigns WHERE key = ?", (key,)
+        ).fetchone()
+        if not row:
+            return None
+        return {
+            'key': row[0],
+            'text': row[1],
+            'reply_markup': json.loads(row[2]) if row[2] else None,
+            'status': row[3]
+        }
+
+    def get_running(self) -> List[str]:
+        """Campaigns interrupted before finishing (e.g. by a restart)"""
+        rows = self.db.conn.execute(
+            "SELECT key FROM campaigns WHERE status = 'running' ORDER BY created_at"
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_pending(self, key: str, after_user_id: int, limit: int, max_attempts: int) -> List[int]:
+        """Next recipients still waiting for delivery, in user_id order"""
+        rows = self.db.conn.execute(
+            """SELECT user_id FROM campaign_deliveries
+               WHERE campaign_key = ? AND user_id > ? AND status = 'pending' AND attempts < ?
+               ORDER BY user_id
+               LIMIT ?""",
+            (key, after_user_id, max_attempts, limit)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def mark_sending(self, key: str, user_ids: List[int]):
+        """Mark recipients as being sent to, before their messages go out"""
+        conn = self.db.conn
+        try:
+            conn.executemany(
+                "UPDATE campaign_deliveries SET status = 'sending' WHERE campaign_key = ? AND user_id = ?",
+                ((key, user_id) for user_id in user_ids)
+            )
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error marking campaign {key} deliveries: {e}")
+            raise
+
+    def record(self, key: str, user_id: int, status: str, error: Optional[str] = None):
+        """Store one delivery result as soon as its send returns"""
+        conn = self.db.conn
+        try:
+            conn.execute(
+                """UPDATE campaign_deliveries
+                   SET status = ?, attempts = attempts + 1, last_error = ?
+                   WHERE campaign_key = ? AND user_id = ?""",
+                (status, error, key, user_id)
+            )
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error saving campaign {key} delivery to {user_id}: {e}")
+
+    def recover(self, key: str) -> int:
+        """
+        Settle recipients left in 'sending' by a crash
+
+        Their message may or may not have gone out, so they are not sent
+        again (at most once) and are counted as 'unknown'.
+        """
+        conn = self.db.conn
+        cur = conn.execute(
+            """UPDATE campaign_deliveries SET status = 'unknown', last_error = 'interrupted while sending'
+               WHERE campaign_key = ? AND status = 'sending'""",
+            (key,)
+        )
+        conn.commit()
+        return cur.rowcount
+
+    def finish(self, key: str, max_attempts: int) -> Dict[str, int]:
+        """Fail recipients that ran out of attempts, close the campaign and return its counts"""
+        conn = self.db.conn
+        conn.execute(
+            """UPDATE campaign_deliveries SET status = 'failed'
+               WHERE campaign_key = ? AND status = 'pending' AND attempts >= ?""",
+            (key, max_attempts)
+        )
+        conn.execute(
+            "UPDATE campaigns SET status = 'done', finished_at = CURRENT_TIMESTAMP WHERE key = ?",
+            (key,)
+        )
+        conn.commit()
+        return self.get_stats(key)
+
+    def get_stats(self, key: str) -> Dict[str, int]:
+        stats = {'pending': 0, 'sent': 0, 'failed': 0, 'unknown': 0}
+        rows = self.db.conn.execute(
+            "SELECT status, COUNT(*) FROM campaign_deliveries WHERE campaign_key = ? GROUP BY status",
+            (key,)
+        ).fetchall()
+        stats.update(dict(rows))
+        stats['total'] = sum(stats.values())
+        return stats
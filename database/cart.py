@@ -0,0 +1,134 @@
+from typing import Optional, List, Tuple, TYPE_CHECKING
+import logging
+
+from .process_cache import ProcessCache
+
+if TYPE_CHECKING:
+    from .core import Database
+
+logger = logging.getLogger(__name__)
+
+# Kullanıcı başına (ürün adedi, toplam tutar) önbelleği
+_cart_totals: ProcessCache[int, Tuple[int, float]] = ProcessCache()
+
+
+class CartDB:
+    def __init__(self, db: 'Database'):
+        self.db = db
+
+    def setup(self):
+        """Merge duplicate cart rows and enforce one row per (user, product)"""
+        cur = self.db.cur
+        cur.execute("""
+            SELECT COUNT(*) FROM (
+                SELECT 1 FROM cart GROUP BY user_id, product_id HAVING COUNT(*) > 1
+            )
+        """)
+        duplicates = cur.fetchone()[0]
+        if duplicates:
+            cur.execute("BEGIN TRANSACTION")
+            cur.execute("""
+                UPDATE cart SET quantity = (
+                    SELECT SUM(c2.quantity) FROM cart c2
+                    WHERE c2.user_id = cart.user_id AND c2.product_id = cart.product_id
+                )
+                WHERE id IN (SELECT MIN(id) FROM cart GROUP BY user_id, product_id)
+            """)
+            cur.execute("""
+                DELETE FROM cart
+                WHERE id NOT IN (SELECT MIN(id) FROM cart GROUP BY user_id, product_id)
+            """)
+            cur.execute("COMMIT")
+            logger.info(f"Merged duplicate cart rows for {duplicates} user/product pairs")
+        cur.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_cart_user_product ON cart (user_id, product_id)"
+        )
+
+    def add_item(self, user_id: int, product_id: int, quantity: int) -> Optional[int]:
+        """Add or merge a product into the cart if stock allows, returns new quantity or None"""
+        try:
+            self.db.cur.execute("""
+                INSERT INTO cart (user_id, product_id, quantity)
+                SELECT ?, p.id, ? FROM products p
+                WHERE p.id = ? AND p.stock >= ?
+                ON CONFLICT (user_id, product_id) DO UPDATE
+                    SET quantity = cart.quantity + excluded.quantity
+                    WHERE (SELECT stock FROM products WHERE id = excluded.product_id)
+                          >= cart.quantity + excluded.quantity
+                RETURNING quantity
+            """, (user_id, quantity, product_id, quantity))
+            row = self.db.cur.fetchone()
+            self.db.conn.commit()
+            invalidate_cart_total(user_id)
+            return row[0] if row else None
+        except Exception as e:
+            logger.error(f"Error adding to cart: {e}")
+            return None
+
+    def get_items(self, user_id: int) -> List[Tuple]:
+        """Get all items in user's cart (cart_id, name, price, quantity, product_id)"""
+        try:
+            self.db.cur.execute("""
+                SELECT c.id, p.name, p.price, c.quantity, p.id
+                FROM cart c
+                JOIN products p ON c.product_id = p.id
+                WHERE c.user_id = ?
+                ORDER BY c.id
+            """, (user_id,))
+            return self.db.cur.fetchall()
+        except Exception as e:
+            logger.error(f"Error getting cart items: {e}")
+            return []
+
+    def get_totals(self, user_id: int) -> Tuple[int, float]:
+        """Get (item count, total amount) of user's cart, cached until the cart changes"""
+        cached = _cart_totals.get(user_id)
+        if cached is not None:
+            return cached
+        try:
+            self.db.cur.execute("""
+                SELECT COALESCE(SUM(c.quantity), 0), COALESCE(SUM(c.quantity * p.price), 0)
+                FROM cart c
+                JOIN products p ON c.product_id = p.id
+                WHERE c.user_id = ?
+            """, (user_id,))
+            count, amount = self.db.cur.fetchone()
+            totals = (int(count), float(amount))
+            _cart_totals.set(user_id, totals)
+            return totals
+        except Exception as e:
+            logger.error(f"Error getting cart totals: {e}")
+            return (0, 0.0)
+
+    def get_count(self, user_id: int) -> int:
+        """Get total number of items in user's cart"""
+        return self.get_totals(user_id)[0]
+
+    def remove_item(self, cart_id: int) -> bool:
+        """Remove a cart row"""
+        try:
+            self.db.cur.execute("DELETE FROM cart WHERE id = ? RETURNING user_id", (cart_id,))
+            row = self.db.cur.fetchone()
+            self.db.conn.commit()
+            if row:
+                invalidate_cart_total(row[0])
+            return True
+        except Exception as e:
+            logger.error(f"Error removing item from cart: {e}")
+            return False
+
+    def clear(self, user_id: int) -> bool:
+        """Clear all items from user's cart"""
+        try:
+            self.db.cur.execute("DELETE FROM cart WHERE user_id = ?", (user_id,))
+            self.db.conn.commit()
+            invalidate_cart_total(user_id)
+            return True
+        except Exception as e:
+            logger.error(f"Error clearing cart: {e}")
+            return False
+
+
+def invalidate_cart_total(user_id: Optional[int] = None):
+    """Drop cached cart totals of one user, or of everyone (e.g. after a price change)"""
+    _cart_totals.invalidate(user_id)
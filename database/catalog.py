@@ -0,0 +1,80 @@
+from typing import Optional, Tuple, Mapping, NamedTuple, TYPE_CHECKING
+from types import MappingProxyType
+import threading
+import logging
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+if TYPE_CHECKING:
+    from .core import Database
+
+logger = logging.getLogger(__name__)
+
+
+class ProductCard(NamedTuple):
+    """Pre-rendered product message for the shop listing"""
+    product: Tuple
+    caption: str
+    reply_markup: InlineKeyboardMarkup
+
+
+class CatalogSnapshot(NamedTuple):
+    """Immutable view of the product table at a given version"""
+    version: int
+    products: Tuple[Tuple, ...]
+    by_id: Mapping[int, Tuple]
+    cards: Tuple[ProductCard, ...]
+
+
+# Süreç genelinde tek katalog; referans değişimi atomik olduğu için okuyucular kilitlenmez
+_snapshot: Optional[CatalogSnapshot] = None
+_version = 0
+_lock = threading.Lock()
+
+
+def _render_card(product: Tuple, is_last: bool) -> ProductCard:
+    caption = f"🔸 {product[1]}\n"
+    caption += f"📝 {product[2]}\n"
+    caption += f"💰 {product[3]} USDT"
+
+    keyboard = [
+        [InlineKeyboardButton("🛒 Sepete Ekle", callback_data=f'add_to_cart_{product[0]}')],
+    ]
+    if is_last:
+        keyboard.append([InlineKeyboardButton("🔙 Ana Menü", callback_data='main_menu')])
+
+    return ProductCard(product, caption, InlineKeyboardMarkup(keyboard))
+
+
+def refresh_catalog(db: 'Database') -> Optional[CatalogSnapshot]:
+    """Reload products from the database and swap in a new snapshot"""
+    global _snapshot, _version
+    try:
+        with _lock:
+            products = tuple(db.conn.execute(
+                "SELECT * FROM products ORDER BY sort_order ASC"
+            ).fetchall())
+            _version += 1
+            snapshot = CatalogSnapshot(
+                version=_version,
+                products=products,
+                by_id=MappingProxyType({product[0]: product for product in products}),
+                cards=tuple(
+                    _render_card(product, i == len(products) - 1)
+                    for i, product in enumerate(products)
+                )
+            )
+            _snapshot = snapshot
+        logger.debug(f"Catalog snapshot v{snapshot.version} loaded ({len(products)} products)")
+        return snapshot
+    except Exception as e:
+        logger.error(f"Error refreshing catalog: {e}")
+        return _snapshot
+
+
+def get_catalog(db: 'Database') -> Optional[CatalogSnapshot]:
+    """Return the current snapshot, loading it on first use"""
+    snapshot = _snapshot
+    if snapshot is None:
+        snapshot = refresh_catalog(db)
+    return snapshot
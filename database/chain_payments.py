@@ -0,0 +1,137 @@
+from typing import Optional, List, Dict, Iterable, Tuple, TYPE_CHECKING
+import logging
+
+if TYPE_CHECKING:
+    from .core import Database
+
+logger = logging.getLogger(__name__)
+
+# Sipariş oluşturulmadan hemen önceki transferleri de kabul et (saat farkı)
+CLOCK_SKEW = 60
+
+# Bekleyen siparişi olan kullanıcıların kalıcı cüzdanları
+_PENDING_WALLETS_SQL = """
+    SELECT w.address, pr.id, pr.user_id, pr.total_amount,
+           CAST(strftime('%s', pr.created_at) AS INTEGER) AS created_ts
+    FROM purchase_requests pr
+    JOIN user_wallets uw ON uw.user_id = pr.user_id
+    JOIN wallets w ON w.id = uw.wallet_id
+    WHERE pr.status = 'pending' AND w.in_use = 1
+"""
+
+
+class ChainPaymentsDB:
+    def __init__(self, db: 'Database'):
+        self.db = db
+
+    def setup(self):
+        """Create the table of transfers seen on chain"""
+        cur = self.db.cur
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS chain_transfers (
+            tx_id TEXT PRIMARY KEY,
+            address TEXT NOT NULL,
+            amount REAL NOT NULL,
+            block_ts INTEGER NOT NULL,
+            status TEXT DEFAULT 'unmatched',
+            request_id INTEGER,
+            seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (request_id) REFERENCES purchase_requests (id)
+        )
+        ''')
+        cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_chain_transfers_status
+        ON chain_transfers (status, address)
+        ''')
+        cur.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_chain_transfers_request
+        ON chain_transfers (request_id) WHERE request_id IS NOT NULL
+        ''')
+
+    def get_watch_targets(self, window: int) -> Dict[str, int]:
+        """
+        Wallets that have a pending order, with the earliest block time to scan from
+
+        One query for all wallets so the provider can be polled in one batch.
+        """
+        try:
+            rows = self.db.conn.execute(f"""
+                SELECT address, MIN(created_ts) FROM ({_PENDING_WALLETS_SQL})
+                WHERE created_ts + ? >= CAST(strftime('%s', 'now') AS INTEGER)
+                GROUP BY address
+            """, (window,)).fetchall()
+            return {address: created_ts - CLOCK_SKEW for address, created_ts in rows}
+        except Exception as e:
+            logger.error(f"Error getting payment watch targets: {e}")
+            return {}
+
+    def record_transfers(self, transfers: Iterable) -> int:
+        """Store transfers returned by the provider, already seen ones are ignored"""
+        try:
+            cur = self.db.conn.executemany(
+                """INSERT OR IGNORE INTO chain_transfers (tx_id, address, amount, block_ts)
+                   VALUES (?, ?, ?, ?)""",
+                [(t.tx_id, t.address, t.amount, t.timestamp) for t in transfers]
+            )
+            self.db.conn.commit()
+            return cur.rowcount
+        except Exception as e:
+            logger.error(f"Error recording chain transfers: {e}")
+            return 0
+
+    def find_matches(self, window: int, tolerance: float) -> List[Tuple[str, int, float]]:
+        """
+        Pair unmatched transfers with pending orders on the same wallet
+
+        A transfer matches an order when the amount is within `tolerance` and it
+        was made between order creation and `window` seconds after it. Oldest
+        transfers and oldest orders are paired first; each side is used once.
+        """
+        try:
+            rows = self.db.conn.execute(f"""
+                SELECT t.tx_id, p.id, t.amount
+                FROM chain_transfers t
+                JOIN ({_PENDING_WALLETS_SQL}) p ON p.address = t.address
+                WHERE t.status = 'unmatched'
+                  AND ABS(p.total_amount - t.amount) <= ?
+                  AND t.block_ts BETWEEN p.created_ts - ? AND p.created_ts + ?
+                  AND NOT EXISTS (SELECT 1 FROM chain_transfers m WHERE m.request_id = p.id)
+                ORDER BY t.block_ts, p.created_ts
+            """, (tolerance, CLOCK_SKEW, window)).fetchall()
+        except Exception as e:
+            logger.error(f"Error matching chain transfers: {e}")
+            return []
+
+        matches = []
+        used_transfers, used_requests = set(), set()
+        for tx_id, request_id, amount in rows:
+            if tx_id in used_transfers or request_id in used_requests:
+                continue
+            used_transfers.add(tx_id)
+            used_requests.add(request_id)
+            matches.append((tx_id, request_id, amount))
+        return matches
+
+    def mark_transfer(self, tx_id: str, status: str, request_id: Optional[int] = None) -> bool:
+        """Set a transfer to 'matched' or 'review' (matched but could not be applied)"""
+        try:
+            self.db.conn.execute(
+                "UPDATE chain_transfers SET status = ?, request_id = ? WHERE tx_id = ?",
+                (status, request_id, tx_id)
+            )
+            self.db.conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error updating chain transfer {tx_id}: {e}")
+            return False
+
+    def get_request_transfer(self, request_id: int) -> Optional[Tuple[str, float, str]]:
+        """(tx_id, amount, status) of the transfer matched to an order"""
+        try:
+            return self.db.conn.execute(
+                "SELECT tx_id, amount, status FROM chain_transfers WHERE request_id = ?",
+                (request_id,)
+            ).fetchone()
+        except Exception as e:
+            logger.error(f"Error getting transfer of request #{request_id}: {e}")
+            return None
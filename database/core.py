@@ -1,8 +1,27 @@
 import sqlite3
 from typing import Optional, List, Tuple, Any, Dict
 import os
+import json
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
+from .cart import CartDB, invalidate_cart_total
+from .catalog import get_catalog, refresh_catalog
+from .archive import ArchiveDB, attach_archive
+from .transitions import PurchaseTransitionDB, TransitionResult
+from .outbox import OutboxDB
+from .chain_payments import ChainPaymentsDB
+from .media import MediaDB
+from .scores import ScoresDB
+from .game_quota import GameQuotaDB
+from .game_sessions import GameSessionsDB
+from .campaigns import CampaignsDB
+from .wallet_dashboard import WalletDashboardDB
+from .coupons import CouponsDB
+from .query_profiler import ProfilingConnection
+from .transaction import begin_transaction
+from .location_pool import (
+    get_location_count, location_pool_changed, invalidate_location_counts
+)
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +31,18 @@ class Database:
         self.db_name = db_name
         self.conn: Optional[sqlite3.Connection] = None
         self.cur: Optional[sqlite3.Cursor] = None
+        self.cart = CartDB(self)
+        self.archive = ArchiveDB(self)
+        self.transitions = PurchaseTransitionDB(self)
+        self.outbox = OutboxDB(self)
+        self.chain_payments = ChainPaymentsDB(self)
+        self.media = MediaDB(self)
+        self.scores = ScoresDB(self)
+        self.game_quota = GameQuotaDB(self)
+        self.game_sessions = GameSessionsDB(self)
+        self.campaigns = CampaignsDB(self)
+        self.wallet_dashboard = WalletDashboardDB(self)
+        self.coupons = CouponsDB(self)
         self.connect()
         
     def is_user_banned(self, user_id: int) -> bool:
@@ -30,10 +61,13 @@ class Database:
     def connect(self):
         """Create database connection"""
         try:
-            self.conn = sqlite3.connect(self.db_name, check_same_thread=False)
+            # Profil modu açıkken tüm sorgular (db.cur ve conn.execute) ölçülür
+            self.conn = sqlite3.connect(self.db_name, check_same_thread=False, factory=ProfilingConnection)
             self.cur = self.conn.cursor()
             logger.info(f"Connected to database: {self.db_name}")
             self.setup_database()
+            # Arşivlenmiş siparişler all_purchase_requests görünümünden okunabilir
+            attach_archive(self.conn, self.db_name)
         except Exception as e:
             logger.error(f"Error connecting to database: {e}")
             raise
@@ -108,11 +142,19 @@ class Database:
                 SELECT 
                     u.telegram_id,
                     u.created_at,
-                    (SELECT COUNT(*) FROM purchase_requests WHERE user_id = u.telegram_id AND status = 'completed') as completed_orders,
-                    (SELECT COUNT(*) FROM purchase_requests WHERE user_id = u.telegram_id AND status = 'rejected') as rejected_orders,
+                    COALESCE(o.completed_orders, 0) as completed_orders,
+                    COALESCE(o.rejected_orders, 0) as rejected_orders,
                     u.failed_payments,
                     u.is_banned
                 FROM users u
+                -- Arşivlenmiş siparişler dahil, tek geçişte kullanıcı başına sayılır
+                LEFT JOIN (
+                    SELECT user_id,
+                           SUM(status = 'completed') as completed_orders,
+                           SUM(status = 'rejected') as rejected_orders
+                    FROM all_purchase_requests
+                    GROUP BY user_id
+                ) o ON o.user_id = u.telegram_id
                 ORDER BY u.created_at DESC
             """)
             results = self.cur.fetchall()
@@ -156,13 +198,7 @@ class Database:
             return False
     def remove_from_cart(self, cart_id):
         """Remove an item from the user's cart"""
-        try:
-            self.cur.execute("DELETE FROM cart WHERE id = ?", (cart_id,))
-            self.conn.commit()
-            return True
-        except Exception as e:
-            logger.error(f"Error removing item from cart: {e}")
-            return False
+        return self.cart.remove_item(cart_id)
     def get_user_stats(self, user_id: int) -> Optional[Tuple]:
         """Get statistics for a specific user"""
         try:
@@ -175,7 +211,7 @@ class Database:
                     u.failed_payments,
                     u.is_banned
                 FROM users u
-                LEFT JOIN purchase_requests pr ON u.telegram_id = pr.user_id
+                LEFT JOIN all_purchase_requests pr ON u.telegram_id = pr.user_id
                 WHERE u.telegram_id = ?
                 GROUP BY u.telegram_id
             """, (user_id,))
@@ -391,13 +427,16 @@ class Database:
             ''')
             
             # Discount Coupons Table
+            # is_used üç durumludur (database/coupons.py): 0 aktif, 1 kullanıldı,
+            # 2 süresi doldu (süpürücü tarafından kapatıldı). Eski tablolarda BOOLEAN
+            # olarak tanımlı olsa da SQLite 2 değerini olduğu gibi saklar.
             self.cur.execute('''
             CREATE TABLE IF NOT EXISTS discount_coupons (
                 id INTEGER PRIMARY KEY,
                 user_id INTEGER NOT NULL,
                 coupon_code TEXT NOT NULL UNIQUE,
                 discount_percent INTEGER NOT NULL,
-                is_used BOOLEAN DEFAULT 0,
+                is_used INTEGER DEFAULT 0,
                 source TEXT,
                 expires_at TIMESTAMP,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -426,6 +465,28 @@ class Database:
 
             # Değişiklikleri kaydet
             self.conn.commit()
+            
+            # Sepet: (user_id, product_id) başına tek satır
+            self.cart.setup()
+            # Onay/red bildirimleri için outbox
+            self.outbox.setup()
+            # Zincir üzerindeki ödemeler
+            self.chain_payments.setup()
+            # İçerik adresli medya dosyaları
+            self.media.setup()
+            # Oyun skorları için kullanıcı başına toplamlar
+            self.scores.setup()
+            # Günlük oyun hakları: (gün, kullanılan) kaydı
+            self.game_quota.setup()
+            # Süreli oyun oturumları
+            self.game_sessions.setup()
+            # Toplu bildirimler ve gönderim kayıtları
+            self.campaigns.setup()
+            # Cüzdan paneli için indeksler
+            self.wallet_dashboard.setup()
+            # Kuponlar: tamsayı son kullanma zamanı ve indeksler
+            self.coupons.setup()
+            self.conn.commit()
             logger.info("Database tables created successfully")
         except Exception as e:
             logger.error(f"Error setting up database: {e}")
@@ -512,148 +573,33 @@ class Database:
             logger.error(f"Error closing database connection: {e}")
             
     def add_to_cart(self, user_id: int, product_id: int, quantity: int) -> bool:
-        """Add product to user's cart"""
-        try:
-            self.cur.execute(
-                """INSERT INTO cart (user_id, product_id, quantity) 
-                   VALUES (?, ?, ?)""",
-                (user_id, product_id, quantity)
-            )
-            self.conn.commit()
-            return True
-        except Exception as e:
-            logger.error(f"Error adding to cart: {e}")
-            return False
+        """Add product to user's cart, merging with an existing row"""
+        return self.cart.add_item(user_id, product_id, quantity) is not None
             
     def get_cart_items(self, user_id: int) -> list:
         """Get all items in user's cart"""
-        try:
-            self.cur.execute("""
-                SELECT c.id, p.name, p.price, c.quantity, p.id
-                FROM cart c
-                JOIN products p ON c.product_id = p.id
-                WHERE c.user_id = ?
-            """, (user_id,))
-            return self.cur.fetchall()
-        except Exception as e:
-            logger.error(f"Error getting cart items: {e}")
-            return []
+        return self.cart.get_items(user_id)
             
     def clear_user_cart(self, user_id: int) -> bool:
         """Clear all items from user's cart"""
-        try:
-            self.cur.execute("DELETE FROM cart WHERE user_id = ?", (user_id,))
-            self.conn.commit()
-            return True
-        except Exception as e:
-            logger.error(f"Error clearing cart: {e}")
-            return False
+        return self.cart.clear(user_id)
     def update_purchase_request_status(self, request_id: int, status: str) -> bool:
-        """Update purchase request status"""
-        try:
-            logger.debug(f"Updating request #{request_id} status to {status}")
-            # Get user_id from purchase request
-            self.cur.execute(
-                "SELECT user_id FROM purchase_requests WHERE id = ?",
-                (request_id,)
-            )
-            result = self.cur.fetchone()
-            if not result:
-                logger.error(f"Purchase request #{request_id} not found")
-                return False
-            
-            user_id = result[0]
-            
-            self.cur.execute(
-                "SELECT telegram_id FROM users WHERE telegram_id = ?",
-                (user_id,)
-            )
-            user_exists = self.cur.fetchone()
-            
-            if not user_exists:
-                logger.info(f"Creating new user record for {user_id}")
-                self.cur.execute(
-                    "INSERT INTO users (telegram_id, failed_payments, is_banned) VALUES (?, 0, 0)",
-                    (user_id,)
-                )
-                self.conn.commit()
-            
-            if status == 'rejected':
-                self.cur.execute(
-                    """UPDATE users 
-                    SET failed_payments = failed_payments + 1 
-                    WHERE telegram_id = ?""",
-                    (user_id,)
-                )
-                self.conn.commit()
-                    
-                self.cur.execute(
-                    """SELECT failed_payments 
-                    FROM users 
-                    WHERE telegram_id = ?""",
-                    (user_id,)
-                )
-                result = self.cur.fetchone()
-                failed_payments = 0
-                
-                if result and result[0]:
-                    failed_payments = result[0]
-                    logger.info(f"User {user_id} has {failed_payments} failed payments")
-                    
-                    if failed_payments >= 3:
-                        self.cur.execute(
-                            """UPDATE users 
-                            SET is_banned = 1 
-                            WHERE telegram_id = ?""",
-                            (user_id,)
-                        )
-                        logger.warning(f"User {user_id} has been banned due to too many failed payments")
-                else:
-                    logger.warning(f"Failed to get failed payments count for user {user_id}")
-                    # Varsayılan değer ata
-                    failed_payments = 1
-                    self.cur.execute(
-                        "UPDATE users SET failed_payments = ? WHERE telegram_id = ?",
-                        (failed_payments, user_id)
-                    )
-                    self.conn.commit()
-            
-            # If status is completed, reset failed_payments
-            elif status == 'completed':
-                self.cur.execute(
-                    """UPDATE users 
-                    SET failed_payments = 0 
-                    WHERE telegram_id = ?""",
-                    (user_id,)
-                )
-                self.conn.commit()
-            
-            # Update request status
-            self.cur.execute(
-                """UPDATE purchase_requests 
-                SET status = ?, updated_at = CURRENT_TIMESTAMP 
-                WHERE id = ?""",
-                (status, request_id)
-            )
-            self.conn.commit()
-            logger.info(f"Successfully updated request #{request_id} status to {status}")
-            return True
-        except Exception as e:
-            logger.exception(f"Error updating purchase request #{request_id}: {str(e)}")
-            return False
+        """Update purchase request status (see transition_purchase_request)"""
+        return self.transition_purchase_request(request_id, status).ok
+
+    def transition_purchase_request(self, request_id: int, status: str, notify=None) -> TransitionResult:
+        """Validate and apply pending -> completed/rejected in one transaction"""
+        logger.debug(f"Updating request #{request_id} status to {status}")
+        result = self.transitions.transition(request_id, status, notify)
+        if result.ok and result.items:
+            # Stok değişti
+            refresh_catalog(self)
+        if result.location_path:
+            location_pool_changed(result.items[0][0], -1)
+        return result
     def get_cart_count(self, user_id: int) -> int:
         """Get total number of items in user's cart"""
-        try:
-            self.cur.execute("""
-                SELECT SUM(quantity)
-                FROM cart
-                WHERE user_id = ?
-            """, (user_id,))
-            result = self.cur.fetchone()[0]
-            return result if result else 0
-        except Exception as e:
-            logger.error(f"Error getting cart count: {e}")
-            return 0
+        return self.cart.get_count(user_id)
             
     def __enter__(self):
         return self
@@ -662,22 +608,14 @@ class Database:
         self.close()
         
     def get_products(self) -> List[Tuple]:
-        """Get all products"""
-        try:
-            self.cur.execute("SELECT * FROM products ORDER BY sort_order ASC")
-            return self.cur.fetchall()
-        except Exception as e:
-            logger.error(f"Error getting products: {e}")
-            return []
+        """Get all products (served from the in-memory catalog snapshot)"""
+        snapshot = get_catalog(self)
+        return list(snapshot.products) if snapshot else []
             
     def get_product(self, product_id: int) -> Optional[Tuple]:
-        """Get product by ID"""
-        try:
-            self.cur.execute("SELECT * FROM products WHERE id = ?", (product_id,))
-            return self.cur.fetchone()
-        except Exception as e:
-            logger.error(f"Error getting product: {e}")
-            return None
+        """Get product by ID (served from the in-memory catalog snapshot)"""
+        snapshot = get_catalog(self)
+        return snapshot.by_id.get(product_id) if snapshot else None
             
     def add_product(self, name: str, description: str, price: float, image_path: str, stock: int = 0) -> bool:
         """Add a new product"""
@@ -689,6 +627,8 @@ class Database:
                 (name, description, price, image_path, stock)
             )
             self.conn.commit()
+            refresh_catalog(self)
+            invalidate_location_counts()
             return True
         except Exception as e:
             logger.error(f"Error adding product: {e}")
@@ -702,6 +642,7 @@ class Database:
                 (new_name, product_id)
             )
             self.conn.commit()
+            refresh_catalog(self)
             return True
         except Exception as e:
             logger.error(f"Error updating product name: {e}")
@@ -715,6 +656,7 @@ class Database:
                 (new_description, product_id)
             )
             self.conn.commit()
+            refresh_catalog(self)
             return True
         except Exception as e:
             logger.error(f"Error updating product description: {e}")
@@ -728,6 +670,8 @@ class Database:
                 (new_price, product_id)
             )
             self.conn.commit()
+            invalidate_cart_total()
+            refresh_catalog(self)
             return True
         except Exception as e:
             logger.error(f"Error updating product price: {e}")
@@ -741,6 +685,7 @@ class Database:
                 (quantity, product_id)
             )
             self.conn.commit()
+            refresh_catalog(self)
             return True
         except Exception as e:
             logger.error(f"Error updating product stock: {e}")
@@ -751,6 +696,9 @@ class Database:
         try:
             self.cur.execute("DELETE FROM products WHERE id = ?", (product_id,))
             self.conn.commit()
+            invalidate_cart_total()
+            refresh_catalog(self)
+            invalidate_location_counts()
             return True
         except Exception as e:
             logger.error(f"Error deleting product: {e}")
@@ -774,6 +722,7 @@ class Database:
                     (product_id,)
                 )
             self.conn.commit()
+            refresh_catalog(self)
             return True
         except Exception as e:
             logger.error(f"Error updating product sort order: {e}")
@@ -792,6 +741,38 @@ class Database:
             logger.error(f"Error adding wallet: {e}")
             return False
             
+    def add_wallets(self, addresses: List[str]) -> Optional[Tuple[int, set]]:
+        """
+        Add many wallets in one transaction
+
+        Existing addresses are found with one set-based query and skipped.
+        Returns (inserted count, addresses that were already in the pool),
+        or None if the import failed and nothing was added.
+        """
+        addresses = list(dict.fromkeys(addresses))
+        if not addresses:
+            return 0, set()
+        try:
+            if not begin_transaction(self.conn):
+                return None
+            existing = {
+                row[0] for row in self.conn.execute(
+                    "SELECT address FROM wallets WHERE address IN (SELECT value FROM json_each(?))",
+                    (json.dumps(addresses),)
+                )
+            }
+            new_addresses = [a for a in addresses if a not in existing]
+            cur = self.conn.executemany(
+                "INSERT OR IGNORE INTO wallets (address, in_use) VALUES (?, 0)",
+                ((address,) for address in new_addresses)
+            )
+            self.conn.commit()
+            return cur.rowcount, existing
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Error adding wallets: {e}")
+            return None
+
     def get_available_wallet(self) -> Optional[str]:
         """
         Kullanılabilir bir cüzdan bulup döndürür.
@@ -979,12 +960,33 @@ class Database:
                 (product_id, image_path)
             )
             self.conn.commit()
+            location_pool_changed(product_id, 1)
             logger.info(f"Added new location {image_path} for product {product_id}")
             return True
         except Exception as e:
             logger.error(f"Error adding location: {e}")
             return False
-            
+
+    def add_locations(self, product_id: int, image_paths: List[str]) -> int:
+        """Add several locations in one transaction, returns how many were added"""
+        if not image_paths:
+            return 0
+        try:
+            self.cur.executemany(
+                """INSERT INTO locations
+                (product_id, image_path, is_used)
+                VALUES (?, ?, 0)""",
+                [(product_id, image_path) for image_path in image_paths]
+            )
+            self.conn.commit()
+            location_pool_changed(product_id, len(image_paths))
+            logger.info(f"Added {len(image_paths)} new locations for product {product_id}")
+            return len(image_paths)
+        except Exception as e:
+            logger.error(f"Error adding locations: {e}")
+            self.conn.rollback()
+            return 0
+
     def get_available_location(self, product_id: int) -> str:
         """
         Ürün için kullanılabilir bir konum bulur ve veritabanından siler
@@ -1025,6 +1027,7 @@ class Database:
             # İşlemi onayla
             self.cur.execute("COMMIT")
             self.conn.commit()
+            location_pool_changed(product_id, -1)
             logger.info(f"Successfully assigned and will delete location {image_path} for product {product_id}")
             
             return image_path
@@ -1038,19 +1041,9 @@ class Database:
             return None
 
     def get_available_location_count(self, product_id: int) -> int:
-        """Get count of available locations for a product"""
-        try:
-            self.cur.execute(
-                """SELECT COUNT(*) 
-                FROM locations 
-                WHERE product_id = ? AND is_used = 0""",
-                (product_id,)
-            )
-            result = self.cur.fetchone()
-            return result[0] if result else 0
-        except Exception as e:
-            logger.error(f"Error getting available location count: {e}")
-            return 0
+        """Get count of available locations for a product (kept in memory by the pool monitor)"""
+        return get_location_count(self, product_id)
+
     def reset_used_locations(self, product_id: int = None) -> int:
         """Reset used locations to available state
         
@@ -1074,6 +1067,7 @@ class Database:
                 
             self.conn.commit()
             reset_count = self.cur.rowcount
+            invalidate_location_counts()
             logger.info(f"Reset {reset_count} used locations to available state")
             return reset_count
         except Exception as e:
@@ -1297,14 +1291,14 @@ class Database:
         try:
             # Get image path before deleting
             self.cur.execute(
-                "SELECT image_path FROM locations WHERE id = ? AND is_used = 0",
+                "SELECT image_path, product_id FROM locations WHERE id = ? AND is_used = 0",
                 (location_id,)
             )
             result = self.cur.fetchone()
             if not result:
                 return False
                 
-            image_path = result[0]
+            image_path, product_id = result
             
             # Delete from database
             self.cur.execute(
@@ -1314,8 +1308,9 @@ class Database:
             
             if self.cur.rowcount > 0:
                 self.conn.commit()
-                # Delete image file
-                if os.path.exists(image_path):
+                location_pool_changed(product_id, -1)
+                # Medya deposundaki dosya GC ile silinir, eski düzendeki dosya hemen silinir
+                if self.media.release(image_path) is None and os.path.exists(image_path):
                     os.remove(image_path)
                 return True
             return False
@@ -1332,280 +1327,49 @@ class Database:
     #GAME FUNCTIONS
     def create_game_session(self, user_id: int, session_id: str) -> bool:
         """Create a new game session for a user"""
-        try:
-            # Önce tabloyu kontrol et
-            self.cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='game_sessions'")
-            if not self.cur.fetchone():
-                # Tablo yoksa oluştur
-                self.cur.execute('''
-                CREATE TABLE IF NOT EXISTS game_sessions (
-                    id INTEGER PRIMARY KEY,
-                    user_id INTEGER NOT NULL,
-                    session_id TEXT NOT NULL UNIQUE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_used INTEGER DEFAULT 0
-                )
-                ''')
-                self.conn.commit()
-                logger.info("Created game_sessions table")
-            
-            # Oturumu ekle
-            self.cur.execute(
-                "INSERT INTO game_sessions (user_id, session_id) VALUES (?, ?)",
-                (user_id, session_id)
-            )
-            self.conn.commit()
-            return True
-        except Exception as e:
-            logger.error(f"Error creating game session: {e}")
-            return False
+        return self.game_sessions.create(user_id, session_id)
 
     def validate_game_session(self, user_id: int, session_id: str) -> bool:
         """Validate if a game session exists and belongs to the user"""
-        try:
-            # Önce tabloyu kontrol et
-            self.cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='game_sessions'")
-            if not self.cur.fetchone():
-                # Tablo yoksa doğrulama başarısız olur
-                logger.warning("game_sessions table does not exist")
-                return True  # Geçici olarak True döndürüyoruz
-            
-            self.cur.execute(
-                "SELECT id FROM game_sessions WHERE user_id = ? AND session_id = ?",  # is_used şartını kaldırdık
-                (user_id, session_id)
-            )
-            result = self.cur.fetchone()
-            return True  # Geçici olarak True döndürüyoruz
-        except Exception as e:
-            logger.error(f"Error validating game session: {e}")
-            return True 
+        return self.game_sessions.validate(user_id, session_id)
 
     def use_game_chance(self, user_id: int) -> bool:
         """Use one game chance for the user"""
-        try:
-            self.cur.execute(
-                "SELECT daily_chances, last_reset FROM game_chances WHERE user_id = ?",
-                (user_id,)
-            )
-            result = self.cur.fetchone()
-            
-            current_time = datetime.now()
-            
-            if result:
-                chances, last_reset = result
-                last_reset = datetime.strptime(last_reset.split('.')[0], '%Y-%m-%d %H:%M:%S') if isinstance(last_reset, str) else last_reset
-                
-                if (current_time - last_reset).days > 0:
-                    # Reset to 5 chances instead of 3
-                    self.cur.execute(
-                        "UPDATE game_chances SET daily_chances = 4, last_reset = ? WHERE user_id = ?",
-                        (current_time, user_id)
-                    )
-                else:
-                    if chances > 0:
-                        self.cur.execute(
-                            "UPDATE game_chances SET daily_chances = daily_chances - 1 WHERE user_id = ?",
-                            (user_id,)
-                        )
-                    else:
-                        return False
-            else:
-                # Initialize with 5 chances and immediately use one
-                self.cur.execute(
-                    "INSERT INTO game_chances (user_id, daily_chances, last_reset) VALUES (?, 4, ?)",
-                    (user_id, current_time)
-                )
-            
-            self.conn.commit()
-            return True
-        except Exception as e:
-            logger.error(f"Error using game chance: {e}")
-            return False
+        return self.game_quota.consume(user_id)
 
     def get_remaining_daily_games(self, user_id: int) -> int:
         """Get remaining daily game chances for a user"""
-        try:
-            self.cur.execute(
-                "SELECT daily_chances, last_reset FROM game_chances WHERE user_id = ?",
-                (user_id,)
-            )
-            result = self.cur.fetchone()
-            
-            current_time = datetime.now()
-            
-            if result:
-                chances, last_reset_str = result
-                # Fix date parsing issue
-                try:
-                    if isinstance(last_reset_str, str):
-                        last_reset = datetime.strptime(last_reset_str.split('.')[0], '%Y-%m-%d %H:%M:%S')
-                    else:
-                        last_reset = last_reset_str
-                except:
-                    # Use current time if parsing fails
-                    last_reset = current_time - timedelta(days=1)  # Default to yesterday
-                
-                if (current_time - last_reset).days > 0:
-                    # Reset to 5 chances (new day)
-                    self.cur.execute(
-                        "UPDATE game_chances SET daily_chances = 5, last_reset = ? WHERE user_id = ?",
-                        (current_time.strftime('%Y-%m-%d %H:%M:%S'), user_id)
-                    )
-                    self.conn.commit()
-                    return 5
-                else:
-                    return max(0, chances)  # Ensure non-negative
-            else:
-                # First time playing, initialize with 5 chances
-                self.cur.execute(
-                    "INSERT INTO game_chances (user_id, daily_chances, last_reset) VALUES (?, 5, ?)",
-                    (user_id, current_time.strftime('%Y-%m-%d %H:%M:%S'))
-                )
-                self.conn.commit()
-                return 5
-        except Exception as e:
-            logger.error(f"Error getting remaining daily games: {e}")
-            return 5  # Hata durumunda kullanıcının oynamasına izin ver
+        return self.game_quota.remaining(user_id)
 
     def get_next_game_reset_time(self, user_id: int) -> datetime:
         """Get next time when game chances will reset"""
-        try:
-            self.cur.execute(
-                "SELECT last_reset FROM game_chances WHERE user_id = ?",
-                (user_id,)
-            )
-            result = self.cur.fetchone()
-            
-            if result:
-                last_reset_str = result[0]
-                # Hatalı tarih çözümleme sorununu çöz
-                try:
-                    last_reset = datetime.strptime(last_reset_str.split('.')[0], '%Y-%m-%d %H:%M:%S')
-                except:
-                    # Çözümleme hatası varsa şu anki zamanı kullan
-                    last_reset = datetime.now()
-                    
-                # Next reset is at midnight
-                next_reset = last_reset.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
-                return next_reset
-            else:
-                # If no entry, return next midnight
-                now = datetime.now()
-                next_reset = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
-                return next_reset
-        except Exception as e:
-            logger.error(f"Error getting next game reset time: {e}")
-            # Return 24 hours from now as default
-            return datetime.now() + timedelta(hours=24)
+        return self.game_quota.next_reset_time()
 
     def save_game_score(self, user_id: int, session_id: str, score: int) -> bool:
         """Save game score and mark session as used"""
-        try:
-            # Mark session as used
-            self.cur.execute(
-                "UPDATE game_sessions SET is_used = 1 WHERE user_id = ? AND session_id = ?",
-                (user_id, session_id)
-            )
-            
-            # Save score
-            self.cur.execute(
-                "INSERT INTO game_scores (user_id, session_id, score) VALUES (?, ?, ?)",
-                (user_id, session_id, score)
-            )
-            
-            self.conn.commit()
+        result = self.scores.record_batch([(user_id, session_id, score)])[0]
+        if result.ok:
             logger.info(f"Saved score {score} for user {user_id}, session {session_id}")
-            return True
-        except Exception as e:
-            logger.error(f"Error saving game score: {e}")
-            return False
+        else:
+            logger.warning(f"Score {score} for user {user_id}, session {session_id} rejected: {result.reason}")
+        return result.ok
 
     def get_top_scores(self, limit: int = 10) -> list:
         """Get users with highest single-game scores"""
-        try:
-            self.cur.execute("""
-                SELECT 
-                    gs.user_id,
-                    MAX(gs.score) as best_score,
-                    gs.created_at
-                FROM game_scores gs
-                GROUP BY gs.user_id
-                ORDER BY best_score DESC
-                LIMIT ?
-            """, (limit,))
-            return self.cur.fetchall()
-        except Exception as e:
-            logger.error(f"Error getting top scores: {e}")
-            return []
+        return self.scores.get_top('best_score', limit)
         
     def get_user_total_score(self, user_id: int) -> int:
         """Get user's total accumulated score from all games"""
-        try:
-            self.cur.execute(
-                "SELECT SUM(score) FROM game_scores WHERE user_id = ?",
-                (user_id,)
-            )
-            result = self.cur.fetchone()
-            return result[0] if result and result[0] else 0
-        except Exception as e:
-            logger.error(f"Error getting user total score: {e}")
-            return 0
+        return self.scores.get_totals(user_id).total
         
     def get_top_total_scores(self, limit: int = 10) -> list:
         """Get users with highest total accumulated scores"""
-        try:
-            self.cur.execute("""
-                SELECT 
-                    gs.user_id,
-                    SUM(gs.score) as total_score,
-                    COUNT(gs.id) as games_played
-                FROM game_scores gs
-                GROUP BY gs.user_id
-                ORDER BY total_score DESC
-                LIMIT ?
-            """, (limit,))
-            return self.cur.fetchall()
-        except Exception as e:
-            logger.error(f"Error getting top total scores: {e}")
-            return []
+        return self.scores.get_top('total_score', limit)
+
     def get_user_best_score(self, user_id: int) -> int:
         """Get user's best score (highest single game score)"""
-        try:
-            self.cur.execute(
-                "SELECT MAX(score) FROM game_scores WHERE user_id = ?",
-                (user_id,)
-            )
-            result = self.cur.fetchone()
-            return result[0] if result and result[0] else 0
-        except Exception as e:
-            logger.error(f"Error getting user best score: {e}")
-            return 0
+        return self.scores.get_totals(user_id).best
 
-    def create_discount_coupon(self, user_id: int, discount_percent: int, source: str) -> str:
-        """Create a discount coupon for a user with 10-digit code"""
-        try:
-            import random
-            import string
-            
-            # Generate a 10-digit alphanumeric coupon code
-            coupon_code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
-            
-            # Set expiry date to 30 days from now
-            expires_at = (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d %H:%M:%S')
-            
-            self.cur.execute(
-                """INSERT INTO discount_coupons 
-                (user_id, coupon_code, discount_percent, source, expires_at) 
-                VALUES (?, ?, ?, ?, ?)""",
-                (user_id, coupon_code, discount_percent, source, expires_at)
-            )
-            
-            self.conn.commit()
-            logger.info(f"Created {discount_percent}% discount coupon {coupon_code} for user {user_id}")
-            return coupon_code
-        except Exception as e:
-            logger.error(f"Error creating discount coupon: {e}")
-            return None
     def create_purchase_request(self, user_id: int, cart_items: list, wallet: str, discount_percent: int = 0) -> Optional[int]:
         """Create a new purchase request with assigned wallet and optional discount"""
         try:
@@ -1758,95 +1522,17 @@ class Database:
             return False
     def create_discount_coupon(self, user_id: int, discount_percent: int, source: str) -> str:
         """Create a discount coupon for a user with 10-digit code"""
-        try:
-            import random
-            import string
-            
-            # Generate a 10-digit alphanumeric coupon code
-            coupon_code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
-            
-            # Set expiry date to 30 days from now
-            expires_at = (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d %H:%M:%S')
-            
-            self.cur.execute(
-                """INSERT INTO discount_coupons 
-                (user_id, coupon_code, discount_percent, source, expires_at) 
-                VALUES (?, ?, ?, ?, ?)""",
-                (user_id, coupon_code, discount_percent, source, expires_at)
-            )
-            
-            self.conn.commit()
-            logger.info(f"Created {discount_percent}% discount coupon {coupon_code} for user {user_id}")
-            return coupon_code
-        except Exception as e:
-            logger.error(f"Error creating discount coupon: {e}")
-            return None
-            
+        return self.coupons.create(user_id, discount_percent, source)
+
     def validate_discount_coupon(self, coupon_code: str, user_id: int) -> dict:
         """Validate a discount coupon and return discount info if valid"""
-        try:
-            self.cur.execute(
-                """SELECT id, discount_percent, expires_at, is_used
-                FROM discount_coupons
-                WHERE coupon_code = ? AND user_id = ?""",
-                (coupon_code, user_id)
-            )
-            
-            result = self.cur.fetchone()
-            if not result:
-                return {"valid": False, "message": "Geçersiz kupon kodu."}
-                
-            coupon_id, discount_percent, expires_at, is_used = result
-            
-            # Check if coupon is already used
-            if is_used:
-                return {"valid": False, "message": "Bu kupon daha önce kullanılmış."}
-                
-            # Check if coupon is expired
-            if expires_at:
-                try:
-                    expiry_date = datetime.strptime(expires_at, '%Y-%m-%d %H:%M:%S')
-                    if expiry_date < datetime.now():
-                        return {"valid": False, "message": "Bu kupon süresi dolmuş."}
-                except:
-                    pass
-            
-            # Valid coupon
-            return {
-                "valid": True, 
-                "discount_percent": discount_percent,
-                "coupon_id": coupon_id,
-                "message": f"Kupon başarıyla uygulandı! %{discount_percent} indirim kazandınız."
-            }
-            
-        except Exception as e:
-            logger.error(f"Error validating coupon: {e}")
-            return {"valid": False, "message": "Kupon doğrulanırken bir hata oluştu."}
+        return self.coupons.validate(coupon_code, user_id)
 
     def apply_discount_coupon(self, coupon_id: int) -> bool:
         """Mark a discount coupon as used"""
-        try:
-            self.cur.execute(
-                "UPDATE discount_coupons SET is_used = 1 WHERE id = ?",
-                (coupon_id,)
-            )
-            self.conn.commit()
-            return True
-        except Exception as e:
-            logger.error(f"Error applying coupon: {e}")
-            return False
-            
+        return self.coupons.redeem(coupon_id)
+
     def get_user_available_coupons(self, user_id: int) -> list:
         """Get all available (unused) coupons for a user"""
-        try:
-            self.cur.execute(
-                """SELECT coupon_code, discount_percent, source, expires_at
-                FROM discount_coupons
-                WHERE user_id = ? AND is_used = 0 AND (expires_at IS NULL OR expires_at > datetime('now'))
-                ORDER BY discount_percent DESC""",
-                (user_id,)
-            )
-            return self.cur.fetchall()
-        except Exception as e:
-            logger.error(f"Error getting user coupons: {e}")
-            return []
\ No newline at end of file
+        return [(c.code, c.discount_percent, c.source, c.expires_at)
+                for c in self.coupons.get_active(user_id)]
\ No newline at end of file
@@ -0,0 +1,210 @@
+from typing import Optional, List, NamedTuple, TYPE_CHECKING
+from datetime import datetime
+import sqlite3
+import secrets
+import string
+import logging
+import time
+
+from .process_cache import ProcessCache
+
+if TYPE_CHECKING:
+    from .core import Database
+
+logger = logging.getLogger(__name__)
+
+# discount_coupons.is_used değerleri; sütun eski şemada BOOLEAN tanımlı ama
+# üç durum tutar (SQLite tür yakınlığı 2'yi de saklar)
+COUPON_ACTIVE = 0
+COUPON_USED = 1
+COUPON_EXPIRED = 2
+
+COUPON_VALID_DAYS = 30
+CODE_ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 10
+MAX_CODE_ATTEMPTS = 5
+
+
+class Coupon(NamedTuple):
+    id: int
+    code: str
+    discount_percent: int
+    source: str
+    # Unix zamanı; None süresiz demek
+    expires_ts: Optional[int]
+
+    @property
+    def expires_at(self) -> Optional[str]:
+        if self.expires_ts is None:
+            return None
+        return datetime.fromtimestamp(self.expires_ts).strftime('%Y-%m-%d %H:%M:%S')
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        return self.expires_ts is not None and self.expires_ts <= (now or time.time())
+
+
+# Kullanıcı başına aktif kuponlar
+_active: ProcessCache[int, List[Coupon]] = ProcessCache()
+
+
+def invalidate_coupons(user_id: Optional[int] = None):
+    _active.invalidate(user_id)
+
+
+def redeem_coupon(cur: sqlite3.Cursor, coupon_id: int) -> bool:
+    """
+    Mark an active, unexpired coupon as used on the caller's cursor (inside its transaction)
+
+    Returns False if the coupon was already used or has expired, even if the
+    sweeper has not retired it yet.
+    """
+    row = cur.execute(
+        """UPDATE discount_coupons SET is_used = ?
+           WHERE id = ? AND is_used = ? AND (expires_ts IS NULL OR expires_ts > ?)
+           RETURNING user_id""",
+        (COUPON_USED, coupon_id, COUPON_ACTIVE, int(time.time()))
+    ).fetchone()
+    if row is None:
+        return False
+    invalidate_coupons(row[0])
+    return True
+
+
+class CouponsDB:
+    """
+    Discount coupons with integer expiry
+
+    Active coupons are cached per user, so validating a code or counting a
+    user's coupons does not touch the table; expired coupons are retired by
+    a periodic sweep rather than filtered on every read.
+    """
+
+    def __init__(self, db: 'Database'):
+        self.db = db
+
+    def setup(self):
+        """Add integer expiry to the coupons table and index active lookups"""
+        cur = self.db.cur
+        columns = {row[1] for row in cur.execute("PRAGMA table_info(discount_coupons)")}
+        if 'expires_ts' not in columns:
+            cur.execute("ALTER TABLE discount_coupons ADD COLUMN expires_ts INTEGER")
+            # Eski kayıtlardaki expires_at yerel saatle yazılmıştı
+            cur.execute("""
+                UPDATE discount_coupons
+                SET expires_ts = CAST(strftime('%s', expires_at, 'utc') AS INTEGER)
+                WHERE expires_at IS NOT NULL
+            """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_coupons_user_active
+            ON discount_coupons(user_id, is_used, expires_ts)
+        """)
+        cur.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_coupons_expiry
+            ON discount_coupons(expires_ts) WHERE is_used = {COUPON_ACTIVE}
+        """)
+
+    def get_active(self, user_id: int) -> List[Coupon]:
+        """Unused, unexpired coupons of a user, best discount first"""
+        coupons = _active.get(user_id)
+        if coupons is None:
+            try:
+                rows = self.db.conn.execute(
+                    """SELECT id, coupon_code, discount_percent, source, expires_ts
+                       FROM discount_coupons
+                       WHERE user_id = ? AND is_used = ?
+                       ORDER BY discount_percent DESC""",
+                    (user_id, COUPON_ACTIVE)
+                ).fetchall()
+            except Exception as e:
+                logger.error(f"Error getting user coupons: {e}")
+                return []
+            coupons = [Coupon(*row) for row in rows]
+            _active.set(user_id, coupons)
+        now = time.time()
+        return [c for c in coupons if not c.is_expired(now)]
+
+    def get_active_by_id(self, user_id: int, coupon_id: Optional[int]) -> Optional[Coupon]:
+        """One of the user's active coupons, None if it is no longer usable"""
+        if coupon_id is None:
+            return None
+        return next((c for c in self.get_active(user_id) if c.id == coupon_id), None)
+
+    def create(self, user_id: int, discount_percent: int, source: str,
+               valid_days: int = COUPON_VALID_DAYS) -> Optional[str]:
+        """Create a coupon with a random code, retrying on the rare code collision"""
+        expires_ts = int(time.time()) + valid_days * 24 * 60 * 60
+        expires_at = datetime.fromtimestamp(expires_ts).strftime('%Y-%m-%d %H:%M:%S')
+        for _ in range(MAX_CODE_ATTEMPTS):
+            code = ''.join(secrets.choice(CODE_ALPHABET) for _ in range(CODE_LENGTH))
+            try:
+                self.db.conn.execute(
+                    """INSERT INTO discount_coupons
+                       (user_id, coupon_code, discount_percent, source, expires_at, expires_ts)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    (user_id, code, discount_percent, source, expires_at, expires_ts)
+                )
+                self.db.conn.commit()
+            except sqlite3.IntegrityError:
+                self.db.conn.rollback()
+                logger.warning("Coupon code collision, generating a new one")
+                continue
+            except Exception as e:
+                self.db.conn.rollback()
+                logger.error(f"Error creating discount coupon: {e}")
+                return None
+            invalidate_coupons(user_id)
+            logger.info(f"Created {discount_percent}% discount coupon {code} for user {user_id}")
+            return code
+        logger.error(f"Could not generate a unique coupon code for user {user_id}")
+        return None
+
+    def validate(self, code: str, user_id: int) -> dict:
+        """Check a code against the user's active coupons; the table is read only to explain a rejection"""
+        coupon = next((c for c in self.get_active(user_id) if c.code == code), None)
+        if coupon is not None:
+            return {
+                "valid": True,
+                "discount_percent": coupon.discount_percent,
+                "coupon_id": coupon.id,
+                "message": f"Kupon başarıyla uygulandı! %{coupon.discount_percent} indirim kazandınız."
+            }
+        try:
+            row = self.db.conn.execute(
+                "SELECT is_used, expires_ts FROM discount_coupons WHERE coupon_code = ? AND user_id = ?",
+                (code, user_id)
+            ).fetchone()
+        except Exception as e:
+            logger.error(f"Error validating coupon: {e}")
+            return {"valid": False, "message": "Kupon doğrulanırken bir hata oluştu."}
+        if not row:
+            return {"valid": False, "message": "Geçersiz kupon kodu."}
+        if row[0] == COUPON_USED:
+            return {"valid": False, "message": "Bu kupon daha önce kullanılmış."}
+        return {"valid": False, "message": "Bu kupon süresi dolmuş."}
+
+    def redeem(self, coupon_id: int) -> bool:
+        """Mark a coupon as used in its own transaction"""
+        try:
+            redeemed = redeem_coupon(self.db.cur, coupon_id)
+            self.db.conn.commit()
+            return redeemed
+        except Exception as e:
+            logger.error(f"Error applying coupon: {e}")
+            return False
+
+    def sweep(self) -> int:
+        """Retire expired coupons, returns how many were retired"""
+        try:
+            rows = self.db.conn.execute(
+                """UPDATE discount_coupons SET is_used = ?
+                   WHERE is_used = ? AND expires_ts <= ?
+                   RETURNING user_id""",
+                (COUPON_EXPIRED, COUPON_ACTIVE, int(time.time()))
+            ).fetchall()
+            self.db.conn.commit()
+        except Exception as e:
+            logger.error(f"Error retiring expired coupons: {e}")
+            return 0
+        for user_id in {row[0] for row in rows}:
+            invalidate_coupons(user_id)
+        return len(rows)
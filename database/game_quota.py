@@ -0,0 +1,93 @@
+from typing import Tuple, TYPE_CHECKING
+from datetime import date, datetime, timedelta
+import logging
+
+from .process_cache import ProcessCache
+
+if TYPE_CHECKING:
+    from .core import Database
+
+logger = logging.getLogger(__name__)
+
+DAILY_GAME_CHANCES = 5
+
+# user_id -> (gün numarası, o gün kullanılan hak)
+_quota: ProcessCache[int, Tuple[int, int]] = ProcessCache()
+
+
+def today_number() -> int:
+    """Local day number; quotas reset at midnight"""
+    return date.today().toordinal()
+
+
+class GameQuotaDB:
+    """
+    Daily game chances stored as (day, used)
+
+    A record from an earlier day simply means nothing was used today, so
+    there is no reset write and no timestamp parsing: remaining chances
+    are derived from the day number and the used count.
+    """
+
+    def __init__(self, db: 'Database'):
+        self.db = db
+
+    def setup(self):
+        """Create the compact quota table"""
+        self.db.cur.execute('''
+        CREATE TABLE IF NOT EXISTS game_quota (
+            user_id INTEGER PRIMARY KEY,
+            day INTEGER NOT NULL,
+            used INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+
+    def _get_state(self, user_id: int) -> Tuple[int, int]:
+        state = _quota.get(user_id)
+        if state is not None:
+            return state
+        row = self.db.conn.execute(
+            "SELECT day, used FROM game_quota WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        state = (row[0], row[1]) if row else (0, 0)
+        return _quota.setdefault(user_id, state)
+
+    def remaining(self, user_id: int) -> int:
+        """Chances left today, without writing anything"""
+        try:
+            day, used = self._get_state(user_id)
+        except Exception as e:
+            logger.error(f"Error getting game quota: {e}")
+            return DAILY_GAME_CHANCES
+        if day != today_number():
+            return DAILY_GAME_CHANCES
+        return max(0, DAILY_GAME_CHANCES - used)
+
+    def consume(self, user_id: int) -> bool:
+        """Use one chance with a single conditional upsert; False if none are left"""
+        today = today_number()
+        # Önbellek bugünün hakkının bittiğini biliyorsa veritabanına gitme
+        state = _quota.get(user_id)
+        if state is not None and state[0] == today and state[1] >= DAILY_GAME_CHANCES:
+            return False
+        try:
+            row = self.db.conn.execute("""
+                INSERT INTO game_quota (user_id, day, used) VALUES (?, ?, 1)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    used = CASE WHEN day = excluded.day THEN used + 1 ELSE 1 END,
+                    day = excluded.day
+                WHERE day != excluded.day OR used < ?
+                RETURNING used
+            """, (user_id, today, DAILY_GAME_CHANCES)).fetchone()
+            self.db.conn.commit()
+        except Exception as e:
+            logger.error(f"Error using game chance: {e}")
+            return False
+
+        _quota.set(user_id, (today, row[0] if row else DAILY_GAME_CHANCES))
+        return row is not None
+
+    @staticmethod
+    def next_reset_time() -> datetime:
+        """Next midnight, when every quota starts over"""
+        return datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
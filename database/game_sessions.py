@@ -0,0 +1,111 @@
+from typing import Dict, Tuple, TYPE_CHECKING
+import sqlite3
+import threading
+import logging
+import time
+
+if TYPE_CHECKING:
+    from .core import Database
+
+logger = logging.getLogger(__name__)
+
+# Oturum süresi: oyun açıldıktan sonra skorun kaydedilebileceği süre (saniye)
+_ttl = {'seconds': 2 * 60 * 60}
+
+# Bu süreçte açılan oturumlar: session_id -> (user_id, bitiş zamanı)
+_sessions: Dict[str, Tuple[int, float]] = {}
+_lock = threading.Lock()
+
+
+def set_session_ttl(seconds: int):
+    _ttl['seconds'] = seconds
+
+
+def _expiry_modifier() -> str:
+    # created_at CURRENT_TIMESTAMP (UTC) olarak yazılır; aynı biçimle karşılaştırılır
+    return f"-{int(_ttl['seconds'])} seconds"
+
+
+def claim_session(cur: sqlite3.Cursor, user_id: int, session_id: str) -> bool:
+    """
+    Mark an unexpired, unused session of the user as used, on the caller's
+    cursor so it commits together with the score
+    """
+    cur.execute(
+        """UPDATE game_sessions SET is_used = 1
+           WHERE session_id = ? AND user_id = ? AND is_used = 0
+             AND created_at >= datetime('now', ?)""",
+        (session_id, user_id, _expiry_modifier())
+    )
+    if cur.rowcount != 1:
+        return False
+    with _lock:
+        _sessions.pop(session_id, None)
+    return True
+
+
+class GameSessionsDB:
+    """
+    Game sessions with an expiry
+
+    A session can be used for one score within the TTL. Sessions issued by
+    this process are validated from memory, others with one lookup on the
+    unique session_id index; expired and used rows are purged periodically.
+    """
+
+    def __init__(self, db: 'Database'):
+        self.db = db
+
+    def setup(self):
+        """Index used by the purge"""
+        self.db.cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_game_sessions_created ON game_sessions(created_at)"
+        )
+
+    def create(self, user_id: int, session_id: str) -> bool:
+        """Issue a new session for a user"""
+        try:
+            self.db.conn.execute(
+                "INSERT INTO game_sessions (user_id, session_id) VALUES (?, ?)",
+                (user_id, session_id)
+            )
+            self.db.conn.commit()
+        except Exception as e:
+            logger.error(f"Error creating game session: {e}")
+            return False
+        with _lock:
+            _sessions[session_id] = (user_id, time.time() + _ttl['seconds'])
+        return True
+
+    def validate(self, user_id: int, session_id: str) -> bool:
+        """Whether the session belongs to the user, is unused and has not expired"""
+        cached = _sessions.get(session_id)
+        if cached is not None:
+            return cached[0] == user_id and cached[1] > time.time()
+        try:
+            row = self.db.conn.execute(
+                """SELECT user_id FROM game_sessions
+                   WHERE session_id = ? AND is_used = 0 AND created_at >= datetime('now', ?)""",
+                (session_id, _expiry_modifier())
+            ).fetchone()
+        except Exception as e:
+            logger.error(f"Error validating game session: {e}")
+            return False
+        return row is not None and row[0] == user_id
+
+    def purge(self) -> int:
+        """Delete used and expired sessions, returns the number of rows removed"""
+        now = time.time()
+        with _lock:
+            for session_id in [s for s, (_, expires) in _sessions.items() if expires <= now]:
+                del _sessions[session_id]
+        try:
+            cur = self.db.conn.execute(
+                "DELETE FROM game_sessions WHERE is_used = 1 OR created_at < datetime('now', ?)",
+                (_expiry_modifier(),)
+            )
+            self.db.conn.commit()
+            return cur.rowcount
+        except Exception as e:
+            logger.error(f"Error purging game sessions: {e}")
+            return 0
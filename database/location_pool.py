@@ -0,0 +1,123 @@
+from typing import List, Dict, Set, NamedTuple, TYPE_CHECKING
+import logging
+
+from .process_cache import ProcessCache
+
+if TYPE_CHECKING:
+    from .core import Database
+
+logger = logging.getLogger(__name__)
+
+
+class PoolAlert(NamedTuple):
+    """A product crossing a location pool watermark"""
+    product_id: int
+    # 'low' (alt eşiğin altına düştü) veya 'recovered' (üst eşiğe ulaştı)
+    kind: str
+    count: int
+
+
+# Ürün başına müsait konum sayısı, _loaded olana kadar ilk kullanımda yüklenir;
+# _low ve _alerts sayılarla birlikte _counts.lock altında güncellenir
+_counts: ProcessCache[int, int] = ProcessCache()
+_loaded = False
+_low: Set[int] = set()
+_alerts: List[PoolAlert] = []
+
+# Histerezis: sayı low_watermark altına düşünce uyarı, high_watermark'a çıkınca düzeldi
+_watermarks = {'low': 3, 'high': 6}
+
+
+def set_watermarks(low: int, high: int):
+    """Configure the alert thresholds; high is kept above low"""
+    _watermarks['low'] = low
+    _watermarks['high'] = max(high, low + 1)
+
+
+def _evaluate(product_id: int, count: int):
+    # _counts.lock altında çağrılır
+    if product_id in _low:
+        if count >= _watermarks['high']:
+            _low.discard(product_id)
+            _alerts.append(PoolAlert(product_id, 'recovered', count))
+    elif count < _watermarks['low']:
+        _low.add(product_id)
+        _alerts.append(PoolAlert(product_id, 'low', count))
+
+
+def load_location_counts(db: 'Database') -> Dict[int, int]:
+    """Load available location counts for all products with one query"""
+    global _loaded
+    try:
+        rows = db.conn.execute("""
+            SELECT p.id, COUNT(l.id)
+            FROM products p
+            LEFT JOIN locations l ON l.product_id = p.id AND l.is_used = 0
+            GROUP BY p.id
+        """).fetchall()
+    except Exception as e:
+        logger.error(f"Error loading location counts: {e}")
+        return _counts.snapshot()
+
+    with _counts.lock:
+        counts = dict(rows)
+        # Silinen ürünlerin durumu unutulur
+        _low.intersection_update(counts)
+        for product_id, count in counts.items():
+            _evaluate(product_id, count)
+        _counts.replace(counts)
+        _loaded = True
+    return counts
+
+
+def invalidate_location_counts():
+    """Reload counts on next use (products added/removed, bulk resets)"""
+    global _loaded
+    with _counts.lock:
+        _loaded = False
+        _counts.invalidate()
+
+
+def get_location_counts(db: 'Database') -> Dict[int, int]:
+    """Available locations per product, loaded once and then kept up to date by events"""
+    if not _loaded:
+        return load_location_counts(db)
+    return _counts.snapshot()
+
+
+def get_location_count(db: 'Database', product_id: int) -> int:
+    """Available locations of a product, without touching the locations table"""
+    if not _loaded:
+        return load_location_counts(db).get(product_id, 0)
+    return _counts.get(product_id) or 0
+
+
+def location_pool_changed(product_id: int, delta: int):
+    """Apply an add (+n) or dispense (-n) event to the counters"""
+    with _counts.lock:
+        if not _loaded:
+            return
+        count = max((_counts.get(product_id) or 0) + delta, 0)
+        _counts.set(product_id, count)
+        _evaluate(product_id, count)
+
+
+def drain_pool_alerts() -> List[PoolAlert]:
+    """
+    Take the alerts collected since the last digest
+
+    Alerts of a product alternate between 'low' and 'recovered'; an even
+    number of them cancels out, otherwise the latest one is reported.
+    """
+    with _counts.lock:
+        alerts = list(_alerts)
+        _alerts.clear()
+    by_product: Dict[int, List[PoolAlert]] = {}
+    for alert in alerts:
+        by_product.setdefault(alert.product_id, []).append(alert)
+    return [events[-1] for events in by_product.values() if len(events) % 2 == 1]
+
+
+def get_low_products() -> Set[int]:
+    with _counts.lock:
+        return set(_low)
@@ -0,0 +1,218 @@
+import os
+import time
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Optional, List, Dict, Any
+
+from .archive import archive_path_for
+
+logger = logging.getLogger(__name__)
+
+# PRAGMA auto_vacuum değerleri
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+class BackupRestarted(Exception):
+    """Raised when the source DB keeps changing under a chunked backup"""
+
+
+class DatabaseMaintenance:
+    """
+    Online backup, space reclamation and planner statistics
+
+    Uses its own connection so long running steps never hold the shared
+    handler connections. All methods are blocking and meant to be run with
+    asyncio.to_thread from the bot.
+    """
+
+    def __init__(self, db_name: str, backup_dir: str = 'backups', keep: int = 7,
+                 pages_per_step: int = 512, step_sleep: float = 0.05, max_restarts: int = 5):
+        self.db_name = db_name
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.pages_per_step = pages_per_step
+        self.step_sleep = step_sleep
+        self.max_restarts = max_restarts
+
+    def _connect(self, path: str) -> sqlite3.Connection:
+        return sqlite3.connect(path, timeout=30, check_same_thread=False)
+
+    # Yedekleme
+
+    def _backup_file(self, source_path: str, target_path: str) -> None:
+        """Copy one DB with the sqlite3 backup API in page-sized steps"""
+        tmp_path = target_path + '.part'
+        source = self._connect(source_path)
+        target = self._connect(tmp_path)
+        state = {'remaining': None, 'restarts': 0}
+
+        def progress(status, remaining, total):
+            # Kaynak başka bağlantıdan değişirse yedek baştan başlar
+            if state['remaining'] is not None and remaining > state['remaining']:
+                state['restarts'] += 1
+                if state['restarts'] > self.max_restarts:
+                    raise BackupRestarted()
+            state['remaining'] = remaining
+
+        try:
+            try:
+                source.backup(target, pages=self.pages_per_step, progress=progress, sleep=self.step_sleep)
+            except BackupRestarted:
+                # Çok yoğun yazma varsa tek adımda kopyala (küçük DB için milisaniyeler)
+                logger.info(f"Backup of {source_path} restarted too often, copying in one step")
+                source.backup(target, pages=-1)
+            target.close()
+            os.replace(tmp_path, target_path)
+        finally:
+            source.close()
+            try:
+                target.close()
+            except Exception:
+                pass
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def backup(self) -> Optional[str]:
+        """Create a timestamped backup of the main and archive DBs, returns the main backup path"""
+        try:
+            os.makedirs(self.backup_dir, exist_ok=True)
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            started = time.monotonic()
+
+            base = os.path.splitext(os.path.basename(self.db_name))[0]
+            target = os.path.join(self.backup_dir, f"{base}_{stamp}.db")
+            self._backup_file(self.db_name, target)
+
+            archive_path = archive_path_for(self.db_name)
+            if os.path.exists(archive_path):
+                archive_base = os.path.splitext(os.path.basename(archive_path))[0]
+                self._backup_file(archive_path, os.path.join(self.backup_dir, f"{archive_base}_{stamp}.db"))
+
+            logger.info(f"Database backup created: {target} ({time.monotonic() - started:.1f}s)")
+            self.rotate_backups()
+            return target
+        except Exception as e:
+            logger.error(f"Error creating database backup: {e}")
+            return None
+
+    def list_backups(self) -> List[str]:
+        """Main DB backups, newest first"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        base = os.path.splitext(os.path.basename(self.db_name))[0]
+        return sorted(
+            (os.path.join(self.backup_dir, name) for name in os.listdir(self.backup_dir)
+             if name.startswith(f"{base}_") and name.endswith('.db')
+             and not name.startswith(f"{base}_archive_")),
+            reverse=True
+        )
+
+    def rotate_backups(self) -> int:
+        """Keep only the newest `keep` backups (and their archive copies)"""
+        removed = 0
+        for path in self.list_backups()[self.keep:]:
+            stamp = os.path.basename(path)[:-3].rsplit('_', 2)[-2:]
+            archive_base = os.path.splitext(os.path.basename(archive_path_for(self.db_name)))[0]
+            archive_copy = os.path.join(self.backup_dir, f"{archive_base}_{'_'.join(stamp)}.db")
+            for file_path in (path, archive_copy):
+                try:
+                    if os.path.exists(file_path):
+                        os.remove(file_path)
+                        removed += 1
+                except Exception as e:
+                    logger.error(f"Error removing old backup {file_path}: {e}")
+        if removed:
+            logger.info(f"Removed {removed} old backup files")
+        return removed
+
+    # Alan geri kazanımı
+
+    def get_space_stats(self) -> Dict[str, Any]:
+        """Page counts, free pages and auto_vacuum mode"""
+        conn = self._connect(self.db_name)
+        try:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+            return {
+                'size_mb': page_size * page_count / (1024 * 1024),
+                'free_mb': page_size * freelist / (1024 * 1024),
+                'free_pages': freelist,
+                'auto_vacuum': auto_vacuum
+            }
+        finally:
+            conn.close()
+
+    def enable_incremental_vacuum(self) -> bool:
+        """
+        Switch the DB to auto_vacuum=INCREMENTAL
+
+        Changing the mode needs one full VACUUM, so this is meant to be called
+        at startup before the bot starts polling. It is a no-op afterwards.
+        """
+        conn = self._connect(self.db_name)
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+                return False
+            started = time.monotonic()
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            logger.info(f"Database switched to incremental auto-vacuum ({time.monotonic() - started:.1f}s)")
+            return True
+        except Exception as e:
+            logger.error(f"Error enabling incremental vacuum: {e}")
+            return False
+        finally:
+            conn.close()
+
+    def incremental_vacuum(self, pages_per_step: int = 200, max_pages: Optional[int] = None) -> int:
+        """Release free pages in small steps so writers only wait for one step at a time"""
+        conn = self._connect(self.db_name)
+        released = 0
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+                return 0
+            while True:
+                free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if free == 0 or (max_pages is not None and released >= max_pages):
+                    break
+                step = min(pages_per_step, free)
+                # execute() pragmayı tek adım çalıştırır (1 sayfa); executescript sonuna kadar çalıştırır
+                conn.executescript(f"PRAGMA incremental_vacuum({int(step)});")
+                freed = free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if freed <= 0:
+                    break
+                released += freed
+                time.sleep(self.step_sleep)
+            if released:
+                logger.info(f"Incremental vacuum released {released} pages")
+            return released
+        except Exception as e:
+            logger.error(f"Error running incremental vacuum: {e}")
+            return released
+        finally:
+            conn.close()
+
+    def optimize(self) -> bool:
+        """Refresh query planner statistics where SQLite thinks it is useful"""
+        conn = self._connect(self.db_name)
+        try:
+            conn.execute("PRAGMA optimize")
+            return True
+        except Exception as e:
+            logger.error(f"Error running PRAGMA optimize: {e}")
+            return False
+        finally:
+            conn.close()
+
+    def run_all(self) -> Dict[str, Any]:
+        """One maintenance cycle: backup, rotate, reclaim space, optimize"""
+        result = {
+            'backup': self.backup(),
+            'released_pages': self.incremental_vacuum(),
+            'optimized': self.optimize()
+        }
+        result.update(self.get_space_stats())
+        return result
@@ -0,0 +1,125 @@
+from typing import Optional, List, Tuple, Set, TYPE_CHECKING
+import logging
+
+if TYPE_CHECKING:
+    from .core import Database
+
+logger = logging.getLogger(__name__)
+
+# Bir dosyayı kullanan tüm yerler: ürünler, konumlar ve henüz gönderilmemiş bildirimler
+_REFERENCES_SQL = """
+    SELECT image_path AS path FROM products WHERE image_path IS NOT NULL
+    UNION ALL
+    SELECT image_path FROM locations
+    UNION ALL
+    SELECT photo_path FROM notification_outbox
+    WHERE status IN ('pending', 'sending') AND photo_path IS NOT NULL
+"""
+
+
+class MediaDB:
+    def __init__(self, db: 'Database'):
+        self.db = db
+
+    def setup(self):
+        """Create the content-addressed media table"""
+        self.db.cur.execute('''
+        CREATE TABLE IF NOT EXISTS media_blobs (
+            hash TEXT PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            size INTEGER NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            released_at TIMESTAMP
+        )
+        ''')
+
+    def acquire(self, digest: str, path: str, size: int) -> int:
+        """Register a blob (or add a reference to it), returns the previous refcount"""
+        try:
+            row = self.db.conn.execute(
+                "SELECT refcount FROM media_blobs WHERE hash = ?", (digest,)
+            ).fetchone()
+            self.db.conn.execute(
+                """INSERT INTO media_blobs (hash, path, size, refcount) VALUES (?, ?, ?, 1)
+                   ON CONFLICT (hash) DO UPDATE
+                   SET refcount = refcount + 1, released_at = NULL""",
+                (digest, path, size)
+            )
+            self.db.conn.commit()
+            return row[0] if row else 0
+        except Exception as e:
+            logger.error(f"Error registering media {digest}: {e}")
+            return 0
+
+    def release(self, path: str) -> Optional[int]:
+        """Drop one reference, returns the remaining count or None if the path is not a stored blob"""
+        try:
+            row = self.db.conn.execute(
+                """UPDATE media_blobs
+                   SET refcount = MAX(refcount - 1, 0),
+                       released_at = CASE WHEN refcount <= 1 THEN CURRENT_TIMESTAMP ELSE released_at END
+                   WHERE path = ?
+                   RETURNING refcount""",
+                (path,)
+            ).fetchone()
+            self.db.conn.commit()
+            return row[0] if row else None
+        except Exception as e:
+            logger.error(f"Error releasing media {path}: {e}")
+            return None
+
+    def is_location_image(self, path: str) -> bool:
+        """Whether a location row already uses this file (duplicate photo)"""
+        row = self.db.conn.execute(
+            "SELECT 1 FROM locations WHERE image_path = ? LIMIT 1", (path,)
+        ).fetchone()
+        return row is not None
+
+    def reconcile(self, grace_minutes: int = 10) -> List[str]:
+        """
+        Recount references from the tables and remove unreferenced blobs
+
+        Returns the paths whose rows were deleted; the caller removes the
+        files. Blobs released less than `grace_minutes` ago are kept so an
+        in-flight upload can still claim them.
+        """
+        try:
+            self.db.conn.execute(f"""
+                WITH refs AS ({_REFERENCES_SQL})
+                UPDATE media_blobs SET
+                    refcount = (SELECT COUNT(*) FROM refs WHERE refs.path = media_blobs.path),
+                    released_at = COALESCE(released_at, CURRENT_TIMESTAMP)
+            """)
+            self.db.conn.execute(
+                "UPDATE media_blobs SET released_at = NULL WHERE refcount > 0"
+            )
+            paths = [row[0] for row in self.db.conn.execute(
+                """DELETE FROM media_blobs
+                   WHERE refcount = 0 AND released_at < datetime('now', ?)
+                   RETURNING path""",
+                (f'-{int(grace_minutes)} minutes',)
+            ).fetchall()]
+            self.db.conn.commit()
+            return paths
+        except Exception as e:
+            logger.error(f"Error reconciling media references: {e}")
+            self.db.conn.rollback()
+            return []
+
+    def get_known_paths(self) -> Tuple[Set[str], Set[str]]:
+        """(stored blob paths, paths referenced by the tables)"""
+        blobs = {row[0] for row in self.db.conn.execute("SELECT path FROM media_blobs")}
+        referenced = {row[0] for row in self.db.conn.execute(_REFERENCES_SQL)}
+        return blobs, referenced
+
+    def get_stats(self) -> Tuple[int, int, int]:
+        """(blob count, total bytes, total references)"""
+        try:
+            count, size, refs = self.db.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(refcount), 0) FROM media_blobs"
+            ).fetchone()
+            return count, size, refs
+        except Exception as e:
+            logger.error(f"Error getting media stats: {e}")
+            return 0, 0, 0
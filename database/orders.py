@@ -97,69 +97,9 @@ class OrdersDB:
             return []
             
     def update_request_status(self, request_id: int, status: str) -> bool:
-        """Update purchase request status"""
-        try:
-            # Get user_id from purchase request
-            self.db.execute(
-                "SELECT user_id FROM purchase_requests WHERE id = ?",
-                (request_id,)
-            )
-            result = self.db.cur.fetchone()
-            if not result:
-                logger.error(f"Purchase request #{request_id} not found")
-                return False
-            
-            user_id = result[0]
-            
-            # If status is rejected, increment failed_payments
-            if status == 'rejected':
-                self.db.execute(
-                    """UPDATE users 
-                       SET failed_payments = failed_payments + 1 
-                       WHERE telegram_id = ?""",
-                    (user_id,)
-                )
-                
-                # Check if user should be banned
-                self.db.execute(
-                    """SELECT failed_payments 
-                       FROM users 
-                       WHERE telegram_id = ?""",
-                    (user_id,)
-                )
-                failed_payments = self.db.cur.fetchone()[0]
-                
-                if failed_payments >= 3:
-                    self.db.execute(
-                        """UPDATE users 
-                           SET is_banned = 1 
-                           WHERE telegram_id = ?""",
-                        (user_id,)
-                    )
-                    logger.warning(f"User {user_id} has been banned due to too many failed payments")
-            
-            # If status is completed, reset failed_payments
-            elif status == 'completed':
-                self.db.execute(
-                    """UPDATE users 
-                       SET failed_payments = 0 
-                       WHERE telegram_id = ?""",
-                    (user_id,)
-                )
-            
-            self.db.execute(
-                """UPDATE purchase_requests 
-                   SET status = ?, updated_at = CURRENT_TIMESTAMP 
-                   WHERE id = ?""",
-                (status, request_id)
-            )
-            self.db.commit()
-            logger.info(f"Successfully updated request #{request_id} status")
-            return True
-        except Exception as e:
-            logger.exception(f"Error updating purchase request #{request_id}: {str(e)}")
-            return False
-            
+        """Update purchase request status in a single transaction"""
+        return self.db.transition_purchase_request(request_id, status).ok
+
     def get_user_orders(self, user_id: int, status: Optional[str] = None) -> List[Tuple]:
         """Get user's purchase requests filtered by status"""
         try:
@@ -0,0 +1,202 @@
+from typing import Optional, List, Dict, Any, NamedTuple, TYPE_CHECKING
+import json
+import time
+import logging
+
+if TYPE_CHECKING:
+    from .core import Database
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxMessage(NamedTuple):
+    """A user notification waiting to be delivered by the dispatcher"""
+    # Aynı anahtarla ikinci kayıt eklenmez (ör. 'order:12:completed')
+    key: str
+    chat_id: int
+    text: str
+    photo_path: Optional[str] = None
+    # InlineKeyboardMarkup.to_dict() çıktısı
+    reply_markup: Optional[Dict[str, Any]] = None
+    # Fotoğraf gönderildikten sonra dosyayı sil (konum fotoğrafları)
+    remove_photo: bool = False
+    # Kullanıcının önceki bildirim mesajını sil
+    replace_previous: bool = True
+
+
+def enqueue_notification(cur, message: OutboxMessage) -> bool:
+    """
+    Insert a message into the outbox using the caller's cursor
+
+    Meant to be called inside the transaction that produced the notification,
+    so the message is committed (or rolled back) together with it.
+    """
+    cur.execute(
+        """INSERT OR IGNORE INTO notification_outbox
+           (idempotency_key, chat_id, text, photo_path, reply_markup,
+            remove_photo, replace_previous, next_attempt_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        (
+            message.key,
+            message.chat_id,
+            message.text,
+            message.photo_path,
+            json.dumps(message.reply_markup) if message.reply_markup else None,
+            int(message.remove_photo),
+            int(message.replace_previous),
+            time.time()
+        )
+    )
+    return cur.rowcount > 0
+
+
+class OutboxDB:
+    def __init__(self, db: 'Database'):
+        self.db = db
+
+    def setup(self):
+        """Create the outbox table"""
+        cur = self.db.cur
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS notification_outbox (
+            id INTEGER PRIMARY KEY,
+            idempotency_key TEXT NOT NULL UNIQUE,
+            chat_id INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            photo_path TEXT,
+            reply_markup TEXT,
+            remove_photo INTEGER DEFAULT 0,
+            replace_previous INTEGER DEFAULT 1,
+            status TEXT DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            last_error TEXT,
+            message_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP
+        )
+        ''')
+        cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_outbox_due
+        ON notification_outbox (status, next_attempt_at)
+        ''')
+        # Dağıtıcı son bildirim mesajını buradan okur
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS user_notifications (
+                user_id INTEGER PRIMARY KEY,
+                last_message_id INTEGER,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+    def enqueue(self, message: OutboxMessage) -> bool:
+        """Add a message to the outbox in its own transaction"""
+        try:
+            added = enqueue_notification(self.db.cur, message)
+            self.db.conn.commit()
+            return added
+        except Exception as e:
+            logger.error(f"Error adding notification to outbox: {e}")
+            return False
+
+    def claim_due(self, limit: int = 20, lease: float = 120) -> List[Dict[str, Any]]:
+        """
+        Lease due messages for sending
+
+        A claimed row is moved to 'sending' and hidden for `lease` seconds; if
+        the process dies mid-send it becomes due again after the lease.
+        """
+        now = time.time()
+        try:
+            rows = self.db.conn.execute(
+                """UPDATE notification_outbox
+                   SET status = 'sending', attempts = attempts + 1, next_attempt_at = ?
+                   WHERE id IN (
+                       SELECT id FROM notification_outbox
+                       WHERE status IN ('pending', 'sending') AND next_attempt_at <= ?
+                       ORDER BY next_attempt_at, id
+                       LIMIT ?
+                   )
+                   RETURNING id, idempotency_key, chat_id, text, photo_path, reply_markup,
+                             remove_photo, replace_previous, attempts""",
+                (now + lease, now, limit)
+            ).fetchall()
+            self.db.conn.commit()
+        except Exception as e:
+            logger.error(f"Error claiming outbox messages: {e}")
+            return []
+
+        keys = ('id', 'key', 'chat_id', 'text', 'photo_path', 'reply_markup',
+                'remove_photo', 'replace_previous', 'attempts')
+        messages = []
+        for row in sorted(rows):
+            message = dict(zip(keys, row))
+            message['reply_markup'] = json.loads(message['reply_markup']) if message['reply_markup'] else None
+            message['remove_photo'] = bool(message['remove_photo'])
+            message['replace_previous'] = bool(message['replace_previous'])
+            messages.append(message)
+        return messages
+
+    def mark_sent(self, outbox_id: int, message_id: Optional[int]) -> bool:
+        try:
+            self.db.conn.execute(
+                """UPDATE notification_outbox
+                   SET status = 'sent', message_id = ?, last_error = NULL, sent_at = CURRENT_TIMESTAMP
+                   WHERE id = ?""",
+                (message_id, outbox_id)
+            )
+            self.db.conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error marking outbox message #{outbox_id} as sent: {e}")
+            return False
+
+    def mark_retry(self, outbox_id: int, delay: float, error: str) -> bool:
+        try:
+            self.db.conn.execute(
+                """UPDATE notification_outbox
+                   SET status = 'pending', next_attempt_at = ?, last_error = ?
+                   WHERE id = ?""",
+                (time.time() + delay, error[:500], outbox_id)
+            )
+            self.db.conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error rescheduling outbox message #{outbox_id}: {e}")
+            return False
+
+    def mark_failed(self, outbox_id: int, error: str) -> bool:
+        try:
+            self.db.conn.execute(
+                "UPDATE notification_outbox SET status = 'failed', last_error = ? WHERE id = ?",
+                (error[:500], outbox_id)
+            )
+            self.db.conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error marking outbox message #{outbox_id} as failed: {e}")
+            return False
+
+    def purge_sent(self, days: int = 7) -> int:
+        """Delete delivered messages older than `days`"""
+        try:
+            deleted = self.db.conn.execute(
+                """DELETE FROM notification_outbox
+                   WHERE status = 'sent' AND sent_at < datetime('now', ?)""",
+                (f'-{int(days)} days',)
+            ).rowcount
+            self.db.conn.commit()
+            return deleted
+        except Exception as e:
+            logger.error(f"Error purging outbox: {e}")
+            return 0
+
+    def get_stats(self) -> Dict[str, int]:
+        """Message counts per status"""
+        try:
+            return dict(self.db.conn.execute(
+                "SELECT status, COUNT(*) FROM notification_outbox GROUP BY status"
+            ).fetchall())
+        except Exception as e:
+            logger.error(f"Error getting outbox stats: {e}")
+            return {}
@@ -0,0 +1,258 @@
+import sqlite3
+import pickle
+import asyncio
+import logging
+from typing import Optional, Dict, Any
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+
+class SQLitePersistence(BasePersistence):
+    """Write-behind persistence: changes are kept in memory and flushed in one transaction"""
+
+    def __init__(self, db_name: str, state_store=None, update_interval: float = 60):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=True, chat_data=True, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.db_name = db_name
+        self.state_store = state_store
+        self.conn = sqlite3.connect(db_name, check_same_thread=False)
+        self._setup_tables()
+
+        # Kirli kayıtlar: None değeri silinecek anlamına gelir
+        self._dirty_users: Dict[int, Optional[tuple]] = {}
+        self._dirty_chats: Dict[int, Optional[bytes]] = {}
+        self._dirty_conversations: Dict[tuple, Optional[bytes]] = {}
+        self._dirty_bot_data: Optional[bytes] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def _setup_tables(self):
+        """Create persistence tables"""
+        cur = self.conn.cursor()
+        cur.execute('''CREATE TABLE IF NOT EXISTS persistence_user_data (
+            user_id INTEGER PRIMARY KEY,
+            data BLOB,
+            state BLOB,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+        cur.execute('''CREATE TABLE IF NOT EXISTS persistence_chat_data (
+            chat_id INTEGER PRIMARY KEY,
+            data BLOB,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+        cur.execute('''CREATE TABLE IF NOT EXISTS persistence_bot_data (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            data BLOB
+        )''')
+        cur.execute('''CREATE TABLE IF NOT EXISTS persistence_conversations (
+            name TEXT NOT NULL,
+            conv_key TEXT NOT NULL,
+            state BLOB,
+            PRIMARY KEY (name, conv_key)
+        )''')
+        self.conn.commit()
+
+    @staticmethod
+    def _dumps(value) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _key_to_text(key: tuple) -> str:
+        return ','.join(str(part) for part in key)
+
+    @staticmethod
+    def _text_to_key(text: str) -> tuple:
+        return tuple(int(part) for part in text.split(',') if part)
+
+    # Okuma (uygulama başlarken bir kez çağrılır)
+
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        result = {}
+        try:
+            rows = self.conn.execute("SELECT user_id, data, state FROM persistence_user_data").fetchall()
+            for user_id, data, state in rows:
+                try:
+                    result[user_id] = pickle.loads(data) if data else {}
+                    if self.state_store is not None:
+                        self.state_store.restore(user_id, pickle.loads(state) if state else None)
+                except Exception as e:
+                    logger.error(f"Error loading persisted user data for {user_id}: {e}")
+        except Exception as e:
+            logger.error(f"Error loading user data: {e}")
+        return result
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        result = {}
+        try:
+            rows = self.conn.execute("SELECT chat_id, data FROM persistence_chat_data").fetchall()
+            for chat_id, data in rows:
+                try:
+                    result[chat_id] = pickle.loads(data) if data else {}
+                except Exception as e:
+                    logger.error(f"Error loading persisted chat data for {chat_id}: {e}")
+        except Exception as e:
+            logger.error(f"Error loading chat data: {e}")
+        return result
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        try:
+            row = self.conn.execute("SELECT data FROM persistence_bot_data WHERE id = 1").fetchone()
+            return pickle.loads(row[0]) if row and row[0] else {}
+        except Exception as e:
+            logger.error(f"Error loading bot data: {e}")
+            return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> Dict[tuple, object]:
+        result = {}
+        try:
+            rows = self.conn.execute(
+                "SELECT conv_key, state FROM persistence_conversations WHERE name = ?",
+                (name,)
+            ).fetchall()
+            for conv_key, state in rows:
+                result[self._text_to_key(conv_key)] = pickle.loads(state)
+        except Exception as e:
+            logger.error(f"Error loading conversations for {name}: {e}")
+        return result
+
+    # Yazma (sadece işaretlenir, toplu olarak yazılır)
+
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]) -> None:
+        state = None
+        if self.state_store is not None and user_id in self.state_store:
+            state = self._dumps(self.state_store.snapshot(user_id))
+        self._dirty_users[user_id] = (self._dumps(data), state)
+        self._schedule_flush()
+
+    async def update_chat_data(self, chat_id: int, data: Dict[Any, Any]) -> None:
+        self._dirty_chats[chat_id] = self._dumps(data)
+        self._schedule_flush()
+
+    async def update_bot_data(self, data: Dict[Any, Any]) -> None:
+        self._dirty_bot_data = self._dumps(data)
+        self._schedule_flush()
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]) -> None:
+        value = self._dumps(new_state) if new_state is not None else None
+        self._dirty_conversations[(name, self._key_to_text(key))] = value
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._dirty_users[user_id] = None
+        self._schedule_flush()
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._dirty_chats[chat_id] = None
+        self._schedule_flush()
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict[Any, Any]) -> None:
+        pass
+
+    def _schedule_flush(self):
+        """Write all dirty entries once the current persistence cycle is done"""
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.write_pending()
+            return
+        self._flush_task = loop.create_task(self._flush_soon(), name="Persistence-Flush")
+
+    async def _flush_soon(self):
+        # Aynı döngüdeki diğer update_* çağrılarının da birikmesini bekle
+        await asyncio.sleep(0)
+        self.write_pending()
+
+    def write_pending(self) -> int:
+        """Write all dirty entries in a single transaction, returns number of rows touched"""
+        users, self._dirty_users = self._dirty_users, {}
+        chats, self._dirty_chats = self._dirty_chats, {}
+        conversations, self._dirty_conversations = self._dirty_conversations, {}
+        bot_data, self._dirty_bot_data = self._dirty_bot_data, None
+
+        if not (users or chats or conversations or bot_data is not None):
+            return 0
+
+        try:
+            cur = self.conn.cursor()
+            cur.execute("BEGIN TRANSACTION")
+            cur.executemany(
+                """INSERT INTO persistence_user_data (user_id, data, state, updated_at)
+                   VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                   ON CONFLICT(user_id) DO UPDATE SET
+                       data = excluded.data, state = excluded.state, updated_at = excluded.updated_at""",
+                [(uid, value[0], value[1]) for uid, value in users.items() if value is not None]
+            )
+            cur.executemany(
+                "DELETE FROM persistence_user_data WHERE user_id = ?",
+                [(uid,) for uid, value in users.items() if value is None]
+            )
+            cur.executemany(
+                """INSERT INTO persistence_chat_data (chat_id, data, updated_at)
+                   VALUES (?, ?, CURRENT_TIMESTAMP)
+                   ON CONFLICT(chat_id) DO UPDATE SET
+                       data = excluded.data, updated_at = excluded.updated_at""",
+                [(cid, value) for cid, value in chats.items() if value is not None]
+            )
+            cur.executemany(
+                "DELETE FROM persistence_chat_data WHERE chat_id = ?",
+                [(cid,) for cid, value in chats.items() if value is None]
+            )
+            cur.executemany(
+                """INSERT INTO persistence_conversations (name, conv_key, state)
+                   VALUES (?, ?, ?)
+                   ON CONFLICT(name, conv_key) DO UPDATE SET state = excluded.state""",
+                [(name, key, value) for (name, key), value in conversations.items() if value is not None]
+            )
+            cur.executemany(
+                "DELETE FROM persistence_conversations WHERE name = ? AND conv_key = ?",
+                [(name, key) for (name, key), value in conversations.items() if value is None]
+            )
+            if bot_data is not None:
+                cur.execute(
+                    "INSERT OR REPLACE INTO persistence_bot_data (id, data) VALUES (1, ?)",
+                    (bot_data,)
+                )
+            cur.execute("COMMIT")
+            written = len(users) + len(chats) + len(conversations) + (1 if bot_data is not None else 0)
+            logger.debug(f"Persistence flushed {written} entries")
+            return written
+        except Exception as e:
+            logger.error(f"Error flushing persistence: {e}")
+            try:
+                self.conn.execute("ROLLBACK")
+            except Exception:
+                pass
+            # Yazılamayan kayıtları bir sonraki denemeye geri koy (yenileri öncelikli)
+            self._dirty_users = {**users, **self._dirty_users}
+            self._dirty_chats = {**chats, **self._dirty_chats}
+            self._dirty_conversations = {**conversations, **self._dirty_conversations}
+            if self._dirty_bot_data is None:
+                self._dirty_bot_data = bot_data
+            return 0
+
+    async def flush(self) -> None:
+        """Called by the application on shutdown"""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        self.write_pending()
+        try:
+            self.conn.close()
+        except Exception as e:
+            logger.error(f"Error closing persistence connection: {e}")
@@ -0,0 +1,58 @@
+from typing import Optional, Dict, Generic, TypeVar, Mapping
+import threading
+
+K = TypeVar('K')
+V = TypeVar('V')
+
+
+class ProcessCache(Generic[K, V]):
+    """
+    Keyed cache shared by every Database object in the process
+
+    Each handler module opens its own Database('shop.db'), so a cache kept on
+    a Database (or one of its XxxDB helpers) would exist once per module and
+    go stale as soon as another module writes. Caches are therefore module
+    globals of this type. Reads are plain dict lookups; writes take the lock,
+    which is reentrant so the owning module can also hold it around a
+    compound update of its own state.
+    """
+
+    def __init__(self):
+        self._data: Dict[K, V] = {}
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K) -> Optional[V]:
+        return self._data.get(key)
+
+    def set(self, key: K, value: V):
+        with self.lock:
+            self._data[key] = value
+
+    def setdefault(self, key: K, value: V) -> V:
+        """Store value unless another caller filled the key first; returns the stored one"""
+        with self.lock:
+            return self._data.setdefault(key, value)
+
+    def update(self, values: Mapping[K, V]):
+        with self.lock:
+            self._data.update(values)
+
+    def replace(self, values: Mapping[K, V]):
+        """Swap in a whole new content, e.g. after a full reload"""
+        with self.lock:
+            self._data = dict(values)
+
+    def snapshot(self) -> Dict[K, V]:
+        with self.lock:
+            return dict(self._data)
+
+    def invalidate(self, key: Optional[K] = None):
+        """Drop one key, or everything when no key is given"""
+        with self.lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
@@ -0,0 +1,314 @@
+from typing import Optional, List, Dict, Any, NamedTuple
+from collections import deque
+from datetime import datetime
+import re
+import sys
+import time
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+# Yavaş sorgular ayrıca kendi dosyasına yazılabilsin diye ayrı logger
+slow_logger = logging.getLogger('database.slow_queries')
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.I)
+SPACE_RE = re.compile(r"\s+")
+# EXPLAIN QUERY PLAN yalnızca bu ifadeler için alınır
+EXPLAINABLE_RE = re.compile(r"^\s*(SELECT|WITH|UPDATE|DELETE|INSERT|REPLACE)\b", re.I)
+# İndekssiz tablo taraması: "SCAN users" (USING INDEX içermeyen)
+FULL_SCAN_RE = re.compile(r"^SCAN (?!CONSTANT ROW)(\S+)(?!.*\bUSING\b)")
+
+# Profil ayarları; set_query_profiling ile değiştirilir
+_enabled = False
+_slow_seconds = 0.05
+_explain_interval = 300.0
+_max_recent = 50
+
+
+class SlowQuery(NamedTuple):
+    at: float
+    fingerprint: str
+    origin: str
+    duration: float
+    rows: int
+    plan: Optional[List[str]]
+    full_scan: bool
+
+
+class QueryStats:
+    __slots__ = ('count', 'total', 'max', 'rows', 'slow', 'origin', 'plan', 'full_scan', 'explained_at')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.slow = 0
+        self.origin = ''
+        self.plan: Optional[List[str]] = None
+        self.full_scan = False
+        self.explained_at = 0.0
+
+
+# Süreç genelinde parmak izi başına istatistikler ve son yavaş sorgular
+_stats: Dict[str, QueryStats] = {}
+_recent: deque = deque(maxlen=_max_recent)
+_lock = threading.Lock()
+
+
+def set_query_profiling(enabled: bool, slow_ms: float = 50, explain_interval: float = 300,
+                        max_recent: int = 50):
+    """Turn statement profiling on or off for every profiled connection"""
+    global _enabled, _slow_seconds, _explain_interval, _recent
+    _enabled = enabled
+    _slow_seconds = slow_ms / 1000
+    _explain_interval = explain_interval
+    with _lock:
+        if _recent.maxlen != max_recent:
+            _recent = deque(_recent, maxlen=max_recent)
+
+
+def is_profiling() -> bool:
+    return _enabled
+
+
+def fingerprint(sql: str) -> str:
+    """Statement shape with literals and IN lists collapsed"""
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = SPACE_RE.sub(' ', sql).strip()
+    return IN_LIST_RE.sub('IN (...)', sql)
+
+
+def reset_query_stats():
+    with _lock:
+        _stats.clear()
+        _recent.clear()
+
+
+def get_query_stats(limit: int = 10) -> List[Dict[str, Any]]:
+    """Profiled statements ordered by total time spent"""
+    with _lock:
+        items = sorted(_stats.items(), key=lambda item: item[1].total, reverse=True)[:limit]
+        return [{
+            'fingerprint': fp,
+            'origin': s.origin,
+            'count': s.count,
+            'total': s.total,
+            'avg': s.total / s.count,
+            'max': s.max,
+            'rows': s.rows,
+            'slow': s.slow,
+            'plan': s.plan,
+            'full_scan': s.full_scan,
+        } for fp, s in items]
+
+
+def get_recent_slow() -> List[SlowQuery]:
+    with _lock:
+        return list(_recent)
+
+
+def _explain(conn: sqlite3.Connection, sql: str, params) -> List[str]:
+    # Düz sqlite3.Cursor: profil dışı, kendini ölçmez
+    cur = sqlite3.Cursor(conn)
+    try:
+        rows = cur.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    finally:
+        cur.close()
+    return [row[3] for row in rows]
+
+
+def _record(conn: sqlite3.Connection, sql: str, params, origin: str, duration: float, rows: int):
+    fp = fingerprint(sql)
+    slow = duration >= _slow_seconds
+    with _lock:
+        stats = _stats.get(fp)
+        if stats is None:
+            stats = _stats[fp] = QueryStats()
+        stats.count += 1
+        stats.total += duration
+        stats.max = max(stats.max, duration)
+        stats.rows += rows
+        stats.origin = origin
+        if not slow:
+            return
+        stats.slow += 1
+        # Aynı sorgunun planı en fazla explain_interval'da bir alınır
+        explain = (params is not None and EXPLAINABLE_RE.match(sql) is not None
+                   and time.time() - stats.explained_at >= _explain_interval)
+        if explain:
+            stats.explained_at = time.time()
+
+    plan = None
+    if explain:
+        try:
+            plan = _explain(conn, sql, params)
+        except Exception as e:
+            logger.debug(f"Could not explain query: {e}")
+    full_scan = bool(plan) and any(FULL_SCAN_RE.match(step) for step in plan)
+    with _lock:
+        if plan is not None:
+            stats.plan = plan
+            stats.full_scan = full_scan
+        else:
+            full_scan = stats.full_scan
+        _recent.append(SlowQuery(time.time(), fp, origin, duration, rows, plan, full_scan))
+
+    slow_logger.warning(
+        f"Slow query {duration * 1000:.1f}ms rows={rows} origin={origin}"
+        f"{' FULL SCAN' if full_scan else ''}: {fp}"
+        + (f" | plan: {' / '.join(plan)}" if plan else "")
+    )
+
+
+def _caller() -> str:
+    # Bu modüldeki çerçeveler (cursor/connection execute) atlanır
+    frame = sys._getframe(1)
+    while frame.f_back is not None and frame.f_globals.get('__name__') == __name__:
+        frame = frame.f_back
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """
+    Cursor that times statements while profiling is enabled
+
+    Time spent fetching rows is added to the statement, which is recorded
+    once its rows are exhausted, fetched with fetchall or the cursor moves
+    on to the next statement.
+    """
+
+    _pending = None
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            sql, params, origin, duration, rows = pending
+            _record(self.connection, sql, params, origin, duration, rows)
+
+    def execute(self, sql, parameters=()):
+        if not _enabled:
+            return super().execute(sql, parameters)
+        self._finish()
+        origin = _caller()
+        started = time.perf_counter()
+        super().execute(sql, parameters)
+        duration = time.perf_counter() - started
+        if self.description is None:
+            self._pending = (sql, parameters, origin, duration, max(self.rowcount, 0))
+            self._finish()
+        else:
+            self._pending = (sql, parameters, origin, duration, 0)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        if not _enabled:
+            return super().executemany(sql, seq_of_parameters)
+        self._finish()
+        origin = _caller()
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        _record(self.connection, sql, None, origin, time.perf_counter() - started, max(self.rowcount, 0))
+        return self
+
+    def _fetched(self, started: float, rows: int, done: bool):
+        if self._pending is not None:
+            sql, params, origin, duration, count = self._pending
+            self._pending = (sql, params, origin, duration + time.perf_counter() - started, count + rows)
+            if done:
+                self._finish()
+
+    def fetchone(self):
+        if self._pending is None:
+            return super().fetchone()
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        if self._pending is None:
+            return super().fetchmany(size) if size is not None else super().fetchmany()
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(started, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        if self._pending is None:
+            return super().fetchall()
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows), True)
+        return rows
+
+    def __next__(self):
+        if self._pending is None:
+            return super().__next__()
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0, True)
+            raise
+        self._fetched(started, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class ProfilingConnection(sqlite3.Connection):
+    """Connection whose cursors (including conn.execute) are ProfilingCursors"""
+
+    def cursor(self, factory=ProfilingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def format_query_report(limit: int = 15) -> str:
+    """Plain-text report of the heaviest statements and the latest slow ones"""
+    lines = [
+        f"Query profile ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})",
+        f"Profiling: {'on' if _enabled else 'off'}, slow threshold: {_slow_seconds * 1000:.0f}ms",
+        "",
+        f"Top {limit} statements by total time:",
+    ]
+    stats = get_query_stats(limit)
+    if not stats:
+        lines.append("  (no statements recorded)")
+    for i, s in enumerate(stats, 1):
+        lines.append(
+            f"{i}. total {s['total'] * 1000:.0f}ms, {s['count']}x, avg {s['avg'] * 1000:.1f}ms, "
+            f"max {s['max'] * 1000:.1f}ms, rows {s['rows']}, slow {s['slow']}"
+            f"{', FULL SCAN' if s['full_scan'] else ''}"
+        )
+        lines.append(f"   origin: {s['origin']}")
+        lines.append(f"   sql: {s['fingerprint']}")
+        if s['plan']:
+            lines.extend(f"   plan: {step}" for step in s['plan'])
+    recent = get_recent_slow()
+    lines.extend(["", f"Latest slow statements ({len(recent)}):"])
+    for q in reversed(recent):
+        lines.append(
+            f"- {datetime.fromtimestamp(q.at).strftime('%H:%M:%S')} {q.duration * 1000:.1f}ms "
+            f"rows {q.rows}{' FULL SCAN' if q.full_scan else ''} {q.origin}: {q.fingerprint}"
+        )
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,190 @@
+from typing import Optional, List, Dict, Tuple, NamedTuple, TYPE_CHECKING
+import logging
+
+from .game_sessions import claim_session
+from .process_cache import ProcessCache
+from .transaction import begin_transaction
+
+if TYPE_CHECKING:
+    from .core import Database
+
+logger = logging.getLogger(__name__)
+
+# Tek oyunda ulaşılabilecek makul üst sınır (boru başına 1 puan)
+MAX_GAME_SCORE = 100000
+
+
+class ScoreTotals(NamedTuple):
+    total: int
+    best: int
+    games: int
+
+
+class ScoreResult(NamedTuple):
+    """Outcome of one submitted score"""
+    ok: bool
+    score: int
+    total: int = 0
+    best: int = 0
+    new_best: bool = False
+    # 'invalid_session', 'invalid_score' veya 'error'
+    reason: Optional[str] = None
+
+
+# Kullanıcı başına toplam/en iyi skor
+_totals: ProcessCache[int, ScoreTotals] = ProcessCache()
+
+
+class ScoresDB:
+    def __init__(self, db: 'Database'):
+        self.db = db
+
+    def setup(self):
+        """Create the running totals table, filling it from existing scores once"""
+        cur = self.db.cur
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS game_score_totals (
+            user_id INTEGER PRIMARY KEY,
+            total_score INTEGER NOT NULL DEFAULT 0,
+            best_score INTEGER NOT NULL DEFAULT 0,
+            games_played INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_game_scores_user ON game_scores(user_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_score_totals_best ON game_score_totals(best_score DESC)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_score_totals_total ON game_score_totals(total_score DESC)")
+        if cur.execute("SELECT 1 FROM game_score_totals LIMIT 1").fetchone() is None:
+            cur.execute("""
+                INSERT INTO game_score_totals (user_id, total_score, best_score, games_played)
+                SELECT user_id,
+                       SUM(score),
+                       COALESCE(MAX(CASE WHEN game_type != 'reward_claim' THEN score END), 0),
+                       SUM(game_type != 'reward_claim')
+                FROM game_scores
+                GROUP BY user_id
+            """)
+
+    def get_totals(self, user_id: int) -> ScoreTotals:
+        """Running totals of a user, read from the table only on first use"""
+        totals = _totals.get(user_id)
+        if totals is not None:
+            return totals
+        try:
+            row = self.db.conn.execute(
+                "SELECT total_score, best_score, games_played FROM game_score_totals WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+        except Exception as e:
+            logger.error(f"Error getting score totals: {e}")
+            return ScoreTotals(0, 0, 0)
+        totals = ScoreTotals(*row) if row else ScoreTotals(0, 0, 0)
+        return _totals.setdefault(user_id, totals)
+
+    def record_batch(self, items: List[Tuple[int, str, int]]) -> List[ScoreResult]:
+        """
+        Validate and store (user_id, session_id, score) items in one transaction
+
+        A score is accepted only for an unused, unexpired session of the same
+        user; the session is marked used in the same transaction so a score
+        link cannot be replayed. Totals are updated in the same transaction and applied
+        to the in-memory cache after the commit.
+        """
+        results: List[Optional[ScoreResult]] = [None] * len(items)
+        accepted: Dict[int, List[int]] = {}
+        conn = self.db.conn
+        cur = conn.cursor()
+        try:
+            if not begin_transaction(conn, immediate=True):
+                return [ScoreResult(False, score, reason='error') for _, _, score in items]
+            rows = []
+            for i, (user_id, session_id, score) in enumerate(items):
+                if not 0 <= score <= MAX_GAME_SCORE:
+                    results[i] = ScoreResult(False, score, reason='invalid_score')
+                    continue
+                if not claim_session(cur, user_id, session_id):
+                    results[i] = ScoreResult(False, score, reason='invalid_session')
+                    continue
+                rows.append((user_id, session_id, score))
+                accepted.setdefault(user_id, []).append(i)
+
+            cur.executemany(
+                "INSERT INTO game_scores (user_id, session_id, score) VALUES (?, ?, ?)", rows
+            )
+            updated: Dict[int, ScoreTotals] = {}
+            for user_id, indexes in accepted.items():
+                scores = [items[i][2] for i in indexes]
+                previous_best = self.get_totals(user_id).best
+                row = cur.execute("""
+                    INSERT INTO game_score_totals (user_id, total_score, best_score, games_played)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (user_id) DO UPDATE SET
+                        total_score = total_score + excluded.total_score,
+                        best_score = MAX(best_score, excluded.best_score),
+                        games_played = games_played + excluded.games_played,
+                        updated_at = CURRENT_TIMESTAMP
+                    RETURNING total_score, best_score, games_played
+                """, (user_id, sum(scores), max(scores), len(scores))).fetchone()
+                updated[user_id] = ScoreTotals(*row)
+                for i in indexes:
+                    score = items[i][2]
+                    results[i] = ScoreResult(True, score, row[0], row[1], score > previous_best and score == row[1])
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error saving score batch: {e}")
+            return [ScoreResult(False, score, reason='error') for _, _, score in items]
+        finally:
+            cur.close()
+
+        _totals.update(updated)
+        return results
+
+    def record_adjustment(self, user_id: int, amount: int, game_type: str) -> bool:
+        """Add a non-game score row (e.g. points spent on a reward) and update the totals"""
+        conn = self.db.conn
+        try:
+            if not begin_transaction(conn):
+                return False
+            conn.execute(
+                "INSERT INTO game_scores (user_id, session_id, score, game_type) VALUES (?, ?, ?, ?)",
+                (user_id, game_type, amount, game_type)
+            )
+            row = conn.execute("""
+                INSERT INTO game_score_totals (user_id, total_score) VALUES (?, ?)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    total_score = total_score + excluded.total_score,
+                    updated_at = CURRENT_TIMESTAMP
+                RETURNING total_score, best_score, games_played
+            """, (user_id, amount)).fetchone()
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error saving score adjustment: {e}")
+            return False
+        _totals.set(user_id, ScoreTotals(*row))
+        return True
+
+    def get_top(self, order_by: str = 'best_score', limit: int = 10) -> list:
+        """Leaderboard rows (user_id, score, games_played) from the totals table"""
+        column = 'total_score' if order_by == 'total_score' else 'best_score'
+        try:
+            return self.db.conn.execute(f"""
+                SELECT user_id, {column}, games_played
+                FROM game_score_totals
+                WHERE games_played > 0
+                ORDER BY {column} DESC
+                LIMIT ?
+            """, (limit,)).fetchall()
+        except Exception as e:
+            logger.error(f"Error getting leaderboard: {e}")
+            return []
+
+    def reset(self):
+        """Clear all totals (monthly reset); the caller commits"""
+        self.db.cur.execute("DELETE FROM game_score_totals")
+        invalidate_score_totals()
+
+
+def invalidate_score_totals():
+    _totals.invalidate()
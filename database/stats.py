@@ -9,6 +9,9 @@ class StatsDB:
     def __init__(self, db: Database):
         self.db = db
         
+    # Geçmişe dönük sorgular all_purchase_requests görünümünü kullanır,
+    # böylece arşive taşınmış siparişler de istatistiklere dahil olur
+    
     def get_user_stats(self) -> Dict[str, Any]:
         """Get detailed user statistics"""
         try:
@@ -62,12 +65,12 @@ class StatsDB:
                     COUNT(DISTINCT CASE 
                         WHEN user_id IN (
                             SELECT user_id 
-                            FROM purchase_requests 
+                            FROM all_purchase_requests 
                             WHERE status = 'completed' 
                             GROUP BY user_id 
                             HAVING COUNT(*) > 1
                         ) THEN user_id END) as returning_users
-                FROM purchase_requests
+                FROM all_purchase_requests
             """)
             result = self.db.cur.fetchone()
             stats.update({
@@ -117,7 +120,7 @@ class StatsDB:
                     MAX(CAST(
                         (JULIANDAY(updated_at) - JULIANDAY(created_at)) * 24 * 60 
                     AS INTEGER)) as max_time
-                FROM purchase_requests
+                FROM all_purchase_requests
                 WHERE status IN ('completed', 'rejected')
             """)
             result = self.db.cur.fetchone()
@@ -134,7 +137,7 @@ class StatsDB:
                     COUNT(*) as total,
                     SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed,
                     SUM(CASE WHEN status = 'rejected' THEN 1 ELSE 0 END) as rejected
-                FROM purchase_requests
+                FROM all_purchase_requests
                 WHERE status != 'pending'
             """)
             result = self.db.cur.fetchone()
@@ -152,7 +155,7 @@ class StatsDB:
                     COUNT(*) as total_txns,
                     SUM(total_amount) as total_volume,
                     AVG(total_amount) as avg_amount
-                FROM purchase_requests
+                FROM all_purchase_requests
                 WHERE status = 'completed'
             """)
             result = self.db.cur.fetchone()
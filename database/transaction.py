@@ -0,0 +1,20 @@
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def begin_transaction(conn: sqlite3.Connection, immediate: bool = False) -> bool:
+    """
+    Open a write transaction for a writer that commits or rolls back on its own
+
+    Refuses (logs and returns False) if the connection already has an open
+    transaction: committing it here would commit another caller's half-done
+    work, and rolling back on our own error would discard it.
+    """
+    if conn.in_transaction:
+        logger.error("Refusing to start a write transaction: connection already has one open")
+        return False
+    # IMMEDIATE yazma kilidini baştan alır; okuma-sonra-yazma yarışlarını önler
+    conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    return True
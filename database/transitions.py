@@ -0,0 +1,166 @@
+from typing import Optional, List, Tuple, NamedTuple, Callable, Iterable, TYPE_CHECKING
+import logging
+
+from .outbox import OutboxMessage, enqueue_notification
+from .transaction import begin_transaction
+
+if TYPE_CHECKING:
+    from .core import Database
+
+logger = logging.getLogger(__name__)
+
+# Bu kadar başarısız ödemeden sonra kullanıcı yasaklanır
+MAX_FAILED_PAYMENTS = 3
+
+# İzin verilen durum geçişleri
+TRANSITIONS = {
+    'pending': ('completed', 'rejected'),
+}
+
+
+class TransitionError(Exception):
+    """Raised inside the transaction to roll back a transition"""
+
+    def __init__(self, reason: str, message: str = ''):
+        super().__init__(message or reason)
+        self.reason = reason
+
+
+class TransitionResult(NamedTuple):
+    """Outcome of a purchase request status transition"""
+    ok: bool
+    request_id: int
+    status: Optional[str] = None
+    user_id: Optional[int] = None
+    # 'not_found', 'invalid_transition', 'insufficient_stock' veya 'error'
+    reason: Optional[str] = None
+    failed_payments: int = 0
+    banned: bool = False
+    # (product_id, quantity) - stoğu düşülen ürünler
+    items: Tuple[Tuple[int, int], ...] = ()
+    # Siparişe ayrılan konum fotoğrafı (transaction içinde tablodan silinir)
+    location_path: Optional[str] = None
+
+
+class PurchaseTransitionDB:
+    def __init__(self, db: 'Database'):
+        self.db = db
+
+    def transition(self, request_id: int, new_status: str,
+                   notify: Optional[Callable[[TransitionResult], Iterable[OutboxMessage]]] = None
+                   ) -> TransitionResult:
+        """
+        Move a purchase request out of 'pending' in a single transaction
+
+        Approval decrements stock (failing if any item is short), resets the
+        user's failed payment counter and claims a location; rejection bumps
+        the counter and bans the user at MAX_FAILED_PAYMENTS. Messages returned
+        by `notify(result)` are written to the outbox in the same transaction.
+        Everything is committed once or not at all.
+        """
+        conn = self.db.conn
+        # Paylaşılan cursor'ı bozmamak için ayrı cursor
+        cur = conn.cursor()
+        try:
+            if not begin_transaction(conn, immediate=True):
+                return TransitionResult(False, request_id, reason='error')
+            try:
+                result = self._apply(cur, request_id, new_status)
+                if notify:
+                    for message in notify(result):
+                        enqueue_notification(cur, message)
+                cur.execute("COMMIT")
+            except TransitionError as e:
+                cur.execute("ROLLBACK")
+                logger.warning(f"Request #{request_id} -> {new_status} refused: {e}")
+                return TransitionResult(False, request_id, reason=e.reason)
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+        except Exception as e:
+            logger.exception(f"Error updating purchase request #{request_id}: {str(e)}")
+            return TransitionResult(False, request_id, reason='error')
+        finally:
+            cur.close()
+
+        logger.info(f"Successfully updated request #{request_id} status to {new_status}")
+        if result.banned:
+            logger.warning(f"User {result.user_id} has been banned due to too many failed payments")
+        return result
+
+    def _apply(self, cur, request_id: int, new_status: str) -> TransitionResult:
+        row = cur.execute(
+            "SELECT user_id, status FROM purchase_requests WHERE id = ?",
+            (request_id,)
+        ).fetchone()
+        if not row:
+            raise TransitionError('not_found', f"Purchase request #{request_id} not found")
+        user_id, current_status = row
+
+        if new_status not in TRANSITIONS.get(current_status, ()):
+            raise TransitionError(
+                'invalid_transition', f"Cannot move request from {current_status} to {new_status}"
+            )
+
+        cur.execute(
+            "INSERT OR IGNORE INTO users (telegram_id, failed_payments, is_banned) VALUES (?, 0, 0)",
+            (user_id,)
+        )
+
+        items: List[Tuple[int, int]] = []
+        location_path = None
+        if new_status == 'completed':
+            items = cur.execute(
+                "SELECT product_id, quantity FROM purchase_request_items WHERE request_id = ? ORDER BY id",
+                (request_id,)
+            ).fetchall()
+            for product_id, quantity in items:
+                # Koşullu düşüm: stok yetmezse satır güncellenmez
+                updated = cur.execute(
+                    "UPDATE products SET stock = stock - ? WHERE id = ? AND stock >= ?",
+                    (quantity, product_id, quantity)
+                ).rowcount
+                if not updated:
+                    raise TransitionError(
+                        'insufficient_stock', f"Not enough stock for product {product_id}"
+                    )
+            if items:
+                location = cur.execute(
+                    "DELETE FROM locations WHERE id = ("
+                    "SELECT id FROM locations WHERE product_id = ? AND is_used = 0 LIMIT 1"
+                    ") RETURNING image_path",
+                    (items[0][0],)
+                ).fetchone()
+                location_path = location[0] if location else None
+            failed_payments, banned = cur.execute(
+                """UPDATE users SET failed_payments = 0
+                   WHERE telegram_id = ?
+                   RETURNING failed_payments, is_banned""",
+                (user_id,)
+            ).fetchone()
+        else:
+            failed_payments, banned = cur.execute(
+                """UPDATE users
+                   SET failed_payments = COALESCE(failed_payments, 0) + 1,
+                       is_banned = CASE WHEN COALESCE(failed_payments, 0) + 1 >= ?
+                                        THEN 1 ELSE is_banned END
+                   WHERE telegram_id = ?
+                   RETURNING failed_payments, is_banned""",
+                (MAX_FAILED_PAYMENTS, user_id)
+            ).fetchone()
+
+        cur.execute(
+            """UPDATE purchase_requests
+               SET status = ?, updated_at = CURRENT_TIMESTAMP
+               WHERE id = ?""",
+            (new_status, request_id)
+        )
+        return TransitionResult(
+            True, request_id,
+            status=new_status,
+            user_id=user_id,
+            failed_payments=failed_payments or 0,
+            banned=bool(banned),
+            items=tuple(items),
+            location_path=location_path
+        )
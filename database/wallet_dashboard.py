@@ -0,0 +1,99 @@
+from typing import List, Dict, Tuple, NamedTuple, TYPE_CHECKING
+import logging
+
+if TYPE_CHECKING:
+    from .core import Database
+
+logger = logging.getLogger(__name__)
+
+# Durum filtreleri; atanmış = user_wallets'ta kaydı olan, geçici = atanmamış ama in_use
+WALLET_STATES = {
+    'all': "1",
+    'available': "w.in_use = 0 AND NOT EXISTS (SELECT 1 FROM user_wallets uw WHERE uw.wallet_id = w.id)",
+    'assigned': "EXISTS (SELECT 1 FROM user_wallets uw WHERE uw.wallet_id = w.id)",
+    'temporary': "w.in_use = 1 AND NOT EXISTS (SELECT 1 FROM user_wallets uw WHERE uw.wallet_id = w.id)",
+}
+
+
+class WalletRow(NamedTuple):
+    id: int
+    address: str
+    in_use: bool
+    user_id: int
+    usage_count: int
+    last_used: str
+    # Onaylanan siparişlerden (arşivdekiler dahil) bu adrese gelen toplam (USDT)
+    received: float
+
+
+class WalletDashboardDB:
+    """Aggregated wallet pool stats and a keyset-paginated wallet listing"""
+
+    def __init__(self, db: 'Database'):
+        self.db = db
+
+    def setup(self):
+        """Indexes for per-wallet lookups"""
+        cur = self.db.cur
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_purchase_requests_wallet ON purchase_requests(wallet)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_user_wallets_wallet ON user_wallets(wallet_id)")
+
+    def get_summary(self) -> Dict[str, int]:
+        """Pool counts by state in one query"""
+        summary = {'total': 0, 'available': 0, 'assigned': 0, 'temporary': 0}
+        try:
+            row = self.db.conn.execute("""
+                SELECT COUNT(*),
+                       SUM(a.wallet_id IS NULL AND w.in_use = 0),
+                       SUM(a.wallet_id IS NOT NULL),
+                       SUM(a.wallet_id IS NULL AND w.in_use = 1)
+                FROM wallets w
+                LEFT JOIN (SELECT DISTINCT wallet_id FROM user_wallets) a ON a.wallet_id = w.id
+            """).fetchone()
+        except Exception as e:
+            logger.error(f"Error getting wallet summary: {e}")
+            return summary
+        summary.update(zip(('total', 'available', 'assigned', 'temporary'), (v or 0 for v in row)))
+        return summary
+
+    def get_page(self, state: str = 'all', cursor: int = 0, backwards: bool = False,
+                 limit: int = 10) -> Tuple[List[WalletRow], bool]:
+        """
+        One page of wallets ordered by id, after (or before) the cursor id
+
+        Usage stats are aggregated only for the wallets on the page. Returns
+        (rows, whether there are more rows in the paging direction).
+        """
+        condition = WALLET_STATES.get(state, WALLET_STATES['all'])
+        if backwards:
+            keyset, order = "w.id < ?", "DESC"
+        else:
+            keyset, order = "w.id > ?", "ASC"
+        try:
+            rows = self.db.conn.execute(f"""
+                WITH page AS (
+                    SELECT w.id, w.address, w.in_use,
+                           (SELECT uw.user_id FROM user_wallets uw WHERE uw.wallet_id = w.id LIMIT 1) AS user_id
+                    FROM wallets w
+                    WHERE {keyset} AND {condition}
+                    ORDER BY w.id {order}
+                    LIMIT ?
+                )
+                SELECT p.id, p.address, p.in_use, p.user_id,
+                       COUNT(pr.id),
+                       MAX(pr.created_at),
+                       COALESCE(SUM(CASE WHEN pr.status = 'completed' THEN pr.total_amount END), 0)
+                FROM page p
+                LEFT JOIN all_purchase_requests pr ON pr.wallet = p.address
+                GROUP BY p.id
+                ORDER BY p.id
+            """, (cursor, limit + 1)).fetchall()
+        except Exception as e:
+            logger.error(f"Error getting wallet page: {e}")
+            return [], False
+
+        has_more = len(rows) > limit
+        if has_more:
+            # Fazladan alınan satır sayfa yönünün sonundadır
+            rows = rows[1:] if backwards else rows[:limit]
+        return [WalletRow(*row) for row in rows], has_more
@@ -43,7 +43,9 @@ from .stats import (
     show_general_stats,
     show_sales_stats,
     show_user_stats,
-    show_performance_stats
+    show_performance_stats,
+    show_latency_stats,
+    show_slow_queries
 )
 
 __all__ = ['show_cleanup_confirmation',
@@ -72,6 +74,8 @@ __all__ = ['show_cleanup_confirmation',
     'show_sales_stats',
     'show_user_stats',
     'show_performance_stats',
+    'show_latency_stats',
+    'show_slow_queries',
     'handle_product_name',
     'handle_product_description',
     'handle_product_price',
@@ -2,8 +2,10 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from database import Database
 from config import ADMIN_ID
+import time
 import logging
 from states import BROADCAST_MESSAGE
+from utils.campaign_runner import campaign_runner
 
 logger = logging.getLogger(__name__)
 db = Database('shop.db')
@@ -81,39 +83,22 @@ async def send_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return ConversationHandler.END
         
         logger.info(f"Starting to send broadcasts to {len(users)} users")
-        success_count = 0
-        failed_count = 0
-        failed_users = []
         
-        # Process users in smaller batches to avoid overloading
-        batch_size = 20
-        for i in range(0, len(users), batch_size):
-            batch = users[i:i+batch_size]
-            for user_id in batch:
-                try:
-                    logger.debug(f"Sending message to user {user_id}")
-                    await context.bot.send_message(
-                        chat_id=user_id,
-                        text=f"📢 Duyuru:\n\n{message}",
-                        reply_markup=InlineKeyboardMarkup([[
-                            InlineKeyboardButton("🔙 Ana Menü", callback_data='main_menu')
-                        ]])
-                    )
-                    success_count += 1
-                    logger.debug(f"Successfully sent broadcast to user {user_id}")
-                except Exception as e:
-                    failed_count += 1
-                    failed_users.append(user_id)
-                    logger.error(f"Failed to send broadcast to user {user_id}: {e}")
-                    continue
-        
-        logger.info(f"Broadcast completed. Successful: {success_count}, Failed: {failed_count}")
-        if failed_count > 0:
-            logger.info(f"Failed users: {failed_users}")
+        # Gönderim arka planda, hız sınırına uyarak yapılır; bitince özet admin'e gelir
+        campaign_key = f"broadcast:{update.message.message_id}:{int(time.time())}"
+        context.application.create_task(
+            campaign_runner.start(
+                context.bot, db, campaign_key, f"📢 Duyuru:\n\n{message}", users,
+                reply_markup=InlineKeyboardMarkup([[
+                    InlineKeyboardButton("🔙 Ana Menü", callback_data='main_menu')
+                ]]),
+                admin_id=ADMIN_ID
+            )
+        )
         
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
-            text=f"✅ Bildirim {success_count}/{len(users)} kullanıcıya gönderildi!",
+            text=f"📤 Bildirim {len(users)} kullanıcıya gönderiliyor. Tamamlanınca özet gönderilecek.",
             reply_markup=InlineKeyboardMarkup([[
                 InlineKeyboardButton("🔙 Ana Menü", callback_data='main_menu')
             ]])
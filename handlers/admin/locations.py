@@ -1,9 +1,10 @@
 import logging
-import os
+import time
+import asyncio
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from database import Database
-from config import LOCATIONS_DIR
+from utils.media_store import media_store
 from states import LOCATION_PHOTO
 from datetime import datetime
 from collections import defaultdict
@@ -63,10 +64,119 @@ async def add_location(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=InlineKeyboardMarkup(keyboard)
     )
 
+# Albüm fotoğrafları ayrı güncellemeler olarak gelir; son fotoğraftan bu kadar
+# saniye sonra albüm tamamlanmış sayılır
+ALBUM_WAIT = 1.5
+DOWNLOAD_CONCURRENCY = 8
+
+# (chat_id, media_group_id) -> {'photos': [...], 'last_seen': float}
+_album_buffers = {}
+
+async def ingest_location_photos(bot, product_id, photos):
+    """
+    Download photos concurrently into the media store and add them to the pool in one batch
+
+    Photos already in the pool (same content) are skipped. Returns (added, failed, duplicates)
+    """
+    semaphore = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+
+    async def download(photo):
+        async with semaphore:
+            return await media_store.put_telegram_file(db, bot, photo.file_id)
+
+    results = await asyncio.gather(*(download(photo) for photo in photos), return_exceptions=True)
+    image_paths = []
+    duplicates = 0
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Error downloading location photo: {result}")
+            continue
+        image_path, previous_refs = result
+        # Aynı fotoğraf iki müşteriye gitmesin
+        if image_path in image_paths or (previous_refs and db.media.is_location_image(image_path)):
+            duplicates += 1
+            await media_store.release(db, image_path)
+            continue
+        image_paths.append(image_path)
+
+    added = db.add_locations(product_id, image_paths)
+    if not added:
+        for image_path in image_paths:
+            await media_store.release(db, image_path)
+    return added, len(photos) - added - duplicates, duplicates
+
+async def send_ingest_summary(bot, chat_id, product, user_data, added, failed, duplicates=0):
+    """Send one summary message for a single photo or a whole album"""
+    if not added and duplicates:
+        await bot.send_message(
+            chat_id=chat_id,
+            text="⚠️ Bu fotoğraf zaten konum havuzunda mevcut, tekrar eklenmedi.\n\n"
+                 "📸 Başka bir konum fotoğrafı gönderin veya tamamlamak için butona tıklayın.",
+            reply_markup=InlineKeyboardMarkup([
+                [InlineKeyboardButton("✅ Tamamla", callback_data='complete_location_upload')],
+                [InlineKeyboardButton("🔙 İptal", callback_data='admin_locations')]
+            ])
+        )
+        return
+    if not added:
+        await bot.send_message(
+            chat_id=chat_id,
+            text="❌ Konum eklenirken bir hata oluştu.",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("🔙 Konum Havuzuna Dön", callback_data='admin_locations')
+            ]])
+        )
+        return
+
+    # Keep track of how many locations we've added in this session
+    user_data['locations_added'] = user_data.get('locations_added', 0) + added
+    available_count = db.get_available_location_count(product[0])
+
+    if added == 1 and not failed and not duplicates:
+        message = f"✅ Konum #{user_data['locations_added']} başarıyla eklendi!\n\n"
+    else:
+        message = f"✅ {added} konum başarıyla eklendi!\n"
+        if duplicates:
+            message += f"♻️ {duplicates} fotoğraf zaten havuzda olduğu için atlandı.\n"
+        if failed:
+            message += f"⚠️ {failed} fotoğraf eklenemedi.\n"
+        message += "\n"
+    message += f"📦 Ürün: {product[1]}\n"
+    message += f"📊 Bu oturumda eklenen: {user_data['locations_added']}\n"
+    message += f"📊 Toplam müsait konum: {available_count}\n\n"
+    message += "📸 Başka konum fotoğrafları (tek tek veya albüm olarak) gönderin veya tamamlamak için butona tıklayın."
+
+    await bot.send_message(
+        chat_id=chat_id,
+        text=message,
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("✅ Tamamla", callback_data='complete_location_upload')],
+            [InlineKeyboardButton("🔙 İptal", callback_data='admin_locations')]
+        ])
+    )
+
+async def _flush_album(key, bot, product, user_data):
+    """Wait until the album stops growing, then ingest it at once"""
+    try:
+        while True:
+            wait = _album_buffers[key]['last_seen'] + ALBUM_WAIT - time.monotonic()
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        album = _album_buffers.pop(key)
+        added, failed, duplicates = await ingest_location_photos(bot, product[0], album['photos'])
+        logger.info(f"Album {key[1]}: {added} locations added, {failed} failed, {duplicates} duplicates for product {product[0]}")
+        await send_ingest_summary(bot, key[0], product, user_data, added, failed, duplicates)
+    except Exception as e:
+        _album_buffers.pop(key, None)
+        logger.error(f"Error ingesting location album: {e}")
+
 async def handle_location_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
-    Enhanced handler for location photo upload that allows multiple photos
-    to be uploaded in a single session
+    Handle location photo uploads, single photos or whole albums
+
+    Album photos are buffered per media group and ingested together once the
+    album is complete, with a single summary reply.
     """
     if not update.message.photo:
         await update.message.reply_text(
@@ -94,52 +204,27 @@ async def handle_location_photo(update: Update, context: ContextTypes.DEFAULT_TY
             await update.message.reply_text("❌ Ürün bulunamadı!")
             return ConversationHandler.END
 
-        # Create locations directory if not exists
-        locations_dir = os.path.join(LOCATIONS_DIR, str(product_id))
-        os.makedirs(locations_dir, exist_ok=True)
-
-        # Save photo
         photo = update.message.photo[-1]
-        photo_file = await context.bot.get_file(photo.file_id)
-        image_path = os.path.join(locations_dir, f'location_{photo.file_id}.jpg')
-        await photo_file.download_to_drive(image_path)
 
-        # Add to database
-        if db.add_location(product_id, image_path):
-            # Keep track of how many locations we've added in this session
-            if 'locations_added' not in context.user_data:
-                context.user_data['locations_added'] = 1
-            else:
-                context.user_data['locations_added'] += 1
-                
-            # Get the current count of available locations for this product
-            available_count = db.get_available_location_count(product_id)
-                
-            # Create success message with count information
-            message = f"✅ Konum #{context.user_data['locations_added']} başarıyla eklendi!\n\n"
-            message += f"📦 Ürün: {product[1]}\n"
-            message += f"📊 Toplam müsait konum: {available_count}\n\n"
-            message += "📸 Başka bir konum fotoğrafı gönderin veya tamamlamak için butona tıklayın."
-            
-            # Provide buttons to complete or go back
-            await update.message.reply_text(
-                message,
-                reply_markup=InlineKeyboardMarkup([
-                    [InlineKeyboardButton("✅ Tamamla", callback_data='complete_location_upload')],
-                    [InlineKeyboardButton("🔙 İptal", callback_data='admin_locations')]
-                ])
-            )
-            
+        if update.message.media_group_id:
+            key = (update.effective_chat.id, update.message.media_group_id)
+            album = _album_buffers.get(key)
+            if album is None:
+                album = _album_buffers[key] = {'photos': [], 'last_seen': time.monotonic()}
+                context.application.create_task(
+                    _flush_album(key, context.bot, product, context.user_data)
+                )
+            album['photos'].append(photo)
+            album['last_seen'] = time.monotonic()
+            return LOCATION_PHOTO
+
+        added, failed, duplicates = await ingest_location_photos(context.bot, product_id, [photo])
+        await send_ingest_summary(
+            context.bot, update.effective_chat.id, product, context.user_data, added, failed, duplicates
+        )
+        if added or duplicates:
             # Stay in the same state to allow uploading more photos
             return LOCATION_PHOTO
-        else:
-            await update.message.reply_text(
-                "❌ Konum eklenirken bir hata oluştu.",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Konum Havuzuna Dön", callback_data='admin_locations')
-                ]])
-            )
-            return ConversationHandler.END
 
     except Exception as e:
         logger.error(f"Error handling location photo: {e}")
@@ -2,119 +2,88 @@ import logging
 import os
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from database import Database
-import sqlite3
+from database import Database, DatabaseMaintenance
+from order_cleanup import OrderRetentionEngine
+import asyncio
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 db = Database('shop.db')
 
+# Aynı anda tek temizleme işi çalışır
+_cleanup_task = None
+
 async def handle_cleanup_orders(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Tamamlanmış ve reddedilmiş siparişleri temizler"""
+    """Tamamlanmış ve reddedilmiş siparişleri arka planda temizler"""
+    global _cleanup_task
     query = update.callback_query
+    
+    if _cleanup_task and not _cleanup_task.done():
+        await query.answer("⏳ Temizleme işlemi zaten devam ediyor.", show_alert=True)
+        return
     await query.answer()
     
     logger.info("Sipariş temizleme işlemi başlatılıyor...")
     
-    try:
-        # Başlangıç mesajı gönder
-        await query.message.edit_text(
-            "⌛ Sipariş temizleme işlemi başlatıldı, lütfen bekleyin...",
-            reply_markup=None
-        )
-        
-        # Silinecek sipariş ID'lerini al
-        order_ids = []
-        db.cur.execute(
-            "SELECT id FROM purchase_requests WHERE status IN ('completed', 'rejected')"
-        )
-        order_ids = [row[0] for row in db.cur.fetchall()]
-        
-        if not order_ids:
-            logger.info("Temizlenecek sipariş bulunamadı.")
-            await query.message.edit_text(
-                "ℹ️ Temizlenecek sipariş bulunamadı.",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Sipariş Yönetimi", callback_data='admin_payments')
-                ]])
-            )
+    await query.message.edit_text(
+        "⌛ Sipariş arşivleme işlemi arka planda başlatıldı.\n\n"
+        "İlerleme bu mesajda gösterilecek, bu sırada bot kullanılmaya devam edebilir.",
+        reply_markup=None
+    )
+    
+    _cleanup_task = context.application.create_task(
+        run_cleanup_job(context.bot, query.message.chat_id, query.message.message_id),
+        update=update
+    )
+
+async def run_cleanup_job(bot, chat_id, message_id):
+    """Temizleme işini partiler halinde çalıştırır ve ilerlemeyi mesajda günceller"""
+    engine = OrderRetentionEngine(db.db_name)
+    last_edit = 0.0
+    
+    async def report_progress(progress):
+        nonlocal last_edit
+        # Telegram limitlerine takılmamak için en fazla 3 saniyede bir güncelle
+        now = asyncio.get_running_loop().time()
+        if now - last_edit < 3:
             return
-            
-        logger.info(f"Toplam {len(order_ids)} sipariş temizlenecek.")
-        
-        # İlişkili sipariş ürünlerini temizle
-        db.cur.execute(
-            f"DELETE FROM purchase_request_items WHERE request_id IN ({','.join(['?'] * len(order_ids))})",
-            order_ids
+        last_edit = now
+        total = progress['total'] or 1
+        percent = min(100, progress['orders_deleted'] * 100 / total)
+        await bot.edit_message_text(
+            chat_id=chat_id,
+            message_id=message_id,
+            text=f"⌛ Sipariş temizleme devam ediyor...\n\n"
+                 f"🗄️ {progress['orders_deleted']}/{progress['total']} sipariş arşivlendi (%{percent:.0f})"
         )
-        items_deleted = db.cur.rowcount
-        logger.info(f"{items_deleted} sipariş ürünü temizlendi.")
-        
-        # Siparişleri temizle
-        db.cur.execute(
-            f"DELETE FROM purchase_requests WHERE id IN ({','.join(['?'] * len(order_ids))})",
-            order_ids
-        )
-        orders_deleted = db.cur.rowcount
-        logger.info(f"{orders_deleted} sipariş temizlendi.")
-        
-        # İşlemleri kaydet
-        db.conn.commit()
+    
+    try:
+        orders_deleted, items_deleted = await engine.run_async(progress_callback=report_progress)
+        logger.info(f"{orders_deleted} sipariş ve {items_deleted} sipariş ürünü temizlendi.")
         
-        # VACUUM işlemini transaction dışında çalıştır
-        # Bu kısmı düzenliyoruz
-        vacuum_success = False
-        try:
-            # Database sınıfında connect() metodu var mı kontrol et
-            if hasattr(db, 'connect'):
-                logger.info("VACUUM işlemi başlatılıyor...")
-                # Veritabanı bağlantısını kapat
-                db_path = db.db_name
-                db.conn.close()
-                
-                # Yeni bir bağlantı aç ve VACUUM çalıştır
-                vacuum_conn = sqlite3.connect(db_path)
-                vacuum_conn.execute("VACUUM")
-                vacuum_conn.close()
-                
-                # Ana bağlantıyı yeniden aç
-                db.connect()
-                logger.info("Veritabanı optimize edildi.")
-                vacuum_success = True
-            else:
-                logger.warning("Database sınıfında connect() metodu bulunamadı, VACUUM atlanıyor.")
-                # Bu durumda normal bir execute ile deneyebiliriz (bu da hata verebilir)
-                try:
-                    db.conn.execute("PRAGMA optimize")  # VACUUM yerine daha güvenli bir alternatif
-                    logger.info("Veritabanı kısmen optimize edildi (PRAGMA optimize).")
-                    vacuum_success = True
-                except Exception as lite_error:
-                    logger.warning(f"Hafif optimizasyon da başarısız oldu: {lite_error}")
-        except Exception as vac_error:
-            logger.error(f"Veritabanı optimizasyonu sırasında hata: {vac_error}")
-            # Bağlantının hala açık olduğundan emin ol
-            try:
-                # Eğer bağlantı kapalıysa ve yeniden açılabiliyorsa
-                if hasattr(db, 'connect') and db.conn is None:
-                    db.connect()
-            except:
-                logger.error("Veritabanı bağlantısı yeniden açılamadı!")
+        # Silinen satırların boşalttığı sayfaları arka planda geri kazan
+        if orders_deleted:
+            await asyncio.to_thread(DatabaseMaintenance(db.db_name).incremental_vacuum)
         
-        # Başarılı mesajı gönder
-        optimization_note = "• Veritabanı boyutu optimize edildi" if vacuum_success else "• Veritabanı optimizasyonu atlandı"
-        success_message = f"""✅ Sipariş Temizleme İşlemi Tamamlandı!
+        if orders_deleted == 0:
+            text = "ℹ️ Temizlenecek sipariş bulunamadı."
+        else:
+            text = f"""✅ Sipariş Temizleme İşlemi Tamamlandı!
 
-🗑️ Toplam {orders_deleted} sipariş ve {items_deleted} sipariş ürünü başarıyla temizlendi.
+🗄️ Toplam {orders_deleted} sipariş ve {items_deleted} sipariş ürünü arşive taşındı.
 
 📊 Temizlik Özeti:
-• Tamamlanmış ve reddedilmiş siparişler silindi
+• Tamamlanmış ve reddedilmiş siparişler arşive taşındı
+• Satış geçmişi istatistiklerde korunuyor
 • Bekleyen siparişler korundu
-{optimization_note}
+• İşlem küçük partiler halinde yapıldı
 
 🕒 İşlem Zamanı: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}"""
-
-        await query.message.edit_text(
-            success_message,
+        
+        await bot.edit_message_text(
+            chat_id=chat_id,
+            message_id=message_id,
+            text=text,
             reply_markup=InlineKeyboardMarkup([
                 [InlineKeyboardButton("📊 Sipariş Yönetimine Dön", callback_data='admin_payments')],
                 [InlineKeyboardButton("🔙 Ana Menü", callback_data='main_menu')]
@@ -123,15 +92,20 @@ async def handle_cleanup_orders(update: Update, context: ContextTypes.DEFAULT_TY
         
     except Exception as e:
         logger.error(f"Sipariş temizleme sırasında hata: {e}")
-        error_message = f"❌ Sipariş temizleme sırasında bir hata oluştu: {str(e)}"
-        
-        await query.message.edit_text(
-            error_message,
+        progress = engine.progress()
+        await bot.edit_message_text(
+            chat_id=chat_id,
+            message_id=message_id,
+            text=f"❌ Sipariş temizleme sırasında bir hata oluştu: {str(e)}\n\n"
+                 f"Silinen: {progress.get('orders_deleted', 0)} sipariş. "
+                 f"Tekrar denediğinizde işlem kaldığı yerden devam eder.",
             reply_markup=InlineKeyboardMarkup([
                 [InlineKeyboardButton("🔄 Tekrar Dene", callback_data='confirm_cleanup_orders')],
                 [InlineKeyboardButton("🔙 Ana Menü", callback_data='main_menu')]
             ])
         )
+    finally:
+        engine.close()
 
 async def show_cleanup_confirmation(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Sipariş temizleme onayı göster"""
@@ -160,19 +134,22 @@ async def show_cleanup_confirmation(update: Update, context: ContextTypes.DEFAUL
         except:
             pass
         
+        archive_summary = db.archive.get_archive_summary()
+        
         message = f"""⚠️ SİPARİŞ TEMİZLEME ONAYI
 
-Bu işlem, tüm tamamlanmış ve reddedilmiş siparişleri kalıcı olarak silecektir.
+Bu işlem, tüm tamamlanmış ve reddedilmiş siparişleri ana veritabanından arşiv veritabanına taşıyacaktır.
 
 📊 Mevcut Durum:
 • Toplam Sipariş: {total_count}
 • Tamamlanmış/Reddedilmiş: {completed_rejected_count}
 • Bekleyen: {pending_count}
 • Veritabanı Boyutu: {db_size:.2f} MB
+• Arşivdeki Sipariş: {archive_summary['archived_orders']}
 
-🗑️ Temizlenecek Sipariş Sayısı: {completed_rejected_count}
+🗄️ Arşivlenecek Sipariş Sayısı: {completed_rejected_count}
 
-⚠️ Bu işlem geri alınamaz! Devam etmek istiyor musunuz?"""
+ℹ️ Arşivlenen siparişler istatistiklerde görünmeye devam eder. Devam etmek istiyor musunuz?"""
         
         keyboard = [
             [
@@ -1,9 +1,11 @@
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from database import Database
+from database import Database, OutboxMessage
 import logging
 from config import LOCATIONS_DIR
+from utils.notification_dispatcher import notification_dispatcher
+from utils.user_state import user_states
 import os
 
 logger = logging.getLogger(__name__)
@@ -40,38 +42,30 @@ async def handle_purchase_approval(update: Update, context: ContextTypes.DEFAULT
         )
         return
 
-    # If approving, check stock levels before proceeding
-    if status == 'completed':
-        # Get the items in this purchase request
-        db.cur.execute("""
-            SELECT pri.product_id, pri.quantity, p.stock
-            FROM purchase_request_items pri
-            JOIN products p ON pri.product_id = p.id
-            WHERE pri.request_id = ?
-        """, (request_id,))
-        
-        items = db.cur.fetchall()
-        insufficient_stock = False
-        
-        # Check if there's enough stock for all items
-        for product_id, quantity, current_stock in items:
-            if quantity > current_stock:
-                insufficient_stock = True
-                logger.warning(f"Not enough stock for product {product_id}. Needed: {quantity}, Available: {current_stock}")
-                break
-        
-        if insufficient_stock:
-            await query.message.edit_text(
-                "❌ Yeterli stok bulunmamaktadır. Sipariş onaylanamaz.",
-                reply_markup=InlineKeyboardMarkup([
-                    [InlineKeyboardButton("❌ Reddet", callback_data=f'reject_purchase_{request_id}')],
-                    [InlineKeyboardButton("🔙 Ana Menü", callback_data='main_menu')]
-                ])
-            )
-            return
-    
-    # Update request status in database
-    if not db.update_purchase_request_status(request_id, status):
+    # Stock, counters, ban state, location and the user notification are
+    # written in one transaction; the dispatcher delivers the notification
+    result = db.transition_purchase_request(
+        request_id, status,
+        notify=lambda result: [build_user_notification(request, result)]
+    )
+    if result.reason == 'insufficient_stock':
+        await query.message.edit_text(
+            "❌ Yeterli stok bulunmamaktadır. Sipariş onaylanamaz.",
+            reply_markup=InlineKeyboardMarkup([
+                [InlineKeyboardButton("❌ Reddet", callback_data=f'reject_purchase_{request_id}')],
+                [InlineKeyboardButton("🔙 Ana Menü", callback_data='main_menu')]
+            ])
+        )
+        return
+    if result.reason == 'invalid_transition':
+        await query.message.edit_text(
+            "ℹ️ Bu sipariş zaten sonuçlandırılmış.",
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("🔙 Ana Menü", callback_data='main_menu')
+            ]])
+        )
+        return
+    if not result.ok:
         logger.error(f"Failed to update request #{request_id} status to {status}")
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
@@ -83,70 +77,14 @@ async def handle_purchase_approval(update: Update, context: ContextTypes.DEFAULT
         )
         return
 
-    # If approved, reduce stock levels
-    if status == 'completed':
-        try:
-            for product_id, quantity, current_stock in items:
-                # Update stock (subtract quantity)
-                db.cur.execute(
-                    "UPDATE products SET stock = stock - ? WHERE id = ?",
-                    (quantity, product_id)
-                )
-                logger.info(f"Reduced stock for product {product_id} by {quantity}")
-            
-            db.conn.commit()
-            logger.info(f"Successfully updated stock levels for order #{request_id}")
-        except Exception as e:
-            logger.error(f"Error updating stock levels: {e}")
-            # Continue with the process even if stock update fails
-            # We've already confirmed the purchase, so we should complete it
-
-    # Status updated successfully, proceed with notifications
+    # Status updated successfully, user notification is in the outbox
+    notification_dispatcher.wake()
     try:
         # Try to delete the original message to keep chat clean
         try:
             await query.message.delete()
         except Exception as e:
             logger.error(f"Error deleting message: {e}")
-        
-        # Rest of the existing notification logic remains unchanged
-        # ...
-
-        # STEP 1: PREPARE USER NOTIFICATION
-        
-        if status == 'rejected':
-            # Handle rejection case
-            failed_payments = get_user_failed_payments(request['user_id'])
-            
-            # Determine warning level based on failed payments
-            warning = ""
-            if failed_payments >= 3:
-                warning = "\n\n⛔️ Hesabınız yasaklanmıştır!"
-            elif failed_payments == 2:
-                warning = "\n\n⚠️ SON UYARI: Bir sonraki başarısız ödemede hesabınız yasaklanacaktır! ⚠️"
-            else:
-                warning = f"\n\n⚠️ Not: {3 - failed_payments} başarısız ödeme hakkınız kaldı."
-            
-            # Create rejection message
-            user_message = (
-                f"{status_emoji} Siparişiniz {status_text}!\n\n"
-                f"🛍️ Sipariş #{request['id']}\n\n"
-                f"📦 Ürünler:\n{request['items']}"
-                f"💰 Toplam: {request['total_amount']} USDT"
-                f"{warning}"
-            )
-            
-            # Send rejection notification to user
-            logger.info(f"Sending rejection notification to user {request['user_id']}")
-            success = await send_user_notification(
-                context.bot, 
-                request['user_id'], 
-                user_message,
-                has_location=False
-            )
-        else:
-            # Handle approval case
-            await handle_approval_notification(context.bot, request)
 
         admin_message = (
             f"{status_emoji} Sipariş #{request['id']} {status_text}!\n\n"
@@ -176,181 +114,57 @@ async def handle_purchase_approval(update: Update, context: ContextTypes.DEFAULT
                 InlineKeyboardButton("🔙 Ana Menü", callback_data='main_menu')
             ]])
         )
-def get_user_failed_payments(user_id):
-    """Get user's failed payment count safely"""
-    try:
-        db.cur.execute(
-            "SELECT failed_payments FROM users WHERE telegram_id = ?",
-            (user_id,)
-        )
-        result = db.cur.fetchone()
-        if result and result[0] is not None:
-            return result[0]
-        return 0
-    except Exception as e:
-        logger.error(f"Error getting failed payments: {e}")
-        return 0
 
-async def send_user_notification(bot, user_id, message, has_location=False, location_path=None):
-    """Send notification to user with stored message tracking"""
-    try:
-        last_message_id = db.get_user_last_notification(user_id)
-        
-        if last_message_id:
-            try:
-                await bot.delete_message(chat_id=user_id, message_id=last_message_id)
-                logger.debug(f"Deleted previous notification message {last_message_id} for user {user_id}")
-            except Exception as e:
-                logger.debug(f"Could not delete previous notification: {e}")
-        
-        new_message = None
-        if has_location and location_path:
-            new_message = await bot.send_photo(
-                chat_id=user_id,
-                photo=open(location_path, 'rb'),
-                caption=message,
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Ana Menü", callback_data='main_menu')
-                ]])
-            )
-            logger.info(f"Sent location photo to user {user_id}")
-        else:
-            new_message = await bot.send_message(
-                chat_id=user_id,
-                text=message,
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Ana Menü", callback_data='main_menu')
-                ]])
-            )
-            logger.info(f"Sent notification message to user {user_id}")
-        
-        if new_message:
-            db.store_user_last_notification(user_id, new_message.message_id)
-            
-        return True  # Başarılı gönderim durumunu işaret et
-    except Exception as e:
-        logger.error(f"Error sending notification to user {user_id}: {e}")
-        return False  # Başarısız gönderim durumunu işaret et
+def build_user_notification(request, result):
+    """Build the outbox message sent to the user after approval/rejection"""
+    keyboard = InlineKeyboardMarkup([[
+        InlineKeyboardButton("🔙 Ana Menü", callback_data='main_menu')
+    ]]).to_dict()
+    key = f"order:{request['id']}:{result.status}"
 
-async def handle_approval_notification(bot, request):
-    """Handle the approval notification with location if available"""
-    try:
-        # Get the product ID for this request
-        db.cur.execute("""
-            SELECT product_id 
-            FROM purchase_request_items 
-            WHERE request_id = ? 
-            LIMIT 1""",
-            (request['id'],)
-        )
-        result = db.cur.fetchone()
-        
-        if not result or len(result) == 0:
-            logger.error(f"No products found for request #{request['id']}")
-            raise Exception("No products found in request")
-        
-        product_id = result[0]
-        logger.debug(f"Found product ID: {product_id} for request {request['id']}")
-        
-        location_path = db.get_available_location(product_id)
-        previous_message_id = db.get_user_last_notification(request['user_id'])
-        if previous_message_id:
-            try:
-                await bot.delete_message(chat_id=request['user_id'], message_id=previous_message_id)
-                logger.debug(f"Deleted previous notification {previous_message_id} for user {request['user_id']}")
-            except Exception as e:
-                logger.debug(f"Could not delete previous notification: {e}")
-        
-        if location_path and os.path.exists(location_path):
-            message = (f"✅ Siparişiniz onaylandı!\n\n"
-                      f"🛍️ Sipariş #{request['id']}\n"
-                      f"💰 Toplam: {request['total_amount']} USDT\n\n"
-                      f"📍 Konum bilgileri yukarıdaki fotoğrafta yer almaktadır.")
-            
-            keyboard = InlineKeyboardMarkup([[
-                InlineKeyboardButton("🔙 Ana Menü", callback_data='main_menu')
-            ]])
-            new_message = await bot.send_photo(
-                chat_id=request['user_id'],
-                photo=open(location_path, 'rb'),
-                caption=message,
-                reply_markup=keyboard
-            )
-            
-            # Store the new message ID for tracking
-            if new_message:
-                db.store_user_last_notification(request['user_id'], new_message.message_id)
-            
-            # Delete the location file after sending
-            try:
-                os.remove(location_path)
-                logger.info(f"Location file deleted: {location_path}")
-                
-                # If directory is empty, remove it too
-                directory = os.path.dirname(location_path)
-                if os.path.exists(directory) and not os.listdir(directory):
-                    os.rmdir(directory)
-                    logger.info(f"Empty location directory removed: {directory}")
-            except Exception as e:
-                logger.error(f"Error deleting location file: {e}")
-                
-            return True
+    if result.status == 'rejected':
+        failed_payments = result.failed_payments
+
+        # Determine warning level based on failed payments
+        if failed_payments >= 3:
+            warning = "\n\n⛔️ Hesabınız yasaklanmıştır!"
+        elif failed_payments == 2:
+            warning = "\n\n⚠️ SON UYARI: Bir sonraki başarısız ödemede hesabınız yasaklanacaktır! ⚠️"
         else:
-            # Send text-only notification if no location available
-            logger.warning(f"No location found for product {product_id}")
-            message = (
-                f"✅ Siparişiniz onaylandı!\n\n"
-                f"🛍️ Sipariş #{request['id']}\n\n"
-                f"📦 Ürünler:\n{request['items']}"
-                f"💰 Toplam: {request['total_amount']} USDT\n\n"
-                f"⚠️ Konum bilgisi yakında gönderilecektir."
-            )
-            
-            keyboard = InlineKeyboardMarkup([[
-                InlineKeyboardButton("🔙 Ana Menü", callback_data='main_menu')
-            ]])
-            
-            new_message = await bot.send_message(
-                chat_id=request['user_id'],
-                text=message,
-                reply_markup=keyboard
-            )
-            
-            # Store the new message ID for tracking
-            if new_message:
-                db.store_user_last_notification(request['user_id'], new_message.message_id)
-            
-            return True
-            
-    except Exception as e:
-        logger.exception(f"Error handling approval notification: {e}")
-        # Fallback message
+            warning = f"\n\n⚠️ Not: {3 - failed_payments} başarısız ödeme hakkınız kaldı."
+
         message = (
-            f"✅ Siparişiniz onaylandı!\n\n"
+            f"❌ Siparişiniz reddedildi!\n\n"
             f"🛍️ Sipariş #{request['id']}\n\n"
             f"📦 Ürünler:\n{request['items']}"
-            f"💰 Toplam: {request['total_amount']} USDT\n\n"
-            f"⚠️ Konum bilgisi yakında gönderilecektir."
+            f"💰 Toplam: {request['total_amount']} USDT"
+            f"{warning}"
         )
-        
-        try:
-            new_message = await bot.send_message(
-                chat_id=request['user_id'],
-                text=message,
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Ana Menü", callback_data='main_menu')
-                ]])
-            )
-            
-            # Store fallback message ID
-            if new_message:
-                db.store_user_last_notification(request['user_id'], new_message.message_id)
-                
-        except Exception as nested_e:
-            logger.error(f"Error sending fallback notification: {nested_e}")
-            
-        return False
-    
+        return OutboxMessage(key, request['user_id'], message, reply_markup=keyboard)
+
+    location_path = result.location_path
+    if location_path and os.path.exists(location_path):
+        message = (f"✅ Siparişiniz onaylandı!\n\n"
+                  f"🛍️ Sipariş #{request['id']}\n"
+                  f"💰 Toplam: {request['total_amount']} USDT\n\n"
+                  f"📍 Konum bilgileri yukarıdaki fotoğrafta yer almaktadır.")
+        return OutboxMessage(
+            key, request['user_id'], message,
+            photo_path=location_path,
+            reply_markup=keyboard,
+            remove_photo=True
+        )
+
+    logger.warning(f"No location found for request #{request['id']}")
+    message = (
+        f"✅ Siparişiniz onaylandı!\n\n"
+        f"🛍️ Sipariş #{request['id']}\n\n"
+        f"📦 Ürünler:\n{request['items']}"
+        f"💰 Toplam: {request['total_amount']} USDT\n\n"
+        f"⚠️ Konum bilgisi yakında gönderilecektir."
+    )
+    return OutboxMessage(key, request['user_id'], message, reply_markup=keyboard)
+
 async def show_pending_purchases(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show pending purchase requests and order management options"""
     try:
@@ -377,7 +191,7 @@ async def show_pending_purchases(update: Update, context: ContextTypes.DEFAULT_T
         except Exception as e:
             logger.error(f"Error deleting message: {e}")
         
-        context.user_data.pop('menu_message_id', None)
+        user_states.get(update.effective_user.id).menu_message_id = None
         
         if not requests:
             await context.bot.send_message(
@@ -2,9 +2,9 @@ import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from database import Database
-from config import PRODUCTS_DIR
+from utils.media_store import media_store
+from utils.user_state import user_states
 from states import *
-import os
 
 logger = logging.getLogger(__name__)
 db = Database('shop.db')
@@ -32,7 +32,7 @@ async def handle_product_name(update: Update, context: ContextTypes.DEFAULT_TYPE
         ]])
     )
     
-    context.user_data['current_message_id'] = sent_message.message_id
+    user_states.get(update.effective_user.id).current_message_id = sent_message.message_id
     await update.message.delete()
     
     return PRODUCT_DESCRIPTION
@@ -41,7 +41,7 @@ async def handle_product_description(update: Update, context: ContextTypes.DEFAU
     """Handle product description input"""
     context.user_data['product_data']['description'] = update.message.text
     
-    current_message_id = context.user_data.get('current_message_id')
+    current_message_id = user_states.get(update.effective_user.id).current_message_id
     if current_message_id:
         try:
             await context.bot.delete_message(
@@ -58,7 +58,7 @@ async def handle_product_description(update: Update, context: ContextTypes.DEFAU
         ]])
     )
     
-    context.user_data['current_message_id'] = sent_message.message_id
+    user_states.get(update.effective_user.id).current_message_id = sent_message.message_id
     await update.message.delete()
     
     return PRODUCT_PRICE
@@ -72,7 +72,7 @@ async def handle_product_price(update: Update, context: ContextTypes.DEFAULT_TYP
             
         context.user_data['product_data']['price'] = price
         
-        current_message_id = context.user_data.get('current_message_id')
+        current_message_id = user_states.get(update.effective_user.id).current_message_id
         if current_message_id:
             try:
                 await context.bot.delete_message(
@@ -89,7 +89,7 @@ async def handle_product_price(update: Update, context: ContextTypes.DEFAULT_TYP
             ]])
         )
         
-        context.user_data['current_message_id'] = sent_message.message_id
+        user_states.get(update.effective_user.id).current_message_id = sent_message.message_id
         await update.message.delete()
         
         return PRODUCT_STOCK
@@ -102,7 +102,7 @@ async def handle_product_price(update: Update, context: ContextTypes.DEFAULT_TYP
             ]])
         )
         
-        context.user_data['current_message_id'] = sent_message.message_id
+        user_states.get(update.effective_user.id).current_message_id = sent_message.message_id
         await update.message.delete()
         
         return PRODUCT_PRICE
@@ -116,7 +116,7 @@ async def handle_product_stock(update: Update, context: ContextTypes.DEFAULT_TYP
             
         context.user_data['product_data']['stock'] = stock
         
-        current_message_id = context.user_data.get('current_message_id')
+        current_message_id = user_states.get(update.effective_user.id).current_message_id
         if current_message_id:
             try:
                 await context.bot.delete_message(
@@ -133,7 +133,7 @@ async def handle_product_stock(update: Update, context: ContextTypes.DEFAULT_TYP
             ]])
         )
         
-        context.user_data['current_message_id'] = sent_message.message_id
+        user_states.get(update.effective_user.id).current_message_id = sent_message.message_id
         await update.message.delete()
         
         return PRODUCT_IMAGE
@@ -146,7 +146,7 @@ async def handle_product_stock(update: Update, context: ContextTypes.DEFAULT_TYP
             ]])
         )
         
-        context.user_data['current_message_id'] = sent_message.message_id
+        user_states.get(update.effective_user.id).current_message_id = sent_message.message_id
         await update.message.delete()
         
         return PRODUCT_STOCK
@@ -156,13 +156,10 @@ async def handle_product_image(update: Update, context: ContextTypes.DEFAULT_TYP
     if update.message.photo:
         try:
             product_data = context.user_data['product_data']
-            product_dir = os.path.join(PRODUCTS_DIR, product_data['name'])
-            os.makedirs(product_dir, exist_ok=True)
             
+            # Fotoğraf içerik adresli medya deposuna kaydedilir (aynı dosya tekrar yazılmaz)
             photo = update.message.photo[-1]
-            photo_file = await context.bot.get_file(photo.file_id)
-            image_path = os.path.join(product_dir, 'product.jpg')
-            await photo_file.download_to_drive(image_path)
+            image_path, _ = await media_store.put_telegram_file(db, context.bot, photo.file_id)
             
             success = db.add_product(
                 name=product_data['name'],
@@ -177,6 +174,7 @@ async def handle_product_image(update: Update, context: ContextTypes.DEFAULT_TYP
             if success:
                 message = "✅ Ürün başarıyla eklendi!"
             else:
+                await media_store.release(db, image_path)
                 message = "❌ Ürün eklenirken bir hata oluştu."
             
             keyboard = [[InlineKeyboardButton("🔙 Ürün Yönetimine Dön", callback_data='admin_products')]]
@@ -321,19 +319,9 @@ async def handle_delete_product(update: Update, context: ContextTypes.DEFAULT_TY
         )
         return
 
-    # Delete product image if exists
-    if product[4] and os.path.exists(product[4]):
-        try:
-            os.remove(product[4])
-            # Try to remove product directory if empty
-            product_dir = os.path.dirname(product[4])
-            if os.path.exists(product_dir) and not os.listdir(product_dir):
-                os.rmdir(product_dir)
-        except Exception as e:
-            logger.error(f"Error deleting product image: {e}")
-
-    # Delete product from database
+    # Delete product from database, then drop its reference to the image
     if db.delete_product(product_id):
+        await media_store.release(db, product[4])
         message = f"✅ {product[1]} başarıyla silindi!"
     else:
         message = "❌ Ürün silinirken bir hata oluştu."
@@ -1,7 +1,11 @@
+import io
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from database import Database
+from config import ADMIN_ID
+from utils.metrics import metrics
+from database.query_profiler import format_query_report, get_query_stats, is_profiling
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
@@ -228,6 +232,7 @@ async def show_performance_stats(update: Update, context: ContextTypes.DEFAULT_T
 
         keyboard = [
             [InlineKeyboardButton("🔄 Yenile", callback_data='performance_stats')],
+            [InlineKeyboardButton("⏱️ Gecikme Raporu", callback_data='latency_stats')],
             [InlineKeyboardButton("🔙 İstatistik Menüsü", callback_data='stats_menu')]
         ]
         
@@ -243,4 +248,75 @@ async def show_performance_stats(update: Update, context: ContextTypes.DEFAULT_T
             reply_markup=InlineKeyboardMarkup([[
                 InlineKeyboardButton("🔙 İstatistik Menüsü", callback_data='stats_menu')
             ]])
-        )
\ No newline at end of file
+        )
+
+def format_latency_report(limit: int = 5) -> str:
+    """Top routes, queries and API calls by total time since startup or the last reset"""
+    sections = (
+        ('bot_handler', "🤖 İşleyiciler"),
+        ('db_query', "🗄️ Veritabanı"),
+        ('telegram_api', "📡 Telegram API"),
+    )
+    since = datetime.fromtimestamp(metrics.started_at).strftime('%d.%m.%Y %H:%M')
+    message = f"⏱️ Gecikme Raporu\n({since} itibarıyla, toplam süreye göre)\n"
+    for family, title in sections:
+        message += f"\n{title}:\n"
+        rows = metrics.top(family, limit)
+        if not rows:
+            message += "• Kayıt yok\n"
+            continue
+        for label, histogram in rows:
+            avg_ms = histogram.total / histogram.count * 1000
+            p95 = histogram.quantile(0.95)
+            p95_text = f"{p95 * 1000:.0f}ms" if p95 != float('inf') else ">10s"
+            message += f"• {label}: {histogram.count}x, ort {avg_ms:.0f}ms, p95 ≤{p95_text}"
+            if histogram.errors:
+                message += f", ❌ {histogram.errors}"
+            message += "\n"
+    return message
+
+async def show_latency_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show handler/DB/API latency summary (callback or /perf command)"""
+    if update.effective_user.id != ADMIN_ID:
+        return
+    try:
+        message = format_latency_report()
+        if update.callback_query:
+            keyboard = [
+                [InlineKeyboardButton("🔄 Yenile", callback_data='latency_stats')],
+                [InlineKeyboardButton("🐢 Yavaş Sorgu Raporu", callback_data='slow_queries')],
+                [InlineKeyboardButton("🔙 Performans Raporu", callback_data='performance_stats')]
+            ]
+            await update.callback_query.message.edit_text(
+                message,
+                reply_markup=InlineKeyboardMarkup(keyboard)
+            )
+        else:
+            await update.message.reply_text(message)
+    except Exception as e:
+        logger.error(f"Error showing latency stats: {e}")
+
+async def show_slow_queries(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Send the query profile report as a file (callback or /slowq command)"""
+    if update.effective_user.id != ADMIN_ID:
+        return
+    try:
+        stats = get_query_stats(limit=50)
+        if not is_profiling():
+            summary = "🐢 Sorgu profili kapalı (QUERY_PROFILING=1 ile açılır)."
+        else:
+            full_scans = sum(1 for s in stats if s['full_scan'])
+            slow = sum(s['slow'] for s in stats)
+            summary = (f"🐢 Yavaş Sorgu Raporu\n\n"
+                       f"• Ölçülen sorgu tipi: {len(stats)}\n"
+                       f"• Yavaş çalışma: {slow}\n"
+                       f"• Tam tablo taraması: {full_scans}")
+        await context.bot.send_message(chat_id=update.effective_chat.id, text=summary)
+        if stats:
+            await context.bot.send_document(
+                chat_id=update.effective_chat.id,
+                document=io.BytesIO(format_query_report().encode('utf-8')),
+                filename=f"yavas_sorgular_{datetime.now().strftime('%Y%m%d_%H%M')}.txt"
+            )
+    except Exception as e:
+        logger.error(f"Error sending slow query report: {e}")
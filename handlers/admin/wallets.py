@@ -2,43 +2,37 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from database import Database
 from states import WALLET_INPUT
+from utils.validators import parse_wallet_lines
+import io
 import logging
 
 logger = logging.getLogger(__name__)
 db = Database('shop.db')
 
+MAX_IMPORT_FILE_SIZE = 1024 * 1024
+# Bundan uzun raporlar dosya olarak gönderilir
+INLINE_REPORT_LINES = 40
+
+WALLETS_PER_PAGE = 10
+STATE_LABELS = {
+    'all': "Tümü",
+    'available': "🟢 Müsait",
+    'assigned': "👤 Atanmış",
+    'temporary': "🔴 Geçici",
+}
+IMPORT_ERRORS = {
+    'format': "❌ Geçersiz adres biçimi",
+    'checksum': "❌ Adres sağlama toplamı hatalı",
+}
+
 async def manage_wallets(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show improved wallet management menu with accurate counts"""
-    # Doğru cüzdan istatistiklerini hesapla
-    try:
-        # Kullanıcılara atanmış cüzdan sayısını al (user_wallets tablosundan)
-        db.cur.execute("SELECT COUNT(DISTINCT wallet_id) FROM user_wallets")
-        assigned_wallets = db.cur.fetchone()[0] or 0
-        
-        # Toplam cüzdan sayısını al
-        db.cur.execute("SELECT COUNT(*) FROM wallets")
-        total_wallets = db.cur.fetchone()[0] or 0
-        
-        # İşlemde olan ama kullanıcıya atanmamış cüzdanları bul
-        db.cur.execute("""
-            SELECT COUNT(*) FROM wallets w
-            WHERE w.in_use = 1
-            AND NOT EXISTS (
-                SELECT 1 FROM user_wallets uw 
-                WHERE uw.wallet_id = w.id
-            )
-        """)
-        temporary_in_use = db.cur.fetchone()[0] or 0
-        
-        # Gerçekten müsait olan cüzdan sayısı
-        available_wallets = total_wallets - assigned_wallets - temporary_in_use
-    except Exception as e:
-        logger.error(f"Error calculating wallet stats: {e}")
-        # Sorun durumunda eski yönteme geri dön
-        available_wallets = db.get_available_wallet_count()
-        temporary_in_use = db.get_in_use_wallet_count()
-        total_wallets = db.get_total_wallet_count()
-        assigned_wallets = 0  # Bunu bilemeyiz sorun olunca
+    # Tüm sayılar tek sorguda
+    summary = db.wallet_dashboard.get_summary()
+    available_wallets = summary['available']
+    assigned_wallets = summary['assigned']
+    temporary_in_use = summary['temporary']
+    total_wallets = summary['total']
     
     # Müsait cüzdan kalmadıysa uyarı
     warning = ""
@@ -80,7 +74,9 @@ async def add_wallet(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.callback_query.message.edit_text(
         """🏦 Yeni TRC20 Cüzdan Ekle
 
-Lütfen TRC20 cüzdan adresini girin:
+Lütfen TRC20 cüzdan adresini girin.
+
+📋 Toplu ekleme: Her satıra bir adres yazabilir veya .txt/.csv dosyası gönderebilirsiniz.
 
 ⚠️ Önemli:
 • Sadece TRC20 cüzdan adresleri kabul edilir
@@ -118,138 +114,160 @@ async def release_all_wallets(update: Update, context: ContextTypes.DEFAULT_TYPE
             ]])
         )
 async def handle_wallet_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle the wallet address input"""
-    wallet_address = update.message.text.strip()
-    user_id = update.effective_user.id
+    """Handle wallet addresses: one address, a pasted list or an uploaded .txt/.csv file"""
+    back_markup = InlineKeyboardMarkup([[
+        InlineKeyboardButton("🔙 Cüzdan Havuzuna Dön", callback_data='admin_wallets')
+    ]])
+    
+    if update.message.document:
+        document = update.message.document
+        if document.file_size and document.file_size > MAX_IMPORT_FILE_SIZE:
+            await update.message.reply_text("❌ Dosya çok büyük (en fazla 1 MB).", reply_markup=back_markup)
+            return ConversationHandler.END
+        try:
+            telegram_file = await context.bot.get_file(document.file_id)
+            text = (await telegram_file.download_as_bytearray()).decode('utf-8-sig', errors='replace')
+        except Exception as e:
+            logger.error(f"Error downloading wallet import file: {e}")
+            await update.message.reply_text("❌ Dosya okunamadı.", reply_markup=back_markup)
+            return ConversationHandler.END
+    else:
+        text = update.message.text or ''
     
     try:
         await update.message.delete()
     except Exception as e:
         logger.error(f"Error deleting user message: {e}")
     
-    # Basic TRC20 address validation
-    if not wallet_address.startswith('T') or len(wallet_address) != 34:
+    lines = parse_wallet_lines(text)
+    valid = [address for _, address, error in lines if error is None]
+    result = db.add_wallets(valid)
+    if result is None:
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
-            text="❌ Geçersiz TRC20 cüzdan adresi! Lütfen tekrar deneyin.",
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("🔙 Cüzdan Havuzuna Dön", callback_data='admin_wallets')
-            ]])
+            text="❌ Cüzdanlar eklenirken bir hata oluştu, hiçbir adres eklenmedi.",
+            reply_markup=back_markup
         )
         return ConversationHandler.END
+    added, existing = result
     
-    success = db.add_wallet(wallet_address)
-    if success:
-        await context.bot.send_message(
+    # Her satır için sonuç
+    report = []
+    seen = set()
+    counts = {'added': 0, 'existing': 0, 'repeated': 0, 'invalid': 0}
+    for line_no, address, error in lines:
+        if error:
+            status, label = 'invalid', IMPORT_ERRORS[error]
+        elif address in seen:
+            status, label = 'repeated', "🔁 Listede tekrar"
+        elif address in existing:
+            status, label = 'existing', "♻️ Zaten havuzda"
+        else:
+            status, label = 'added', "✅ Eklendi"
+        seen.add(address)
+        counts[status] += 1
+        report.append((line_no, address, label))
+    
+    logger.info(f"Wallet import by {update.effective_user.id}: {counts}")
+    
+    if not lines:
+        summary = "❌ Geçersiz TRC20 cüzdan adresi! Lütfen tekrar deneyin."
+    elif len(lines) == 1:
+        _, address, label = report[0]
+        summary = "✅ Cüzdan başarıyla eklendi!" if counts['added'] else f"{label}: {address}"
+    else:
+        report_text = "\n".join(f"{line_no}. {address} — {label}" for line_no, address, label in report)
+        summary = (f"📥 Cüzdan İçe Aktarma Sonucu\n\n"
+                   f"✅ Eklendi: {counts['added']}\n"
+                   f"♻️ Zaten havuzda: {counts['existing']}\n"
+                   f"🔁 Listede tekrar: {counts['repeated']}\n"
+                   f"❌ Geçersiz: {counts['invalid']}")
+        if len(report) <= INLINE_REPORT_LINES:
+            summary += "\n\n" + report_text
+    
+    await context.bot.send_message(
+        chat_id=update.effective_chat.id,
+        text=summary,
+        reply_markup=back_markup
+    )
+    if len(report) > INLINE_REPORT_LINES:
+        # Uzun rapor mesaja sığmaz, dosya olarak gönderilir
+        await context.bot.send_document(
             chat_id=update.effective_chat.id,
-            text="✅ Cüzdan başarıyla eklendi!",
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("🔙 Cüzdan Havuzuna Dön", callback_data='admin_wallets')
-            ]])
-        )
-    else:  # Address might already exist
-        await context.bot.send_message(
-            chat_id=update.effective_chat.id,
-            text="❌ Bu cüzdan adresi zaten havuzda mevcut veya eklenirken bir hata oluştu.",
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("🔙 Cüzdan Havuzuna Dön", callback_data='admin_wallets')
-            ]])
+            document=io.BytesIO(report_text.encode('utf-8')),
+            filename="cuzdan_ice_aktarma_raporu.txt"
         )
     
     return ConversationHandler.END
 
 async def list_wallets(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Show list of all wallets with user assignment information"""
+    """Show one page of wallets, filtered by state"""
     query = update.callback_query
     
-    try:
-        # Cüzdan-kullanıcı ilişkilerini göster
-        db.cur.execute("""
-            SELECT 
-                w.id, 
-                w.address, 
-                w.in_use,
-                uw.user_id,
-                (SELECT COUNT(*) FROM purchase_requests WHERE wallet = w.address) as usage_count,
-                (SELECT 
-                    CASE 
-                        WHEN COUNT(*) > 0 THEN MAX(created_at) 
-                        ELSE NULL 
-                    END 
-                FROM purchase_requests WHERE wallet = w.address) as last_used_date
-            FROM wallets w
-            LEFT JOIN user_wallets uw ON w.id = uw.wallet_id
-            ORDER BY w.in_use DESC, uw.user_id IS NOT NULL DESC, last_used_date DESC
-        """)
-        wallets = db.cur.fetchall()
-    except Exception as e:
-        logger.error(f"Error fetching wallets: {e}")
-        wallets = []
+    # wallets_page:<durum>:<a|b>:<imleç id>  (a = sonrası, b = öncesi)
+    state, backwards, cursor = 'all', False, 0
+    if query.data.startswith('wallets_page:'):
+        _, state, direction, cursor = query.data.split(':')
+        backwards, cursor = direction == 'b', int(cursor)
     
-    if not wallets:
-        await query.message.edit_text(
-            "❌ Havuzda cüzdan bulunmamaktadır.",
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("🔙 Cüzdan Havuzuna Dön", callback_data='admin_wallets')
-            ]])
-        )
-        return
+    summary = db.wallet_dashboard.get_summary()
+    wallets, has_more = db.wallet_dashboard.get_page(state, cursor, backwards, WALLETS_PER_PAGE)
     
     message = "📋 Cüzdan Havuzu\n\n"
-    keyboard = []
-    
-    # Kullanımda, atanmış ve müsait cüzdan sayılarını hesapla
-    in_use_count = sum(1 for wallet in wallets if wallet[2])
-    assigned_count = sum(1 for wallet in wallets if wallet[3] is not None)
-    available_count = len(wallets) - assigned_count
+    message += (f"📊 Özet: {summary['total']} cüzdan ({summary['available']} müsait, "
+                f"{summary['assigned']} atanmış, {summary['temporary']} geçici)\n")
+    message += f"🔎 Filtre: {STATE_LABELS[state]}\n\n"
+    keyboard = [[
+        InlineKeyboardButton(("• " if key == state else "") + label, callback_data=f'wallets_page:{key}:a:0')
+        for key, label in STATE_LABELS.items()
+    ]]
     
-    message += f"📊 Özet: {len(wallets)} cüzdan ({available_count} müsait, {assigned_count} atanmış)\n\n"
+    if not wallets:
+        message += "❌ Bu filtrede cüzdan bulunmamaktadır."
     
-    for i, wallet in enumerate(wallets, 1):
-        wallet_id, address, in_use, user_id, usage_count, last_used = wallet
-        
-        if user_id is not None:
-            status = f"👤 Kullanıcıya Atandı: {user_id}"
-        elif in_use:
+    for wallet in wallets:
+        if wallet.user_id is not None:
+            status = f"👤 Kullanıcıya Atandı: {wallet.user_id}"
+        elif wallet.in_use:
             status = "🔴 Kullanımda (Geçici)"
         else:
             status = "🟢 Müsait"
         
-        message += f"{i}. 🏦 {address[:8]}...{address[-8:]}\n"
+        message += f"#{wallet.id} 🏦 {wallet.address[:8]}...{wallet.address[-8:]}\n"
         message += f"📊 Durum: {status}\n"
         
-        if usage_count and usage_count > 0:
-            message += f"🔄 Kullanım: {usage_count} kez\n"
-            
-        if last_used:
-            message += f"⏱️ Son Kullanım: {last_used}\n"
+        if wallet.usage_count:
+            message += f"🔄 Kullanım: {wallet.usage_count} kez\n"
+        if wallet.received:
+            message += f"💰 Alınan: {wallet.received:.2f} USDT\n"
+        if wallet.last_used:
+            message += f"⏱️ Son Kullanım: {wallet.last_used}\n"
             
         message += "───────────────\n"
         
         # Sadece müsait (kullanıcıya atanmamış ve in_use=0) cüzdanlar silinebilir
-        if not in_use and user_id is None:
+        if not wallet.in_use and wallet.user_id is None:
             keyboard.append([
                 InlineKeyboardButton(
-                    f"❌ Sil: {address[:8]}...",
-                    callback_data=f'delete_wallet_{wallet_id}'
+                    f"❌ Sil: {wallet.address[:8]}...",
+                    callback_data=f'delete_wallet_{wallet.id}'
                 )
             ])
     
+    # Sayfalama: imleç sayfadaki ilk/son cüzdanın id'si
+    has_previous = has_more if backwards else cursor > 0
+    has_next = True if backwards else has_more
+    navigation = []
+    if wallets and has_previous:
+        navigation.append(InlineKeyboardButton("⬅️ Önceki", callback_data=f'wallets_page:{state}:b:{wallets[0].id}'))
+    if wallets and has_next:
+        navigation.append(InlineKeyboardButton("Sonraki ➡️", callback_data=f'wallets_page:{state}:a:{wallets[-1].id}'))
+    if navigation:
+        keyboard.append(navigation)
+    
     keyboard.append([InlineKeyboardButton("🔙 Cüzdan Havuzuna Dön", callback_data='admin_wallets')])
     
-    try:
-        await query.message.edit_text(
-            message,
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
-    except Exception as e:
-        logger.error(f"Error showing wallets, message too long: {e}")
-        # Mesaj çok uzunsa, kısaltılmış bir versiyonunu göster
-        simplified_message = "📋 Cüzdan Havuzu\n\n"
-        simplified_message += f"📊 Özet: {len(wallets)} cüzdan ({available_count} müsait, {assigned_count} atanmış)\n\n"
-        simplified_message += "Cüzdanları yönetmek için aşağıdaki butonları kullanın."
-        
-        await query.message.edit_text(
-            simplified_message,
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
\ No newline at end of file
+    await query.message.edit_text(
+        message,
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
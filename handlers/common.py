@@ -6,6 +6,8 @@ from states import *
 from database import Database
 from .menu import show_main_menu
 from utils.menu_utils import show_generic_menu
+from utils.message_manager import message_tracker
+from utils.user_state import user_states
 from .admin.order_cleanup_handler import show_cleanup_confirmation, handle_cleanup_orders
 from .admin.payments import show_admin_orders_by_status
 from .admin.locations import (
@@ -41,6 +43,8 @@ from .admin import (
     show_general_stats,
     show_user_stats, 
     show_performance_stats,
+    show_latency_stats,
+    show_slow_queries,
     start_broadcast,
     handle_purchase_approval,
     release_all_wallets,
@@ -91,7 +95,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     "🔐 Lütfen erişim şifresini girin:",
                     reply_markup=None
                 )
-                context.user_data['password_message_id'] = query.message.message_id
+                user_states.get(update.effective_user.id).password_message_id = query.message.message_id
             except Exception as e:
                 # If editing fails (likely due to identical content), delete and send new
                 try:
@@ -104,7 +108,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     text="🔐 Lütfen erişim şifresini girin:",
                     reply_markup=None
                 )
-                context.user_data['password_message_id'] = sent_message.message_id
+                user_states.get(update.effective_user.id).password_message_id = sent_message.message_id
             
             return PASSWORD_VERIFICATION
             
@@ -121,7 +125,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     text=error_message,
                     reply_markup=None
                 )
-                context.user_data['password_message_id'] = query.message.message_id
+                user_states.get(update.effective_user.id).password_message_id = query.message.message_id
             except Exception as e:
                 logger.debug(f"Could not edit message: {e}")
                 try:
@@ -134,7 +138,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     text=error_message,
                     reply_markup=None
                 )
-                context.user_data['password_message_id'] = sent_message.message_id
+                user_states.get(update.effective_user.id).password_message_id = sent_message.message_id
                 
             return PASSWORD_VERIFICATION
         
@@ -249,7 +253,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         elif query.data == 'add_wallet':
             await add_wallet(update, context)
             return WALLET_INPUT
-        elif query.data == 'list_wallets':
+        elif query.data == 'list_wallets' or query.data.startswith('wallets_page:'):
             await list_wallets(update, context)
             return
         elif query.data.startswith('delete_wallet_'):
@@ -288,6 +292,12 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         elif query.data == 'performance_stats':
             await show_performance_stats(update, context)
             return
+        elif query.data == 'latency_stats':
+            await show_latency_stats(update, context)
+            return
+        elif query.data == 'slow_queries':
+            await show_slow_queries(update, context)
+            return
         elif query.data == 'manage_categories':
             await manage_categories(update, context)
             return
@@ -518,8 +528,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 await remove_discount(update, context)
             except ImportError:
                 # If not imported, define a simple inline version
-                if 'active_discount' in context.user_data:
-                    del context.user_data['active_discount']
+                user_states.get(update.effective_user.id).discount_coupon_id = None
                 await query.answer("✅ İndirim kaldırıldı", show_alert=True)
                 await show_cart(update, context)
             return
@@ -556,28 +565,20 @@ async def force_delete_previous_messages(update, context, bot):
     Forces deletion of previous messages to keep UI clean
     """
     user_id = update.effective_chat.id
-    # List of all possible message ID keys we might be tracking
-    message_keys = [
-        'menu_message_id', 
-        'last_payment_message', 
+    # Kullanıcı durumunda takip edilen mesajlar (şifre mesajı hariç)
+    message_ids = user_states.get(update.effective_user.id).pop_message_ids((
+        'menu_message_id',
         'last_bot_message_id',
         'current_message_id',
-        'payment_prev_message_id'
-    ]
+        'payment_prev_message_id',
+        'last_payment_message_id'
+    ))
     
-    # Try to delete any tracked messages
-    for key in message_keys:
-        if key in context.user_data:
-            message_id = context.user_data[key]
-            try:
-                await bot.delete_message(chat_id=user_id, message_id=message_id)
-                del context.user_data[key]  # Remove the reference
-            except Exception as e:
-                pass  # Ignore errors, just continue
-    
-    # Also try to delete current message if it's a callback
+    # Also delete current message if it's a callback
     if update.callback_query and update.callback_query.message:
-        try:
-            await update.callback_query.message.delete()
-        except Exception as e:
-            pass 
\ No newline at end of file
+        message_ids.append(update.callback_query.message.message_id)
+    
+    message_ids.extend(message_tracker.pop_all(user_id))
+    
+    # Tek toplu istek, arka planda; yeni menü beklemeden gönderilir
+    message_tracker.schedule_delete(bot, user_id, list(dict.fromkeys(message_ids)))
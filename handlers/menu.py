@@ -5,6 +5,8 @@ from config import ADMIN_ID, PRODUCTS_DIR,BOT_PASSWORD
 from states import PASSWORD_VERIFICATION,PRODUCT_NAME, PRODUCT_DESCRIPTION, PRODUCT_PRICE, PRODUCT_IMAGE, EDIT_NAME, EDIT_DESCRIPTION, EDIT_PRICE, BROADCAST_MESSAGE, SUPPORT_TICKET, CART_QUANTITY
 from database import Database
 from utils.menu_utils import show_generic_menu
+from utils.score_ingestor import score_ingestor
+from utils.user_state import user_states
 
 
 logger = logging.getLogger(__name__)
@@ -72,19 +74,7 @@ def get_main_menu_keyboard(user_id):
 
 def get_user_coupon_count(user_id):
     """Kullanıcının aktif kupon sayısını döndürür"""
-    try:
-        db.cur.execute(
-            """SELECT COUNT(*) 
-               FROM discount_coupons 
-               WHERE user_id = ? AND is_used = 0 
-                 AND (expires_at IS NULL OR expires_at > datetime('now'))""",
-            (user_id,)
-        )
-        result = db.cur.fetchone()
-        return result[0] if result else 0
-    except Exception as e:
-        logger.error(f"Error getting coupon count: {e}")
-        return 0
+    return len(db.coupons.get_active(user_id))
 async def show_main_menu(update, context, message=None):
     """Ana menüyü gösterir - menünün sabit kalması için aynı mesajı düzenler"""
     user_id = update.effective_user.id
@@ -132,7 +122,7 @@ async def verify_password(update: Update, context: ContextTypes.DEFAULT_TYPE):
             logger.error(f"Error authorizing user {user_id}: {e}")
         
         # Şifre mesajını sil veya düzenle
-        password_message_id = context.user_data.get('password_message_id')
+        password_message_id = user_states.get(update.effective_user.id).password_message_id
         if password_message_id:
             try:
                 await context.bot.delete_message(
@@ -150,7 +140,7 @@ async def verify_password(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
     else:
         # Şifre yanlış - önceki mesajı tamamen sil
-        password_message_id = context.user_data.get('password_message_id')
+        password_message_id = user_states.get(update.effective_user.id).password_message_id
         if password_message_id:
             try:
                 await context.bot.delete_message(
@@ -166,7 +156,7 @@ async def verify_password(update: Update, context: ContextTypes.DEFAULT_TYPE):
             text="❌ Yanlış şifre. Lütfen doğru şifreyi yazın:",
             reply_markup=None  # No buttons at all for wrong password
         )
-        context.user_data['password_message_id'] = sent_message.message_id
+        user_states.get(update.effective_user.id).password_message_id = sent_message.message_id
         return PASSWORD_VERIFICATION
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Karşılama mesajını göster ve ana menüyü oluştur"""
@@ -182,8 +172,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     
                     logger.info(f"Processing game score: session={game_session}, score={score}, user={user_id}")
                     
-                    # Save score to database
-                    if db.save_game_score(user_id, game_session, score):
+                    # Save score to database (validated and group-committed)
+                    result = await score_ingestor.submit(db, user_id, game_session, score)
+                    if result.ok:
                         # Determine discount based on score
                         discount = 0
                         if score >= 2000:
@@ -277,7 +268,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 reply_markup=None
             )
             # Mesaj ID'sini sakla
-            context.user_data['password_message_id'] = sent_message.message_id
+            user_states.get(update.effective_user.id).password_message_id = sent_message.message_id
             return PASSWORD_VERIFICATION
         
         logger.info("Starting new conversation")
@@ -3,6 +3,7 @@ from telegram.ext import ContextTypes, ConversationHandler
 from database import Database
 from config import ADMIN_ID
 from states import CART_QUANTITY
+from utils.user_state import user_states
 import logging
 import asyncio
 from datetime import datetime
@@ -18,7 +19,7 @@ async def show_cart(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         if update.callback_query:
             await update.callback_query.message.delete()
-        context.user_data.pop('menu_message_id', None)
+        user_states.get(user_id).menu_message_id = None
     except Exception as e:
         logger.error(f"Error deleting message: {e}")
     
@@ -33,16 +34,15 @@ async def show_cart(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     # Calculate total before discount
-    total = sum(item[2] * item[3] for item in cart_items)  # price * quantity
-    total_items = sum(item[3] for item in cart_items)  # sum of quantities
+    total_items, total = db.cart.get_totals(user_id)
     
-    # Check for active discount code in user_data
-    discount_info = context.user_data.get('active_discount')
+    # Check for active discount coupon in the user state
+    coupon = db.coupons.get_active_by_id(user_id, user_states.get(user_id).discount_coupon_id)
     applied_discount_text = ""
     final_total = total
     
-    if discount_info and discount_info.get('valid'):
-        discount_percent = discount_info.get('discount_percent', 0)
+    if coupon:
+        discount_percent = coupon.discount_percent
         discount_amount = (total * discount_percent) / 100
         final_total = total - discount_amount
         applied_discount_text = f"\n💯 İndirim: %{discount_percent} (-{discount_amount:.2f} USDT)"
@@ -120,8 +120,9 @@ async def handle_add_to_cart(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
         return ConversationHandler.END
     
-    context.user_data['adding_to_cart'] = product_id
-    context.user_data['last_bot_message_id'] = query.message.message_id
+    state = user_states.get(update.effective_user.id)
+    state.adding_to_cart = product_id
+    state.last_bot_message_id = query.message.message_id
     
     try:
         await query.message.edit_text(
@@ -139,7 +140,7 @@ async def handle_add_to_cart(update: Update, context: ContextTypes.DEFAULT_TYPE)
                 InlineKeyboardButton("🔙 İptal", callback_data='view_products')
             ]])
         )
-        context.user_data['last_bot_message_id'] = sent_message.message_id
+        state.last_bot_message_id = sent_message.message_id
         
         try:
             await query.message.delete()
@@ -154,7 +155,7 @@ async def handle_cart_quantity(update: Update, context: ContextTypes.DEFAULT_TYP
     """Handle quantity input for cart item with stock validation"""
     try:
         quantity = int(update.message.text)
-        last_message_id = context.user_data.get('last_bot_message_id')
+        last_message_id = user_states.get(update.effective_user.id).last_bot_message_id
         
         if not last_message_id:
             await update.message.delete()
@@ -175,7 +176,7 @@ async def handle_cart_quantity(update: Update, context: ContextTypes.DEFAULT_TYP
             )
             return CART_QUANTITY
             
-        product_id = context.user_data.get('adding_to_cart')
+        product_id = user_states.get(update.effective_user.id).adding_to_cart
         if not product_id:
             await update.message.delete()
             await context.bot.edit_message_text(
@@ -188,7 +189,7 @@ async def handle_cart_quantity(update: Update, context: ContextTypes.DEFAULT_TYP
             )
             return ConversationHandler.END
         
-        # Check current stock
+        # Check that the product still exists
         product = db.get_product(product_id)
         if not product:
             await update.message.delete()
@@ -202,20 +203,11 @@ async def handle_cart_quantity(update: Update, context: ContextTypes.DEFAULT_TYP
             )
             return ConversationHandler.END
         
-        current_stock = product[5]
-        
-        # Get user's current cart items for this product
+        # Stok kontrolü ve miktar birleştirme tek sorguda yapılır
         user_id = update.effective_user.id
-        db.cur.execute(
-            """SELECT SUM(quantity) FROM cart 
-               WHERE user_id = ? AND product_id = ?""",
-            (user_id, product_id)
-        )
-        result = db.cur.fetchone()
-        current_cart_quantity = result[0] if result and result[0] else 0
+        new_quantity = db.cart.add_item(user_id, product_id, quantity)
         
-        # Calculate if there's enough stock
-        if quantity > current_stock:
+        if new_quantity is None:
             await update.message.delete()
             await context.bot.edit_message_text(
                 chat_id=update.effective_chat.id,
@@ -227,14 +219,11 @@ async def handle_cart_quantity(update: Update, context: ContextTypes.DEFAULT_TYP
             )
             return CART_QUANTITY
         
-        # Add to cart
-        db.add_to_cart(update.effective_user.id, product_id, quantity)
-        
         # Delete user's message
         await update.message.delete()
         
         # Get total items in cart
-        cart_count = db.get_cart_count(update.effective_user.id)
+        cart_count = db.get_cart_count(user_id)
         
         # Edit previous message with success message
         await context.bot.edit_message_text(
@@ -284,13 +273,12 @@ async def handle_discount_code(update: Update, context: ContextTypes.DEFAULT_TYP
     result = db.validate_discount_coupon(coupon_code, user_id)
     
     if result["valid"]:
-        # Store discount info in user_data for later use
-        context.user_data['active_discount'] = result
+        # Store the coupon ID for later use
+        user_states.get(user_id).discount_coupon_id = result['coupon_id']
         message = f"✅ {result['message']}"
     else:
         # Clear any existing discount
-        if 'active_discount' in context.user_data:
-            del context.user_data['active_discount']
+        user_states.get(user_id).discount_coupon_id = None
         message = f"❌ {result['message']}"
     
     # Send a temporary notification
@@ -329,8 +317,8 @@ async def show_user_coupons(update: Update, context: ContextTypes.DEFAULT_TYPE):
     keyboard = []
     
     # Get active discount if any
-    active_discount = context.user_data.get('active_discount')
-    active_coupon_code = active_discount.get('coupon_code') if active_discount and active_discount.get('valid') else None
+    active_coupon = db.coupons.get_active_by_id(user_id, user_states.get(user_id).discount_coupon_id)
+    active_coupon_code = active_coupon.code if active_coupon else None
     
     for code, discount, source, expires in coupons:
         expires_text = ""
@@ -355,7 +343,7 @@ async def show_user_coupons(update: Update, context: ContextTypes.DEFAULT_TYPE):
             ])
     
     # Add option to remove discount if one is active
-    if active_discount and active_discount.get('valid'):
+    if active_coupon:
         keyboard.append([
             InlineKeyboardButton("❌ İndirimi Kaldır", callback_data="remove_discount")
         ])
@@ -376,17 +364,14 @@ async def apply_coupon_from_list(update: Update, context: ContextTypes.DEFAULT_T
     result = db.validate_discount_coupon(coupon_code, user_id)
     
     if result["valid"]:
-        # Store coupon code in result for reference
-        result['coupon_code'] = coupon_code
-        # Store discount info in user_data for later use
-        context.user_data['active_discount'] = result
+        # Store the coupon ID for later use
+        user_states.get(user_id).discount_coupon_id = result['coupon_id']
         
         # Send a temporary notification
         await update.callback_query.answer(f"✅ {result['message']}", show_alert=True)
     else:
         # Clear any existing discount
-        if 'active_discount' in context.user_data:
-            del context.user_data['active_discount']
+        user_states.get(user_id).discount_coupon_id = None
         
         # Send error notification
         await update.callback_query.answer(f"❌ {result['message']}", show_alert=True)
@@ -397,8 +382,7 @@ async def apply_coupon_from_list(update: Update, context: ContextTypes.DEFAULT_T
 async def remove_discount(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Remove applied discount"""
     # Clear the active discount
-    if 'active_discount' in context.user_data:
-        del context.user_data['active_discount']
+    user_states.get(update.effective_user.id).discount_coupon_id = None
     
     # Notify user
     await update.callback_query.answer("✅ İndirim kaldırıldı", show_alert=True)
@@ -1,7 +1,9 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from database import Database
+from database.coupons import COUPON_ACTIVE, COUPON_USED
 import logging
+import time
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -14,31 +16,27 @@ async def show_my_coupons(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         # Get all coupons for the user
         db.cur.execute(
-            """SELECT coupon_code, discount_percent, source, expires_at, is_used, created_at
+            """SELECT coupon_code, discount_percent, source, expires_ts, is_used, created_at
                FROM discount_coupons 
                WHERE user_id = ?
                ORDER BY is_used ASC, created_at DESC""",
             (user_id,)
         )
         all_coupons = db.cur.fetchall()
+        now = time.time()
         
         # Organize coupons into active and used
         active_coupons = []
         used_coupons = []
         
         for coupon in all_coupons:
-            code, discount, source, expires_at, is_used, created_at = coupon
+            code, discount, source, expires_ts, is_used, created_at = coupon
             
-            # Check if expired
-            is_expired = False
+            # Süpürücü henüz işaretlemediyse süresi dolmuş kupon hâlâ is_used = 0'dır
+            is_expired = expires_ts is not None and expires_ts <= now
             expires_text = ""
-            if expires_at:
-                try:
-                    expiry_date = datetime.strptime(expires_at, '%Y-%m-%d %H:%M:%S')
-                    is_expired = expiry_date < datetime.now()
-                    expires_text = f"\n⏰ Son Kullanım: {expiry_date.strftime('%d.%m.%Y')}"
-                except Exception as e:
-                    logger.error(f"Date parsing error: {e}")
+            if expires_ts is not None:
+                expires_text = f"\n⏰ Son Kullanım: {datetime.fromtimestamp(expires_ts).strftime('%d.%m.%Y')}"
             
             # Format coupon details
             coupon_info = {
@@ -51,9 +49,10 @@ async def show_my_coupons(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 "created_at": created_at
             }
             
-            if is_used:
+            # Süresi dolan kuponlar (süpürülmüş olsun ya da olmasın) listelenmez
+            if is_used == COUPON_USED:
                 used_coupons.append(coupon_info)
-            elif not is_expired:
+            elif is_used == COUPON_ACTIVE and not is_expired:
                 active_coupons.append(coupon_info)
         
         # Create message with properly formatted coupon information
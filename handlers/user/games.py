@@ -7,6 +7,9 @@ import calendar
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from database import Database
+from utils.score_ingestor import score_ingestor
+from utils.campaign_runner import campaign_runner
+from config import ADMIN_ID, GAME_BASE_URL
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
@@ -34,16 +37,7 @@ async def show_games_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
         
         # Get Flappy Weed stats
-        user_best = db.get_user_best_score(user_id)
-        user_total = db.get_user_total_score(user_id)
-        
-        # Get total games played
-        db.cur.execute(
-            "SELECT COUNT(*) FROM game_scores WHERE user_id = ?",
-            (user_id,)
-        )
-        result = db.cur.fetchone()
-        games_played = result[0] if result else 0
+        user_total, user_best, games_played = db.scores.get_totals(user_id)
         
         # Calculate next month's reset date
         next_reset = get_next_month_reset_date()
@@ -283,19 +277,9 @@ async def confirm_reward(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Kullanıcının bu ay bu indirim oranını talep ettiğini kaydet
         db.record_claimed_discount(user_id, discount)
         
-        # Kullanılan puanı düş
-        # Puanı azaltmak için negatif skor kaydet
-        try:
-            # Özel bir "puan düşürme" kaydı ekle
-            db.cur.execute(
-                "INSERT INTO game_scores (user_id, session_id, score, game_type) VALUES (?, ?, ?, ?)",
-                (user_id, "reward_claim", -threshold, "reward_claim")
-            )
-            db.conn.commit()
+        # Kullanılan puanı düş (negatif skor kaydı, toplam da güncellenir)
+        if db.scores.record_adjustment(user_id, -threshold, "reward_claim"):
             logger.info(f"Kullanıcı {user_id} ödül için {threshold} puan kullandı")
-        except Exception as e:
-            logger.error(f"Puan düşürülürken hata: {e}")
-            # Hata olsa bile devam et, en azından kuponu oluşturduysak kullanıcı görsün
         
         # Kullanıcıya başarı mesajı göster
         message = f"""🎉 Tebrikler! Ödülünüz başarıyla oluşturuldu!
@@ -363,6 +347,7 @@ async def reset_monthly_scores():
         except Exception as e:
             logger.error(f"Skor geçmişi kaydedilirken hata: {e}")
         db.cur.execute("DELETE FROM game_scores")
+        db.scores.reset()
         db.reset_claimed_discounts()
         db.conn.commit()
         logger.info("Tüm oyun skorları ve talep edilen indirimler başarıyla sıfırlandı.")
@@ -446,22 +431,19 @@ async def send_reset_notifications(bot):
 
 💯 Ödüllerinizi talep etmezseniz, tüm puanlarınız kaybolacak!"""
         
-        # Tüm aktif kullanıcılara bildirim gönder
-        for user_id in active_users:
-            try:
-                await bot.send_message(
-                    chat_id=user_id,
-                    text=message,
-                    reply_markup=InlineKeyboardMarkup([
-                        [InlineKeyboardButton("🎮 Oyun Menüsüne Git", callback_data='games_menu')],
-                        [InlineKeyboardButton("🎁 Ödüllerimi Talep Et", callback_data='claim_rewards')]
-                    ])
-                )
-            except Exception as e:
-                logger.error(f"Kullanıcı {user_id}'e bildirim gönderilirken hata: {e}")
-                continue
+        # Ay başına tek kampanya: zamanlayıcı tekrar tetiklese de bildirim bir kez gider
+        campaign_key = f"reset_warning:{get_next_month_reset_date().strftime('%Y-%m')}"
+        summary = await campaign_runner.start(
+            bot, db, campaign_key, message, active_users,
+            reply_markup=InlineKeyboardMarkup([
+                [InlineKeyboardButton("🎮 Oyun Menüsüne Git", callback_data='games_menu')],
+                [InlineKeyboardButton("🎁 Ödüllerimi Talep Et", callback_data='claim_rewards')]
+            ]),
+            admin_id=ADMIN_ID
+        )
         
-        logger.info("Sıfırlama bildirimleri gönderildi.")
+        if summary:
+            logger.info("Sıfırlama bildirimleri gönderildi.")
         return True
     
     except Exception as e:
@@ -475,7 +457,7 @@ async def play_flappy_weed(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         # Oyun oturumu oluştur
         game_session = f"{user_id}_{str(uuid.uuid4())}"
-        game_url = f"https://mmeekh.github.io/dened/Static/game.html?session={game_session}"
+        game_url = f"{GAME_BASE_URL}/game.html?session={game_session}"
         
         # Oturumu veritabanına kaydet
         db.create_game_session(user_id, game_session)
@@ -528,7 +510,7 @@ async def start_flappy_game(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Oturum bilgisini veritabanına kaydet
         db.create_game_session(user_id, game_session)
         
-        game_url = f"https://mmeekh.github.io/dened/Static/game.html?session={game_session}"
+        game_url = f"{GAME_BASE_URL}/game.html?session={game_session}"
         
         logger.info(f"User {user_id} started game with session {game_session}")
         
@@ -559,7 +541,8 @@ async def handle_game_score(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         # Skor verilerini farklı formatlardan çıkart
         if update.message and update.message.text and 'save_score_' in update.message.text:
-            parts = update.message.text.split('save_score_')[1].split('_')
+            # Oturum kimliği alt çizgi içerir ({user_id}_{uuid}), skor en sondadır
+            parts = update.message.text.split('save_score_')[1].rsplit('_', 1)
             if len(parts) >= 2:
                 game_session = parts[0]
                 score = int(parts[1])
@@ -577,23 +560,22 @@ async def handle_game_score(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         logger.info(f"Skor işleniyor: kullanıcı={user_id}, skor={score}")
         
-        # Skoru normal tabloya kaydet
-        db.cur.execute(
-            "INSERT INTO game_scores (user_id, session_id, score) VALUES (?, ?, ?)",
-            (user_id, game_session, score)
-        )
-        db.conn.commit()
-        
-        # Toplam skoru al
-        db.cur.execute(
-            "SELECT SUM(score) FROM game_scores WHERE user_id = ?",
-            (user_id,)
-        )
-        result = db.cur.fetchone()
-        total_score = result[0] if result and result[0] else 0
+        # Skor oturuma karşı doğrulanır ve diğer skorlarla birlikte tek işlemde kaydedilir
+        result = await score_ingestor.submit(db, user_id, game_session, score)
+        if not result.ok:
+            logger.warning(f"Skor reddedildi: kullanıcı={user_id}, oturum={game_session}, sebep={result.reason}")
+            await context.bot.send_message(
+                chat_id=user_id,
+                text="❌ Bu oyun oturumu geçersiz veya skoru zaten kaydedilmiş.",
+                reply_markup=InlineKeyboardMarkup([
+                    [InlineKeyboardButton("🎮 Tekrar Oyna", callback_data='play_flappy_weed')],
+                    [InlineKeyboardButton("🔙 Oyun Menüsü", callback_data='games_menu')]
+                ])
+            )
+            return
         
-        # En yüksek skoru al
-        user_best = db.get_user_best_score(user_id)
+        total_score = result.total
+        user_best = result.best
         
         # Bu skorla elde edilebilecek potansiyel ödülü hesapla
         potential_reward = None
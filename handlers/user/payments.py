@@ -3,10 +3,13 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from utils.exchange import get_usdt_try_rate
 from utils.menu_utils import cleanup_old_messages
+from utils.message_manager import message_tracker
+from utils.user_state import user_states
 from database import Database
+from database.cart import invalidate_cart_total
+from database.coupons import redeem_coupon
 from config import ADMIN_ID
 import qrcode
-from telegram.error import BadRequest
 import random
 from io import BytesIO
 
@@ -14,20 +17,17 @@ logger = logging.getLogger(__name__)
 db = Database('shop.db')
 wallet = None
 
-async def safely_delete_message(bot, chat_id, message_id):
-    """Safely delete a message, handling the case where message doesn't exist"""
-    try:
-        await bot.delete_message(chat_id=chat_id, message_id=message_id)
-        return True
-    except BadRequest as e:
-        if "Message to delete not found" in str(e):
-            return False
-        else:
-            logger.error(f"BadRequest error deleting message: {e}")
-            return False
-    except Exception as e:
-        logger.error(f"Error deleting message: {e}")
-        return False
+def cleanup_payment_messages(update, context):
+    """Delete the callback message and the last payment message in one batch"""
+    message_ids = []
+    if update.callback_query and update.callback_query.message:
+        message_ids.append(update.callback_query.message.message_id)
+    
+    state = user_states.get(update.effective_user.id)
+    message_ids.append(state.last_payment_message_id)
+    state.last_payment_message_id = None
+    
+    return message_tracker.schedule_delete(context.bot, update.effective_chat.id, message_ids)
 async def show_payment_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show payment menu with improved message cleanup"""
     try:
@@ -40,7 +40,7 @@ async def show_payment_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         # Store message IDs with consistent naming to be tracked for future cleanup
         if update.callback_query and update.callback_query.message:
-            context.user_data['payment_prev_message_id'] = update.callback_query.message.message_id
+            user_states.get(update.effective_user.id).payment_prev_message_id = update.callback_query.message.message_id
     
     except Exception as e:
         logger.error(f"Error in message cleanup: {e}")
@@ -51,11 +51,12 @@ async def show_payment_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    context.user_data['last_payment_message'] = await context.bot.send_message(
+    sent_message = await context.bot.send_message(
         chat_id=update.effective_chat.id,
         text="💳 Ödeme İşlemleri",
         reply_markup=reply_markup
     )
+    user_states.get(update.effective_user.id).last_payment_message_id = sent_message.message_id
 async def handle_purchase_request(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle purchase request creation with discount application"""
     logger.info("Starting purchase request process")
@@ -89,14 +90,14 @@ async def handle_purchase_request(update: Update, context: ContextTypes.DEFAULT_
     logger.info(f"Cart total for user {user_id}: {total} USDT")
     
     # Apply discount if available
-    discount_info = context.user_data.get('active_discount')
+    coupon = db.coupons.get_active_by_id(user_id, user_states.get(user_id).discount_coupon_id)
     discount_text = ""
     discount_percent = 0
     coupon_id = None
     
-    if discount_info and discount_info.get('valid'):
-        discount_percent = discount_info.get('discount_percent', 0)
-        coupon_id = discount_info.get('coupon_id')
+    if coupon:
+        discount_percent = coupon.discount_percent
+        coupon_id = coupon.id
         discount_amount = (subtotal * discount_percent) / 100
         total = subtotal - discount_amount
         discount_text = f"\n🏷️ İndirim: %{discount_percent} (-{discount_amount:.2f} USDT)"
@@ -178,19 +179,27 @@ Lütfen daha sonra tekrar deneyin veya destek ekibiyle iletişime geçin.""",
         
         # 3. Apply coupon if used
         if coupon_id:
-            db.cur.execute(
-                "UPDATE discount_coupons SET is_used = 1 WHERE id = ?",
-                (coupon_id,)
-            )
-            # Clear discount from user_data
-            if 'active_discount' in context.user_data:
-                del context.user_data['active_discount']
+            # Clear discount from the user state
+            user_states.get(user_id).discount_coupon_id = None
+            if not redeem_coupon(db.cur, coupon_id):
+                # Kupon bu arada kullanılmış veya süresi dolmuş: sipariş indirimle oluşturulmaz
+                db.conn.rollback()
+                logger.warning(f"Coupon {coupon_id} of user {user_id} is no longer valid, order not created")
+                await update.callback_query.message.edit_text(
+                    "❌ Uyguladığınız kupon artık geçerli değil (kullanılmış veya süresi dolmuş).\n"
+                    "İndirim sepetinizden kaldırıldı, lütfen siparişi tekrar gözden geçirin.",
+                    reply_markup=InlineKeyboardMarkup([[
+                        InlineKeyboardButton("🔙 Sepete Dön", callback_data='show_cart')
+                    ]])
+                )
+                return
         
         # 4. Clear the cart
         db.cur.execute("DELETE FROM cart WHERE user_id = ?", (user_id,))
         
         # Commit the transaction
         db.conn.commit()
+        invalidate_cart_total(user_id)
         logger.info(f"Successfully created purchase request #{request_id}")
         
     except Exception as e:
@@ -391,21 +400,7 @@ async def show_wallet_address(update: Update, context: ContextTypes.DEFAULT_TYPE
 async def show_payment_howto(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show payment instructions with proper message cleanup"""
     try:
-        if update.callback_query and update.callback_query.message:
-            await safely_delete_message(
-                context.bot,
-                update.effective_chat.id,
-                update.callback_query.message.message_id
-            )
-                
-        last_message = context.user_data.get('last_payment_message')
-        if last_message and hasattr(last_message, 'message_id'):
-            await safely_delete_message(
-                context.bot,
-                update.effective_chat.id,
-                last_message.message_id
-            )
-            context.user_data.pop('last_payment_message', None)
+        cleanup_payment_messages(update, context)
     except Exception as e:
         logger.error(f"Error in message cleanup: {e}")
     
@@ -447,32 +442,19 @@ Binance'den başka bir cüzdana TRC20 ağıyla USDT göndermek için:
     keyboard = [[InlineKeyboardButton("🔙 Ödeme Menüsüne Dön", callback_data='payment_menu')]]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    context.user_data['last_payment_message'] = await context.bot.send_message(
+    sent_message = await context.bot.send_message(
         chat_id=update.effective_chat.id,
         text=message,
         reply_markup=reply_markup
     )
+    user_states.get(update.effective_user.id).last_payment_message_id = sent_message.message_id
 async def show_qr_code(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show QR code for payment with wallet address even without active request"""
     user_id = update.effective_user.id
     
     # Clean up previous messages
     try:
-        if update.callback_query and update.callback_query.message:
-            await safely_delete_message(
-                context.bot,
-                update.effective_chat.id,
-                update.callback_query.message.message_id
-            )
-        
-        last_message = context.user_data.get('last_payment_message')
-        if last_message and hasattr(last_message, 'message_id'):
-            await safely_delete_message(
-                context.bot,
-                update.effective_chat.id,
-                last_message.message_id
-            )
-            context.user_data.pop('last_payment_message', None)
+        cleanup_payment_messages(update, context)
     except Exception as e:
         logger.error(f"Error in message cleanup: {e}")
     
@@ -519,7 +501,7 @@ async def show_qr_code(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 👤 Bu cüzdan sizin için ayrılmıştır, tüm ödemelerinizde aynı adresi kullanacaksınız."""
         
-        context.user_data['last_payment_message'] = await context.bot.send_photo(
+        sent_message = await context.bot.send_photo(
             chat_id=update.effective_chat.id,
             photo=bio,
             caption=message,
@@ -528,6 +510,7 @@ async def show_qr_code(update: Update, context: ContextTypes.DEFAULT_TYPE):
             ]),
             parse_mode='HTML'
         )
+        user_states.get(update.effective_user.id).last_payment_message_id = sent_message.message_id
         
     except Exception as e:
         logger.error(f"Error generating QR code: {e}")
@@ -1,6 +1,8 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from database import Database
+from database.catalog import get_catalog
+from utils.media_store import media_store
 import os
 import logging
 
@@ -22,14 +24,15 @@ async def show_products_menu(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 async def view_products(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show all products"""
-    products = db.get_products()
+    catalog = get_catalog(db)
+    cards = catalog.cards if catalog else ()
     
     try:
         await update.callback_query.message.delete()
     except Exception as e:
         logger.error(f"Error deleting message: {e}")
     
-    if not products:
+    if not cards:
         keyboard = [[InlineKeyboardButton("🔙 Ana Menü", callback_data='main_menu')]]
         reply_markup = InlineKeyboardMarkup(keyboard)
         await context.bot.send_message(
@@ -39,36 +42,28 @@ async def view_products(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    for product in products:
-        message = f"🔸 {product[1]}\n"
-        message += f"📝 {product[2]}\n"
-        message += f"💰 {product[3]} USDT"
-        
-        keyboard = [
-            [InlineKeyboardButton(f"🛒 Sepete Ekle", callback_data=f'add_to_cart_{product[0]}')],
-        ]
-        
-        if product == products[-1]:
-            keyboard.append([InlineKeyboardButton("🔙 Ana Menü", callback_data='main_menu')])
-        
+    # Mesaj metni ve klavyeler katalog yüklenirken hazırlanır
+    for product, message, reply_markup in cards:
         try:
-            if product[4] and os.path.exists(product[4]):
+            # Listede tam boy yerine küçük resim gönderilir
+            photo_path = media_store.thumbnail_for(product[4])
+            if photo_path and os.path.exists(photo_path):
                 await context.bot.send_photo(
                     chat_id=update.effective_chat.id,
-                    photo=open(product[4], 'rb'),
+                    photo=open(photo_path, 'rb'),
                     caption=message,
-                    reply_markup=InlineKeyboardMarkup(keyboard)
+                    reply_markup=reply_markup
                 )
             else:
                 await context.bot.send_message(
                     chat_id=update.effective_chat.id,
                     text=message,
-                    reply_markup=InlineKeyboardMarkup(keyboard)
+                    reply_markup=reply_markup
                 )
         except Exception as e:
             logger.error(f"Error sending product {product[1]}: {e}")
             await context.bot.send_message(
                 chat_id=update.effective_chat.id,
                 text=message,
-                reply_markup=InlineKeyboardMarkup(keyboard)
+                reply_markup=reply_markup
             )
\ No newline at end of file
@@ -1,151 +1,268 @@
 import sqlite3
+import asyncio
 import logging
 from datetime import datetime, timedelta
+from database.archive import attach_archive, archive_orders
 
-# Logger kurulumu
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[
-        logging.FileHandler('cleanup.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
-def cleanup_old_orders(db_name='shop.db', days=30):
+# Siparişlerin durumları: sadece sonuçlanmış siparişler temizlenir
+FINISHED_STATUSES = ('completed', 'rejected')
+
+
+class OrderRetentionEngine:
+    """
+    Sonuçlanmış siparişleri küçük partiler halinde arşivler ve siler
+
+    Her parti kısa bir transaction içinde önce arşiv veritabanına (sıkıştırılmış
+    ürün listesiyle) kopyalanır, sonra sıcak tablolardan silinir. İlerleme
+    retention_jobs tablosuna yazılır; yarıda kalan bir iş aynı kriterle tekrar
+    başlatıldığında kaldığı yerden devam eder.
+    """
+
+    def __init__(self, db_name='shop.db', batch_size=500, pause=0.05, archive=True):
+        # SQLite'ın değişken limitinin (999) altında kal
+        self.batch_size = min(batch_size, 900)
+        self.pause = pause
+        self.conn = sqlite3.connect(db_name, timeout=30, check_same_thread=False)
+        # Arşiv bağlanamazsa siparişleri silmek yerine hata ver
+        self.archive = archive and attach_archive(self.conn, db_name)
+        if archive and not self.archive:
+            raise RuntimeError("Sipariş arşivi bağlanamadı, temizleme iptal edildi")
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS retention_jobs (
+            id INTEGER PRIMARY KEY,
+            criteria TEXT NOT NULL,
+            cutoff TEXT,
+            last_id INTEGER DEFAULT 0,
+            total INTEGER DEFAULT 0,
+            orders_deleted INTEGER DEFAULT 0,
+            items_deleted INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'running',
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+        self.conn.commit()
+        self.job = None
+
+    def close(self):
+        try:
+            self.conn.close()
+        except Exception as e:
+            logger.error(f"Bağlantı kapatılırken hata: {e}")
+
+    def _where(self, cutoff):
+        placeholders = ','.join('?' * len(FINISHED_STATUSES))
+        clause = f"status IN ({placeholders})"
+        params = list(FINISHED_STATUSES)
+        if cutoff:
+            clause += " AND created_at < ?"
+            params.append(cutoff)
+        return clause, params
+
+    def start(self, days=None):
+        """
+        Yeni bir temizleme işi başlatır veya yarım kalanı devam ettirir
+
+        Parameters:
+        days (int): Kaç günden eski siparişler; None ise tüm sonuçlanmış siparişler
+
+        Returns:
+        dict: İş bilgisi (id, total, last_id, orders_deleted, items_deleted)
+        """
+        criteria = 'all' if days is None else f'older_than_{days}d'
+        row = self.conn.execute(
+            """SELECT id, cutoff, last_id, total, orders_deleted, items_deleted
+               FROM retention_jobs WHERE criteria = ? AND status = 'running'
+               ORDER BY id DESC LIMIT 1""",
+            (criteria,)
+        ).fetchone()
+
+        if row:
+            job_id, cutoff, last_id, total, orders_deleted, items_deleted = row
+            logger.info(f"Yarım kalan temizleme işi #{job_id} devam ettiriliyor (son ID: {last_id})")
+        else:
+            cutoff = None
+            if days is not None:
+                cutoff = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+            clause, params = self._where(cutoff)
+            total = self.conn.execute(
+                f"SELECT COUNT(*) FROM purchase_requests WHERE {clause}", params
+            ).fetchone()[0]
+            cur = self.conn.execute(
+                "INSERT INTO retention_jobs (criteria, cutoff, total) VALUES (?, ?, ?)",
+                (criteria, cutoff, total)
+            )
+            self.conn.commit()
+            job_id, last_id, orders_deleted, items_deleted = cur.lastrowid, 0, 0, 0
+            logger.info(f"Temizleme işi #{job_id} başlatıldı: {total} sipariş ({criteria})")
+
+        self.job = {
+            'id': job_id,
+            'cutoff': cutoff,
+            'last_id': last_id,
+            'total': total,
+            'orders_deleted': orders_deleted,
+            'items_deleted': items_deleted,
+        }
+        return dict(self.job)
+
+    def run_batch(self):
+        """
+        Bir parti siler
+
+        Returns:
+        bool: Silinecek sipariş kaldıysa True
+        """
+        job = self.job
+        clause, params = self._where(job['cutoff'])
+        order_ids = [row[0] for row in self.conn.execute(
+            f"""SELECT id FROM purchase_requests
+                WHERE id > ? AND {clause}
+                ORDER BY id LIMIT ?""",
+            [job['last_id']] + params + [self.batch_size]
+        ).fetchall()]
+
+        if not order_ids:
+            self.conn.execute(
+                "UPDATE retention_jobs SET status = 'done', updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (job['id'],)
+            )
+            self.conn.commit()
+            return False
+
+        placeholders = ','.join('?' * len(order_ids))
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+            if self.archive:
+                archive_orders(self.conn, order_ids)
+            items_deleted = self.conn.execute(
+                f"DELETE FROM purchase_request_items WHERE request_id IN ({placeholders})",
+                order_ids
+            ).rowcount
+            orders_deleted = self.conn.execute(
+                f"DELETE FROM purchase_requests WHERE id IN ({placeholders})",
+                order_ids
+            ).rowcount
+            self.conn.execute(
+                """UPDATE retention_jobs
+                   SET last_id = ?, orders_deleted = orders_deleted + ?,
+                       items_deleted = items_deleted + ?, updated_at = CURRENT_TIMESTAMP
+                   WHERE id = ?""",
+                (order_ids[-1], orders_deleted, items_deleted, job['id'])
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        job['last_id'] = order_ids[-1]
+        job['orders_deleted'] += orders_deleted
+        job['items_deleted'] += items_deleted
+        return True
+
+    def progress(self):
+        return dict(self.job) if self.job else {}
+
+    def run(self, days=None):
+        """Temizleme işini senkron olarak sonuna kadar çalıştırır"""
+        self.start(days)
+        while self.run_batch():
+            logger.info(f"İlerleme: {self.job['orders_deleted']}/{self.job['total']} sipariş silindi")
+        logger.info(
+            f"{self.job['orders_deleted']} sipariş ve {self.job['items_deleted']} sipariş ürünü temizlendi."
+        )
+        return self.job['orders_deleted'], self.job['items_deleted']
+
+    async def run_async(self, days=None, progress_callback=None):
+        """
+        Temizleme işini event loop'u bloklamadan çalıştırır
+
+        Her parti ayrı bir thread'de silinir, partiler arasında loop'a dönülür.
+        progress_callback(progress_dict) her partiden sonra çağrılır.
+        """
+        await asyncio.to_thread(self.start, days)
+        while await asyncio.to_thread(self.run_batch):
+            if progress_callback:
+                try:
+                    await progress_callback(self.progress())
+                except Exception as e:
+                    logger.debug(f"İlerleme bildirimi başarısız: {e}")
+            await asyncio.sleep(self.pause)
+        return self.job['orders_deleted'], self.job['items_deleted']
+
+
+def cleanup_old_orders(db_name='shop.db', days=30, archive=True):
     """
     Belirtilen günden eski tüm siparişleri temizler
-    
+
     Parameters:
     db_name (str): Veritabanı dosya adı
     days (int): Kaç günden eski siparişlerin temizleneceği
-    
+    archive (bool): Silmeden önce arşiv veritabanına kopyala
+
     Returns:
     tuple: Silinen sipariş sayısı, silinen sipariş ürünleri sayısı
     """
+    engine = None
     try:
-        # Veritabanına bağlan
-        conn = sqlite3.connect(db_name)
-        cursor = conn.cursor()
-        
-        # Temizlenecek tarih sınırını hesapla
-        cleanup_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
-        logger.info(f"Temizleme işlemi başlatıldı. {cleanup_date} tarihinden eski siparişler temizlenecek.")
-        
-        # Silinecek sipariş ID'lerini al
-        cursor.execute(
-            "SELECT id FROM purchase_requests WHERE created_at < ? AND status IN ('completed', 'rejected')",
-            (cleanup_date,)
-        )
-        order_ids = [row[0] for row in cursor.fetchall()]
-        
-        if not order_ids:
-            logger.info("Temizlenecek sipariş bulunamadı.")
-            conn.close()
-            return 0, 0
-            
-        logger.info(f"Toplam {len(order_ids)} sipariş temizlenecek.")
-        
-        # İlişkili sipariş ürünlerini temizle
-        cursor.execute(
-            f"DELETE FROM purchase_request_items WHERE request_id IN ({','.join(['?'] * len(order_ids))})",
-            order_ids
-        )
-        items_deleted = cursor.rowcount
-        logger.info(f"{items_deleted} sipariş ürünü temizlendi.")
-        
-        # Siparişleri temizle
-        cursor.execute(
-            f"DELETE FROM purchase_requests WHERE id IN ({','.join(['?'] * len(order_ids))})",
-            order_ids
-        )
-        orders_deleted = cursor.rowcount
-        logger.info(f"{orders_deleted} sipariş temizlendi.")
-        
-        # İşlemleri kaydet
-        conn.commit()
-        
-        # Veritabanı bağlantısını kapat
-        conn.close()
-        
-        return orders_deleted, items_deleted
-        
+        engine = OrderRetentionEngine(db_name, archive=archive)
+        return engine.run(days=days)
     except sqlite3.Error as e:
         logger.error(f"Veritabanı hatası: {e}")
         return 0, 0
     except Exception as e:
         logger.error(f"Hata: {e}")
         return 0, 0
+    finally:
+        if engine:
+            engine.close()
 
-def cleanup_all_completed_orders(db_name='shop.db'):
+def cleanup_all_completed_orders(db_name='shop.db', archive=True):
     """
     Tamamlanmış ve reddedilmiş tüm siparişleri temizler
-    
+
     Parameters:
     db_name (str): Veritabanı dosya adı
-    
+    archive (bool): Silmeden önce arşiv veritabanına kopyala
+
     Returns:
     tuple: Silinen sipariş sayısı, silinen sipariş ürünleri sayısı
     """
+    engine = None
     try:
-        # Veritabanına bağlan
-        conn = sqlite3.connect(db_name)
-        cursor = conn.cursor()
-        
-        logger.info("Tamamlanmış ve reddedilmiş tüm siparişlerin temizleme işlemi başlatıldı.")
-        
-        # Silinecek sipariş ID'lerini al
-        cursor.execute(
-            "SELECT id FROM purchase_requests WHERE status IN ('completed', 'rejected')"
-        )
-        order_ids = [row[0] for row in cursor.fetchall()]
-        
-        if not order_ids:
-            logger.info("Temizlenecek sipariş bulunamadı.")
-            conn.close()
-            return 0, 0
-            
-        logger.info(f"Toplam {len(order_ids)} sipariş temizlenecek.")
-        
-        # İlişkili sipariş ürünlerini temizle
-        cursor.execute(
-            f"DELETE FROM purchase_request_items WHERE request_id IN ({','.join(['?'] * len(order_ids))})",
-            order_ids
-        )
-        items_deleted = cursor.rowcount
-        logger.info(f"{items_deleted} sipariş ürünü temizlendi.")
-        
-        # Siparişleri temizle
-        cursor.execute(
-            f"DELETE FROM purchase_requests WHERE id IN ({','.join(['?'] * len(order_ids))})",
-            order_ids
-        )
-        orders_deleted = cursor.rowcount
-        logger.info(f"{orders_deleted} sipariş temizlendi.")
-        
-        # İşlemleri kaydet
-        conn.commit()
-        
-        # Veritabanı bağlantısını kapat
-        conn.close()
-        
-        return orders_deleted, items_deleted
-        
+        engine = OrderRetentionEngine(db_name, archive=archive)
+        return engine.run(days=None)
     except sqlite3.Error as e:
         logger.error(f"Veritabanı hatası: {e}")
         return 0, 0
     except Exception as e:
         logger.error(f"Hata: {e}")
         return 0, 0
+    finally:
+        if engine:
+            engine.close()
 
 # Komut satırından çalıştırıldığında
 if __name__ == "__main__":
     import sys
-    
+
+    # Logger kurulumu
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO,
+        handlers=[
+            logging.FileHandler('cleanup.log'),
+            logging.StreamHandler()
+        ]
+    )
+
+    # --no-archive: siparişleri arşivlemeden kalıcı olarak sil
+    archive = "--no-archive" not in sys.argv
+    sys.argv = [arg for arg in sys.argv if arg != "--no-archive"]
+
     if len(sys.argv) > 1 and sys.argv[1] == "all":
         # Tüm tamamlanmış ve reddedilmiş siparişleri temizle
-        orders, items = cleanup_all_completed_orders()
+        orders, items = cleanup_all_completed_orders(archive=archive)
         print(f"Toplam {orders} sipariş ve {items} sipariş ürünü temizlendi.")
     else:
         # Varsayılan olarak 30 günden eski siparişleri temizle
@@ -155,6 +272,6 @@ if __name__ == "__main__":
                 days = int(sys.argv[1])
             except ValueError:
                 print(f"Geçersiz gün sayısı: {sys.argv[1]}. Varsayılan 30 gün kullanılıyor.")
-        
-        orders, items = cleanup_old_orders(days=days)
-        print(f"{days} günden eski toplam {orders} sipariş ve {items} sipariş ürünü temizlendi.")
\ No newline at end of file
+
+        orders, items = cleanup_old_orders(days=days, archive=archive)
+        print(f"{days} günden eski toplam {orders} sipariş ve {items} sipariş ürünü temizlendi.")
@@ -1,11 +1,14 @@
 from .logger import setup_logger
-from .validators import validate_trc20_address
+from .validators import validate_trc20_address, parse_wallet_lines
 from .menu_utils import show_generic_menu, show_media_menu, create_menu_keyboard
+from .message_manager import message_tracker
 
 __all__ = [
     'setup_logger', 
     'validate_trc20_address',
+    'parse_wallet_lines',
     'show_generic_menu',
     'show_media_menu',
-    'create_menu_keyboard'
+    'create_menu_keyboard',
+    'message_tracker'
 ]
\ No newline at end of file
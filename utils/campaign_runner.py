@@ -0,0 +1,138 @@
+import time
+import asyncio
+import logging
+from typing import Optional, Dict, Iterable, Tuple
+
+from telegram import InlineKeyboardMarkup
+from telegram.error import RetryAfter, Forbidden, BadRequest
+
+logger = logging.getLogger(__name__)
+
+
+class CampaignRunner:
+    """
+    Sends one message to many users
+
+    Sends run with bounded concurrency and a global rate limit; a flood
+    limit (RetryAfter) pauses every worker for the requested time. Each
+    recipient is marked 'sending' in campaign_deliveries before the send and
+    its result is stored as soon as the send returns, so an interrupted
+    campaign resumes with the recipients that are still pending and never
+    messages anyone twice. Failed sends are retried in later passes, and the
+    admin gets a summary when the campaign is done.
+    """
+
+    def __init__(self, concurrency: int = 8, rate: float = 25, chunk_size: int = 50,
+                 max_attempts: int = 3, retry_delay: float = 60):
+        self.concurrency = concurrency
+        # Telegram genel sınırı saniyede ~30 mesaj
+        self.rate = rate
+        self.chunk_size = chunk_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._next_slot = 0.0
+        self._paused_until = 0.0
+        self._running = set()
+
+    async def start(self, bot, db, key: str, text: str, user_ids: Iterable[int],
+                    reply_markup: Optional[InlineKeyboardMarkup] = None,
+                    admin_id: Optional[int] = None) -> Optional[Dict[str, int]]:
+        """Create a campaign and run it; None if this key was already created"""
+        markup = reply_markup.to_dict() if reply_markup else None
+        if not db.campaigns.create(key, text, markup, user_ids):
+            logger.info(f"Campaign {key} already exists, not sending again")
+            return None
+        return await self.run(bot, db, key, admin_id)
+
+    async def resume(self, bot, db, admin_id: Optional[int] = None):
+        """Continue campaigns interrupted by a restart"""
+        for key in db.campaigns.get_running():
+            logger.info(f"Resuming campaign {key}")
+            await self.run(bot, db, key, admin_id)
+
+    async def run(self, bot, db, key: str, admin_id: Optional[int] = None) -> Optional[Dict[str, int]]:
+        if key in self._running:
+            return None
+        campaign = db.campaigns.get(key)
+        if campaign is None:
+            return None
+        self._running.add(key)
+        try:
+            interrupted = db.campaigns.recover(key)
+            if interrupted:
+                logger.warning(f"Campaign {key}: {interrupted} deliveries were interrupted mid-send, not resending")
+            reply_markup = None
+            if campaign['reply_markup']:
+                reply_markup = InlineKeyboardMarkup.de_json(campaign['reply_markup'], bot)
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            for attempt in range(self.max_attempts):
+                if attempt:
+                    if not db.campaigns.get_pending(key, 0, 1, self.max_attempts):
+                        break
+                    await asyncio.sleep(self.retry_delay)
+                last_user_id = 0
+                while True:
+                    user_ids = db.campaigns.get_pending(key, last_user_id, self.chunk_size, self.max_attempts)
+                    if not user_ids:
+                        break
+                    last_user_id = user_ids[-1]
+                    db.campaigns.mark_sending(key, user_ids)
+                    await asyncio.gather(*(
+                        self._deliver(bot, db, key, semaphore, user_id, campaign['text'], reply_markup)
+                        for user_id in user_ids
+                    ))
+
+            summary = db.campaigns.finish(key, self.max_attempts)
+        finally:
+            self._running.discard(key)
+
+        logger.info(f"Campaign {key} finished: {summary}")
+        if admin_id:
+            text = (f"📢 Toplu bildirim tamamlandı\n\n"
+                    f"🏷️ {key}\n"
+                    f"✅ Gönderildi: {summary['sent']}\n"
+                    f"❌ Başarısız: {summary['failed']}\n")
+            if summary['unknown']:
+                text += f"❔ Yarıda kalan: {summary['unknown']}\n"
+            text += f"👥 Toplam: {summary['total']}"
+            try:
+                await bot.send_message(chat_id=admin_id, text=text)
+            except Exception as e:
+                logger.error(f"Error sending campaign summary: {e}")
+        return summary
+
+    async def _throttle(self):
+        now = time.monotonic()
+        slot = max(now, self._next_slot, self._paused_until)
+        self._next_slot = slot + 1 / self.rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _deliver(self, bot, db, key: str, semaphore: asyncio.Semaphore, user_id: int,
+                       text: str, reply_markup):
+        user_id, status, error = await self._send(bot, semaphore, user_id, text, reply_markup)
+        db.campaigns.record(key, user_id, status, error)
+
+    async def _send(self, bot, semaphore: asyncio.Semaphore, user_id: int, text: str,
+                    reply_markup) -> Tuple[int, str, Optional[str]]:
+        async with semaphore:
+            while True:
+                await self._throttle()
+                try:
+                    await bot.send_message(chat_id=user_id, text=text, reply_markup=reply_markup)
+                    return user_id, 'sent', None
+                except RetryAfter as e:
+                    # Sınır aşıldı: tüm gönderimler bekler, bu kullanıcı tekrar denenir
+                    retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+                    logger.warning(f"Flood limit during campaign, pausing for {retry_after}s")
+                    self._paused_until = max(self._paused_until, time.monotonic() + float(retry_after) + 1)
+                except (Forbidden, BadRequest) as e:
+                    # Botu engellemiş veya silinmiş hesap: tekrar denenmez
+                    return user_id, 'failed', str(e)
+                except Exception as e:
+                    logger.warning(f"Campaign message to {user_id} failed, will retry: {e}")
+                    return user_id, 'pending', str(e)
+
+
+campaign_runner = CampaignRunner()
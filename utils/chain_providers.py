@@ -0,0 +1,148 @@
+import time
+import logging
+from abc import ABC, abstractmethod
+from typing import List, Dict, NamedTuple, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Tron ağındaki USDT (TRC20) kontratı ve ondalık basamak sayısı
+USDT_TRC20_CONTRACT = 'TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t'
+USDT_DECIMALS = 6
+
+
+class ChainTransfer(NamedTuple):
+    """An incoming token transfer to one of our wallets"""
+    tx_id: str
+    address: str
+    amount: float
+    # Blok zamanı, unix saniye
+    timestamp: int
+
+
+class ChainProvider(ABC):
+    """
+    Source of incoming transfers for the payment watcher
+
+    fetch_transfers is blocking; the watcher runs it in a thread.
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    def fetch_transfers(self, since_by_address: Dict[str, int]) -> List[ChainTransfer]:
+        """Incoming transfers per wallet made at or after the given unix time"""
+
+
+class FakeChainProvider(ChainProvider):
+    """In-memory provider for local testing, transfers are added by hand"""
+
+    name = 'fake'
+
+    def __init__(self):
+        self.transfers: List[ChainTransfer] = []
+        self.calls = 0
+
+    def add_transfer(self, address: str, amount: float, timestamp: Optional[int] = None,
+                     tx_id: Optional[str] = None) -> ChainTransfer:
+        transfer = ChainTransfer(
+            tx_id or f"fake-{len(self.transfers) + 1}",
+            address,
+            float(amount),
+            int(timestamp if timestamp is not None else time.time())
+        )
+        self.transfers.append(transfer)
+        return transfer
+
+    def fetch_transfers(self, since_by_address: Dict[str, int]) -> List[ChainTransfer]:
+        self.calls += 1
+        return [
+            t for t in self.transfers
+            if t.address in since_by_address and t.timestamp >= since_by_address[t.address]
+        ]
+
+
+class TronGridProvider(ChainProvider):
+    """USDT transfers from the TronGrid REST API, one session for all wallets"""
+
+    name = 'trongrid'
+
+    def __init__(self, api_key: Optional[str] = None, base_url: str = 'https://api.trongrid.io',
+                 contract: str = USDT_TRC20_CONTRACT, timeout: float = 10, page_limit: int = 200,
+                 max_pages: int = 20):
+        self.base_url = base_url.rstrip('/')
+        self.contract = contract
+        self.timeout = timeout
+        # TronGrid sayfa başına en fazla 200 kayıt döndürür
+        self.page_limit = page_limit
+        self.max_pages = max_pages
+        self.session = requests.Session()
+        if api_key:
+            self.session.headers['TRON-PRO-API-KEY'] = api_key
+
+    def fetch_transfers(self, since_by_address: Dict[str, int]) -> List[ChainTransfer]:
+        transfers = []
+        for address, since in since_by_address.items():
+            try:
+                transfers.extend(self._fetch_address(address, since))
+            except Exception as e:
+                # Bir cüzdandaki hata diğerlerini engellemesin
+                logger.error(f"Error fetching transfers for {address}: {e}")
+        return transfers
+
+    def _fetch_address(self, address: str, since: int) -> List[ChainTransfer]:
+        """
+        All incoming transfers to the address since the given time
+
+        TronGrid returns newest first, so pages are followed through
+        meta.fingerprint until they run out or reach transfers older than
+        since. Many small (e.g. address-poisoning) transfers in the window
+        cannot hide an older payment this way; max_pages bounds the cost.
+        """
+        min_timestamp = max(since, 0) * 1000
+        params = {
+            'only_to': 'true',
+            'only_confirmed': 'true',
+            'contract_address': self.contract,
+            'min_timestamp': min_timestamp,
+            'limit': self.page_limit,
+        }
+        transfers = []
+        for _ in range(self.max_pages):
+            response = self.session.get(
+                f"{self.base_url}/v1/accounts/{address}/transactions/trc20",
+                params=params,
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            payload = response.json()
+            items = payload.get('data', [])
+            for item in items:
+                if item.get('to') != address:
+                    continue
+                decimals = int(item.get('token_info', {}).get('decimals', USDT_DECIMALS))
+                transfers.append(ChainTransfer(
+                    item['transaction_id'],
+                    address,
+                    int(item['value']) / (10 ** decimals),
+                    int(item['block_timestamp']) // 1000
+                ))
+            fingerprint = payload.get('meta', {}).get('fingerprint')
+            if not items or not fingerprint or int(items[-1]['block_timestamp']) < min_timestamp:
+                return transfers
+            params['fingerprint'] = fingerprint
+        logger.warning(f"Stopped after {self.max_pages} pages of transfers for {address}")
+        return transfers
+
+
+def create_provider(name: str, api_key: Optional[str] = None) -> Optional[ChainProvider]:
+    """Provider by config name, None disables the watcher"""
+    name = (name or '').strip().lower()
+    if name == 'trongrid':
+        return TronGridProvider(api_key=api_key)
+    if name == 'fake':
+        return FakeChainProvider()
+    if name:
+        logger.error(f"Unknown payment provider: {name}")
+    return None
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Optional, Dict
+from email.utils import formatdate
+
+logger = logging.getLogger(__name__)
+
+STATUS_TEXT = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+class MiniHTTPServer(ABC):
+    """
+    Minimal asyncio HTTP/1.1 server shared by the game and metrics endpoints
+
+    Reads request lines and headers with keep-alive; subclasses answer each
+    request in respond() with exactly one _write call. Request bodies are
+    not supported (GET/HEAD only servers).
+    """
+
+    # Boşta bekleyen keep-alive bağlantısı bu kadar saniye sonra kapanır
+    idle_timeout = 15
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    @abstractmethod
+    def respond(self, writer: asyncio.StreamWriter, method: str, path: str,
+                headers: Dict[str, str], keep_alive: bool):
+        """Write the response to one request; path has no query string, header names are lower case"""
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), timeout=self.idle_timeout)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    self._write(writer, 400, {}, b'', False)
+                    break
+                method, target, version = parts
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                self.respond(writer, method, target.split('?', 1)[0], headers, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.error(f"Error serving {type(self).__name__} request: {e}")
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _write(writer, status: int, headers: Dict[str, str], body: bytes, keep_alive: bool, head: bool = False):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}"]
+        headers = dict(headers)
+        headers['Date'] = formatdate(usegmt=True)
+        if status != 304:
+            headers['Content-Length'] = str(len(body))
+        headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        if body and not head:
+            writer.write(body)
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Telegram fotoğrafları en fazla 1280 px gösterir
+TELEGRAM_MAX_SIDE = 1280
+THUMBNAIL_SIDE = 480
+
+
+def _flatten(img: Image.Image) -> Image.Image:
+    """Convert to RGB, putting transparent images on a white background"""
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+
+def _encode(img: Image.Image, quality: int) -> bytes:
+    out = BytesIO()
+    # exif/icc verilmediği için metadata yazılmaz
+    img.save(out, 'JPEG', quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def normalize_image(data: bytes, max_side: int = TELEGRAM_MAX_SIDE, quality: int = 85,
+                    thumbnail_side: int = THUMBNAIL_SIDE) -> Tuple[bytes, bytes]:
+    """
+    Strip metadata, downscale and re-encode an image as JPEG
+
+    Runs in a worker process. Returns (image, thumbnail).
+    """
+    with Image.open(BytesIO(data)) as source:
+        # EXIF yönünü uygula, sonra metadata'yı at
+        img = _flatten(ImageOps.exif_transpose(source))
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+        image = _encode(img, quality)
+        img.thumbnail((thumbnail_side, thumbnail_side), Image.LANCZOS)
+        thumbnail = _encode(img, quality)
+    return image, thumbnail
+
+
+class ImagePipeline:
+    """
+    Normalizes uploaded images in a process pool
+
+    Pillow work is CPU bound, so it runs outside the bot process; the pool
+    is started on first use. If an image cannot be processed the original
+    bytes are kept.
+    """
+
+    def __init__(self, max_side: int = TELEGRAM_MAX_SIDE, quality: int = 85,
+                 thumbnail_side: int = THUMBNAIL_SIDE, workers: int = 2):
+        self.max_side = max_side
+        self.quality = quality
+        self.thumbnail_side = thumbnail_side
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def process(self, data: bytes) -> Tuple[bytes, Optional[bytes]]:
+        """(normalized image, thumbnail); (data, None) if processing fails"""
+        loop = asyncio.get_running_loop()
+        try:
+            image, thumbnail = await loop.run_in_executor(
+                self._get_pool(), normalize_image, bytes(data),
+                self.max_side, self.quality, self.thumbnail_side
+            )
+            logger.debug(f"Image normalized: {len(data)} -> {len(image)} bytes")
+            return image, thumbnail
+        except Exception as e:
+            logger.error(f"Error normalizing image, keeping original: {e}")
+            return bytes(data), None
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+image_pipeline = ImagePipeline()
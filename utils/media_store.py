@@ -0,0 +1,155 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Optional, Tuple, Iterable, Set, Dict
+
+from .image_pipeline import image_pipeline
+
+logger = logging.getLogger(__name__)
+
+
+def _norm(path: str) -> str:
+    # Veritabanında Windows'ta kaydedilmiş (ters bölülü) yollar da var
+    return os.path.normcase(os.path.abspath(path.replace('\\', '/')))
+
+
+class MediaStore:
+    """
+    Content-addressed storage for product and location images
+
+    Files are stored once under root/<first 2 hex>/<sha256><ext>, with a
+    .thumb thumbnail next to it; identical uploads share a file. References
+    are counted in media_blobs (MediaDB) and unreferenced files are removed
+    by collect_garbage. All file I/O runs in worker threads, database calls
+    stay on the caller's thread.
+    """
+
+    def __init__(self, root: str = 'media', legacy_dirs: Iterable[str] = (), grace_minutes: int = 10):
+        self.root = root
+        # Eski düzendeki (products/<ad>/, locations/<id>/) klasörler de taranır
+        self.legacy_dirs = tuple(legacy_dirs)
+        self.grace_minutes = grace_minutes
+
+    def path_for(self, digest: str, ext: str) -> str:
+        return os.path.join(self.root, digest[:2], f"{digest}{ext}")
+
+    @staticmethod
+    def thumbnail_path(path: str) -> str:
+        base, ext = os.path.splitext(path)
+        return f"{base}.thumb{ext}"
+
+    def thumbnail_for(self, path: Optional[str]) -> Optional[str]:
+        """Thumbnail of a stored image if there is one, otherwise the image itself"""
+        if path:
+            thumbnail = self.thumbnail_path(path)
+            if os.path.exists(thumbnail):
+                return thumbnail
+        return path
+
+    @staticmethod
+    def _write_file(path: str, data: bytes):
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.part"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _write(self, data: bytes, ext: str, thumbnail: Optional[bytes] = None) -> Tuple[str, str, int]:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest, ext)
+        self._write_file(path, data)
+        if thumbnail:
+            self._write_file(self.thumbnail_path(path), thumbnail)
+        return digest, path, len(data)
+
+    async def put_bytes(self, db, data: bytes, ext: str = '.jpg',
+                        thumbnail: Optional[bytes] = None) -> Tuple[str, int]:
+        """
+        Store data and take one reference to it
+
+        Returns (path, previous refcount); a previous refcount above zero
+        means the same content was already stored.
+        """
+        digest, path, size = await asyncio.to_thread(self._write, bytes(data), ext, thumbnail)
+        previous = db.media.acquire(digest, path, size)
+        # GC aynı anda eski kopyayı silmiş olabilir
+        if not os.path.exists(path):
+            await asyncio.to_thread(self._write, bytes(data), ext, thumbnail)
+        return path, previous
+
+    async def put_telegram_file(self, db, bot, file_id: str, ext: str = '.jpg',
+                                normalize: bool = True) -> Tuple[str, int]:
+        """Download a Telegram file into memory, normalize it and store it"""
+        telegram_file = await bot.get_file(file_id)
+        data = await telegram_file.download_as_bytearray()
+        thumbnail = None
+        if normalize:
+            # Metadata temizleme, küçültme ve küçük resim işlem havuzunda yapılır
+            data, thumbnail = await image_pipeline.process(data)
+        return await self.put_bytes(db, data, ext, thumbnail)
+
+    async def release(self, db, path: Optional[str]):
+        """Drop one reference; files outside the store are deleted right away as before"""
+        if not path:
+            return
+        if db.media.release(path) is None:
+            await asyncio.to_thread(self._remove_files, [path])
+
+    def _remove_files(self, paths: Iterable[str]) -> int:
+        removed = 0
+        for path in paths:
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+                    removed += 1
+                # Klasör boş kaldıysa onu da sil
+                directory = os.path.dirname(path)
+                if directory and os.path.isdir(directory) and not os.listdir(directory):
+                    os.rmdir(directory)
+            except Exception as e:
+                logger.error(f"Error deleting media file {path}: {e}")
+        return removed
+
+    def _scan_orphans(self, known: Set[str]) -> Dict[str, int]:
+        """Delete files that neither the store nor any table references"""
+        cutoff = time.time() - self.grace_minutes * 60
+        orphans = []
+        for directory in (self.root,) + self.legacy_dirs:
+            if not os.path.isdir(directory):
+                continue
+            for current, _, files in os.walk(directory):
+                for name in files:
+                    path = os.path.join(current, name)
+                    try:
+                        if _norm(path) not in known and os.path.getmtime(path) < cutoff:
+                            orphans.append(path)
+                    except OSError:
+                        continue
+        return {'orphans_removed': self._remove_files(orphans)}
+
+    async def collect_garbage(self, db) -> Dict[str, int]:
+        """Reconcile references with the tables and remove unreferenced files"""
+        unreferenced = db.media.reconcile(self.grace_minutes)
+        removed = await asyncio.to_thread(self._remove_files, unreferenced)
+        await asyncio.to_thread(self._remove_files, [self.thumbnail_path(p) for p in unreferenced])
+
+        blobs, referenced = db.media.get_known_paths()
+        known = {_norm(p) for p in blobs | referenced}
+        known.update(_norm(self.thumbnail_path(p)) for p in blobs)
+        result = await asyncio.to_thread(self._scan_orphans, known)
+        missing = await asyncio.to_thread(
+            lambda: sum(1 for path in referenced if not os.path.exists(path.replace('\\', '/')))
+        )
+        result.update({'blobs_removed': removed, 'missing_files': missing})
+        if removed or result['orphans_removed']:
+            logger.info(f"Media GC: {removed} unreferenced blobs and {result['orphans_removed']} orphan files removed")
+        if missing:
+            logger.warning(f"Media GC: {missing} referenced images are missing on disk")
+        return result
+
+
+media_store = MediaStore()
@@ -1,26 +1,24 @@
 import logging
 from telegram import Update, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
+from .message_manager import message_tracker, message_id_of
+from .user_state import user_states
 
 logger = logging.getLogger(__name__)
 
 async def cleanup_previous_message(update, context):
     """Delete the previous menu message if it exists"""
     # Get previous message ID
-    prev_message_id = context.user_data.get('menu_message_id')
+    state = user_states.get(update.effective_user.id)
+    prev_message_id, state.menu_message_id = state.menu_message_id, None
     
     if prev_message_id:
-        try:
-            # Try to delete the previous message
-            await context.bot.delete_message(
-                chat_id=update.effective_chat.id,
-                message_id=prev_message_id
-            )
-            # Clear from user_data after deletion
-            context.user_data.pop('menu_message_id', None)
-        except Exception as e:
-            # Log error but continue
-            logger.debug(f"Could not delete previous menu message: {e}")
+        # Silme işlemi arka planda yapılır, yeni menü beklemez
+        message_tracker.schedule_delete(
+            context.bot,
+            update.effective_chat.id,
+            [prev_message_id]
+        )
 async def show_generic_menu(update, context, text, reply_markup=None):
     """Show a menu, maintaining UI consistency by cleaning up previous messages"""
     # Always clean up previous messages first
@@ -48,46 +46,45 @@ async def show_generic_menu(update, context, text, reply_markup=None):
     )
     
     # Store the message ID
-    context.user_data['menu_message_id'] = sent_message.message_id
+    user_states.get(update.effective_user.id).menu_message_id = sent_message.message_id
+    message_tracker.track(update.effective_chat.id, sent_message.message_id)
     
     return sent_message
 async def cleanup_old_messages(bot, chat_id, message_ids=None, context=None):
     """
     Clean up old messages to keep the chat tidy
     
+    Messages are removed with batched deleteMessages calls in a background
+    task, so the caller can render the next menu right away.
+    
     Args:
         bot: The bot instance
         chat_id: The chat ID where messages should be deleted
         message_ids: Optional list of specific message IDs to delete
         context: Optional context with user_data containing tracked messages
+        
+    Returns:
+        int: Number of messages scheduled for deletion
     """
-    deleted_count = 0
-    
-    # Delete specific message IDs if provided
-    if message_ids:
-        for msg_id in message_ids:
-            try:
-                await bot.delete_message(chat_id=chat_id, message_id=msg_id)
-                deleted_count += 1
-            except Exception as e:
-                logger.debug(f"Could not delete message {msg_id}: {e}")
+    to_delete = list(message_ids or [])
                 
-    # Delete tracked messages in context if provided
+    # Collect tracked messages in context if provided
     if context and hasattr(context, 'user_data'):
         tracked_keys = [k for k in context.user_data.keys() if k.endswith('_message_id')]
         
         for key in tracked_keys:
-            msg_id = context.user_data.get(key)
+            msg_id = message_id_of(context.user_data.pop(key))
             if msg_id:
-                try:
-                    await bot.delete_message(chat_id=chat_id, message_id=msg_id)
-                    # Remove the key after successful deletion
-                    context.user_data.pop(key)
-                    deleted_count += 1
-                except Exception as e:
-                    logger.debug(f"Could not delete tracked message {key}: {e}")
-    
-    return deleted_count
+                to_delete.append(msg_id)
+        # Özel sohbetlerde chat_id == user_id
+        if chat_id in user_states:
+            to_delete.extend(user_states.get(chat_id).pop_message_ids())
+    
+    to_delete.extend(message_tracker.pop_all(chat_id))
+    to_delete = list(dict.fromkeys(to_delete))
+    
+    message_tracker.schedule_delete(bot, chat_id, to_delete)
+    return len(to_delete)
 async def show_photo_message(update, context, photo_path, caption, reply_markup=None):
     """Send a photo message with consistent UI management"""
     # Clean up previous message
@@ -102,7 +99,8 @@ async def show_photo_message(update, context, photo_path, caption, reply_markup=
     )
     
     # Store message ID for future cleanup
-    context.user_data['menu_message_id'] = sent_message.message_id
+    user_states.get(update.effective_user.id).menu_message_id = sent_message.message_id
+    message_tracker.track(update.effective_chat.id, sent_message.message_id)
     
     return sent_message
 async def show_media_menu(update: Update, context: ContextTypes.DEFAULT_TYPE,
@@ -121,17 +119,16 @@ async def show_media_menu(update: Update, context: ContextTypes.DEFAULT_TYPE,
     try:
         # Bu bir formatı değiştirme durumu (metin -> resim), 
         # bu yüzden mevcut mesajı silip yeni resimli mesaj göndermek daha güvenli
-        current_message_id = context.user_data.get('menu_message_id')
+        state = user_states.get(update.effective_user.id)
+        current_message_id, state.menu_message_id = state.menu_message_id, None
         
-        # Eğer varsa mevcut mesajı sil
+        # Eğer varsa mevcut mesajı arka planda sil
         if current_message_id:
-            try:
-                await context.bot.delete_message(
-                    chat_id=update.effective_chat.id,
-                    message_id=current_message_id
-                )
-            except Exception as e:
-                logger.debug(f"Eski mesajı silerken hata: {e}")
+            message_tracker.schedule_delete(
+                context.bot,
+                update.effective_chat.id,
+                [current_message_id]
+            )
         
         # Kullanıcı mesajını sil
         if update.message:
@@ -149,7 +146,8 @@ async def show_media_menu(update: Update, context: ContextTypes.DEFAULT_TYPE,
                 reply_markup=reply_markup
             )
             # Yeni mesaj ID'sini kaydet
-            context.user_data['menu_message_id'] = sent_message.message_id
+            user_states.get(update.effective_user.id).menu_message_id = sent_message.message_id
+            message_tracker.track(update.effective_chat.id, sent_message.message_id)
         except Exception as photo_e:
             logger.error(f"Resim gönderirken hata: {photo_e}")
             # Resim gönderilemezse, metin mesajı göster
@@ -158,7 +156,7 @@ async def show_media_menu(update: Update, context: ContextTypes.DEFAULT_TYPE,
                 text=f"[Resim gösterilemedi]\n\n{caption}",
                 reply_markup=reply_markup
             )
-            context.user_data['menu_message_id'] = sent_message.message_id
+            user_states.get(update.effective_user.id).menu_message_id = sent_message.message_id
             
     except Exception as e:
         logger.error(f"Resimli menü gösterirken hata: {e}")
@@ -169,7 +167,7 @@ async def show_media_menu(update: Update, context: ContextTypes.DEFAULT_TYPE,
                 text="⚠️ Resimli menü gösterilirken bir hata oluştu.",
                 reply_markup=reply_markup if reply_markup else None
             )
-            context.user_data['menu_message_id'] = sent_message.message_id
+            user_states.get(update.effective_user.id).menu_message_id = sent_message.message_id
         except Exception as final_e:
             logger.error(f"Son çare mesajını gösterirken bile hata: {final_e}")
 
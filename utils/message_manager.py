@@ -0,0 +1,99 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Telegram deleteMessages tek çağrıda en fazla 100 mesaj kabul ediyor
+DELETE_BATCH_SIZE = 100
+# Sohbet başına takip edilen en fazla mesaj sayısı (eskiler düşer)
+MAX_TRACKED_PER_CHAT = 200
+
+
+class MessageTracker:
+    """Tracks bot message IDs per chat and deletes them in batches"""
+
+    def __init__(self):
+        self._messages = {}
+        self._tasks = set()
+
+    def track(self, chat_id, message_id):
+        """Remember a bot message so it can be cleaned up later"""
+        if not message_id:
+            return
+        ids = self._messages.setdefault(chat_id, [])
+        if message_id not in ids:
+            ids.append(message_id)
+            if len(ids) > MAX_TRACKED_PER_CHAT:
+                del ids[:len(ids) - MAX_TRACKED_PER_CHAT]
+
+    def forget(self, chat_id, message_id):
+        """Stop tracking a message (e.g. it was deleted elsewhere)"""
+        ids = self._messages.get(chat_id)
+        if ids and message_id in ids:
+            ids.remove(message_id)
+            if not ids:
+                del self._messages[chat_id]
+
+    def pop_all(self, chat_id):
+        """Return and clear every tracked message ID of a chat"""
+        return self._messages.pop(chat_id, [])
+
+    async def delete_now(self, bot, chat_id, message_ids):
+        """Delete messages with batched deleteMessages calls, returns deleted count"""
+        ids = []
+        for message_id in message_ids:
+            if message_id and message_id not in ids:
+                ids.append(message_id)
+                self.forget(chat_id, message_id)
+        if not ids:
+            return 0
+
+        deleted = 0
+        for i in range(0, len(ids), DELETE_BATCH_SIZE):
+            chunk = ids[i:i + DELETE_BATCH_SIZE]
+            try:
+                await bot.delete_messages(chat_id=chat_id, message_ids=chunk)
+                deleted += len(chunk)
+            except Exception as e:
+                # Toplu silme başarısız olursa tek tek ama eşzamanlı sil
+                logger.debug(f"Batch delete failed for chat {chat_id}, falling back: {e}")
+                results = await asyncio.gather(
+                    *(bot.delete_message(chat_id=chat_id, message_id=msg_id) for msg_id in chunk),
+                    return_exceptions=True
+                )
+                deleted += sum(1 for result in results if result is True)
+        return deleted
+
+    def schedule_delete(self, bot, chat_id, message_ids):
+        """Delete messages in the background, off the critical path of the caller"""
+        ids = [message_id for message_id in message_ids if message_id]
+        if not ids:
+            return None
+        task = asyncio.get_running_loop().create_task(
+            self._delete_safely(bot, chat_id, ids),
+            name=f"delete_messages_{chat_id}"
+        )
+        # Görev referansını tut, yoksa GC tarafından toplanabilir
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _delete_safely(self, bot, chat_id, message_ids):
+        try:
+            return await self.delete_now(bot, chat_id, message_ids)
+        except Exception as e:
+            logger.error(f"Error deleting messages in chat {chat_id}: {e}")
+            return 0
+
+
+def message_id_of(value):
+    """Accept either a message ID or a Message object stored in user_data"""
+    if hasattr(value, 'message_id'):
+        return value.message_id
+    if isinstance(value, int):
+        return value
+    return None
+
+
+# Tüm handler modülleri aynı takipçiyi kullanır
+message_tracker = MessageTracker()
@@ -0,0 +1,248 @@
+import re
+import time
+import asyncio
+import inspect
+import functools
+import threading
+import logging
+from bisect import bisect_left
+from typing import Optional, Callable, Dict, List, Tuple
+
+from telegram.ext import ConversationHandler
+from telegram.request import HTTPXRequest
+
+from .http_server import MiniHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Saniye cinsinden histogram sınırları (Prometheus varsayılanlarına yakın)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Aile başına en fazla bu kadar etiket; fazlası "other" altında toplanır
+MAX_SERIES = 200
+
+# Histogram aileleri: ad -> (etiket adı, açıklama)
+FAMILIES = {
+    'bot_handler': ('route', 'Update handler latency by callback route'),
+    'db_query': ('query', 'Database method latency by method name'),
+    'telegram_api': ('method', 'Outbound Bot API call latency by API method'),
+}
+
+# Kupon kodu, sipariş no gibi değişken kısımlar: "use_coupon_AB12CD" -> "use_coupon"
+ROUTE_ID_RE = re.compile(r'(_[^_]*\d[^_]*)+$')
+
+
+class Histogram:
+    __slots__ = ('counts', 'total', 'count', 'errors')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.errors = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bucket bound holding the q-th observation (inf past the last bucket)"""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class Metrics:
+    """
+    In-process latency histograms, error counters and gauges
+
+    Rendered in the Prometheus text format for /metrics and summarized for
+    the admin /perf report.
+    """
+
+    def __init__(self):
+        self._series: Dict[str, Dict[str, Histogram]] = {name: {} for name in FAMILIES}
+        self._gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def _get(self, family: str, label: str) -> Histogram:
+        series = self._series[family]
+        histogram = series.get(label)
+        if histogram is None:
+            if len(series) >= MAX_SERIES:
+                label = 'other'
+            histogram = series.setdefault(label, Histogram())
+        return histogram
+
+    def observe(self, family: str, label: str, seconds: float, error: bool = False):
+        with self._lock:
+            histogram = self._get(family, label)
+            histogram.observe(seconds)
+            if error:
+                histogram.errors += 1
+
+    def gauge(self, name: str, help_text: str, fn: Callable[[], float]):
+        """Register a gauge read at scrape time"""
+        self._gauges[name] = (help_text, fn)
+
+    def reset(self):
+        with self._lock:
+            for series in self._series.values():
+                series.clear()
+            self.started_at = time.time()
+
+    def top(self, family: str, limit: int = 5) -> List[Tuple[str, Histogram]]:
+        """Series of a family ordered by total time spent"""
+        with self._lock:
+            items = list(self._series[family].items())
+        return sorted(items, key=lambda item: item[1].total, reverse=True)[:limit]
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for family, series in self._series.items():
+                label_name, help_text = FAMILIES[family]
+                lines.append(f"# HELP {family}_seconds {help_text}")
+                lines.append(f"# TYPE {family}_seconds histogram")
+                for label, histogram in sorted(series.items()):
+                    label_value = label.replace('\\', '\\\\').replace('"', '\\"')
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + (float('inf'),), histogram.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f'{family}_seconds_bucket{{{label_name}="{label_value}",le="{le}"}} {cumulative}')
+                    lines.append(f'{family}_seconds_sum{{{label_name}="{label_value}"}} {histogram.total:.6f}')
+                    lines.append(f'{family}_seconds_count{{{label_name}="{label_value}"}} {histogram.count}')
+                lines.append(f"# HELP {family}_errors_total Errors by {label_name}")
+                lines.append(f"# TYPE {family}_errors_total counter")
+                for label, histogram in sorted(series.items()):
+                    label_value = label.replace('\\', '\\\\').replace('"', '\\"')
+                    lines.append(f'{family}_errors_total{{{label_name}="{label_value}"}} {histogram.errors}')
+        for name, (help_text, fn) in self._gauges.items():
+            try:
+                value = fn()
+            except Exception as e:
+                logger.error(f"Error reading gauge {name}: {e}")
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+def callback_route(update) -> Optional[str]:
+    """Stable route name for a callback query, without per-item ids"""
+    query = getattr(update, 'callback_query', None)
+    if query is None or not query.data:
+        return None
+    return ROUTE_ID_RE.sub('', query.data.split(':', 1)[0]) or query.data[:32]
+
+
+def _timed_handler(callback):
+    name = getattr(callback, '__name__', 'handler')
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        route = callback_route(update) or name
+        started = time.perf_counter()
+        error = False
+        try:
+            result = callback(update, context)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        except BaseException as e:
+            error = not isinstance(e, asyncio.CancelledError)
+            raise
+        finally:
+            metrics.observe('bot_handler', route, time.perf_counter() - started, error)
+
+    wrapper.__metrics_wrapped__ = True
+    return wrapper
+
+
+def instrument_handlers(application):
+    """Time every registered handler callback, including conversation states"""
+    def wrap(handler):
+        if isinstance(handler, ConversationHandler):
+            for child in handler.entry_points + handler.fallbacks:
+                wrap(child)
+            for state_handlers in handler.states.values():
+                for child in state_handlers:
+                    wrap(child)
+        elif not getattr(handler.callback, '__metrics_wrapped__', False):
+            handler.callback = _timed_handler(handler.callback)
+
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            wrap(handler)
+
+
+def instrument_methods(cls, family: str = 'db_query'):
+    """Time every public method of a class, labelled by method name"""
+    for name, method in list(vars(cls).items()):
+        if name.startswith('_') or not inspect.isfunction(method):
+            continue
+        if getattr(method, '__metrics_wrapped__', False):
+            continue
+
+        def make(name, method):
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                error = False
+                try:
+                    return method(*args, **kwargs)
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    metrics.observe(family, name, time.perf_counter() - started, error)
+
+            wrapper.__metrics_wrapped__ = True
+            return wrapper
+
+        setattr(cls, name, make(name, method))
+
+
+class TimedRequest(HTTPXRequest):
+    """HTTPXRequest that records latency and failures per Bot API method"""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        api_method = url.rsplit('/', 1)[-1]
+        started = time.perf_counter()
+        error = True
+        try:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+            error = code >= 400
+            return code, payload
+        finally:
+            metrics.observe('telegram_api', api_method, time.perf_counter() - started, error)
+
+
+class MetricsServer(MiniHTTPServer):
+    """Serves metrics.render() at /metrics for a local Prometheus scraper"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 9464):
+        super().__init__(host, port)
+
+    async def start(self):
+        await super().start()
+        logger.info(f"Metrics endpoint listening on {self.host}:{self.port}/metrics")
+
+    def respond(self, writer, method: str, path: str, headers: Dict[str, str], keep_alive: bool):
+        if method != 'GET':
+            self._write(writer, 405, {'Allow': 'GET'}, b'', keep_alive)
+        elif path != '/metrics':
+            self._write(writer, 404, {}, b'', keep_alive)
+        else:
+            self._write(writer, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'},
+                        metrics.render().encode('utf-8'), keep_alive)
@@ -0,0 +1,139 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import Optional, Dict, Any
+
+from telegram import InlineKeyboardMarkup
+from telegram.error import RetryAfter, Forbidden, BadRequest
+
+from .media_store import media_store
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationDispatcher:
+    """
+    Drains the notification outbox in the background
+
+    Messages are leased from the outbox, sent and marked as sent. Temporary
+    Telegram/network errors are retried with exponential backoff; blocked
+    users and invalid requests are marked as failed. wake() lets a handler
+    trigger delivery right after it commits a transaction.
+    """
+
+    def __init__(self, batch_size: int = 20, max_attempts: int = 8, base_delay: float = 5,
+                 max_delay: float = 3600, poll_interval: float = 30, purge_interval: float = 6 * 60 * 60):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.purge_interval = purge_interval
+        self._wakeup: Optional[asyncio.Event] = None
+        self._last_purge = 0.0
+
+    def wake(self):
+        """Deliver pending messages now instead of at the next poll"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** max(attempts - 1, 0)))
+        return delay * random.uniform(0.8, 1.2)
+
+    async def run(self, bot, outbox):
+        """Dispatch loop, runs until cancelled"""
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                while await self.dispatch_once(bot, outbox) >= self.batch_size:
+                    pass
+                if time.monotonic() - self._last_purge > self.purge_interval:
+                    self._last_purge = time.monotonic()
+                    purged = outbox.purge_sent()
+                    if purged:
+                        logger.info(f"Purged {purged} delivered notifications from outbox")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in notification dispatcher: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def dispatch_once(self, bot, outbox) -> int:
+        """Send one batch of due messages, returns how many were claimed"""
+        messages = outbox.claim_due(self.batch_size)
+        if messages:
+            await asyncio.gather(*(self._deliver(bot, outbox, message) for message in messages))
+        return len(messages)
+
+    async def _deliver(self, bot, outbox, message: Dict[str, Any]):
+        try:
+            sent = await self._send(bot, outbox, message)
+        except RetryAfter as e:
+            retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+            logger.warning(f"Flood limit while sending notification {message['key']}, retrying in {retry_after}s")
+            outbox.mark_retry(message['id'], float(retry_after) + 1, str(e))
+            return
+        except (Forbidden, BadRequest) as e:
+            # Kullanıcı botu engellemiş veya istek geçersiz: tekrar denemenin anlamı yok
+            logger.error(f"Notification {message['key']} to {message['chat_id']} failed permanently: {e}")
+            outbox.mark_failed(message['id'], str(e))
+            return
+        except Exception as e:
+            if message['attempts'] >= self.max_attempts:
+                logger.error(f"Notification {message['key']} failed after {message['attempts']} attempts: {e}")
+                outbox.mark_failed(message['id'], str(e))
+            else:
+                delay = self._backoff(message['attempts'])
+                logger.warning(f"Notification {message['key']} failed ({e}), retrying in {delay:.0f}s")
+                outbox.mark_retry(message['id'], delay, str(e))
+            return
+
+        outbox.mark_sent(message['id'], sent.message_id if sent else None)
+        if sent and message['replace_previous']:
+            outbox.db.store_user_last_notification(message['chat_id'], sent.message_id)
+        if message['remove_photo'] and message['photo_path']:
+            # Konum teslim edildi: dosyanın referansı bırakılır
+            await media_store.release(outbox.db, message['photo_path'])
+        logger.info(f"Delivered notification {message['key']} to user {message['chat_id']}")
+
+    async def _send(self, bot, outbox, message: Dict[str, Any]):
+        chat_id = message['chat_id']
+        reply_markup = None
+        if message['reply_markup']:
+            reply_markup = InlineKeyboardMarkup.de_json(message['reply_markup'], bot)
+
+        if message['replace_previous']:
+            previous_message_id = outbox.db.get_user_last_notification(chat_id)
+            if previous_message_id:
+                try:
+                    await bot.delete_message(chat_id=chat_id, message_id=previous_message_id)
+                except Exception as e:
+                    logger.debug(f"Could not delete previous notification: {e}")
+
+        photo_path = message['photo_path']
+        if photo_path and os.path.exists(photo_path):
+            with open(photo_path, 'rb') as photo:
+                return await bot.send_photo(
+                    chat_id=chat_id,
+                    photo=photo,
+                    caption=message['text'],
+                    reply_markup=reply_markup
+                )
+        if photo_path:
+            logger.warning(f"Notification photo missing, sending text only: {photo_path}")
+        return await bot.send_message(
+            chat_id=chat_id,
+            text=message['text'],
+            reply_markup=reply_markup
+        )
+
+
+notification_dispatcher = NotificationDispatcher()
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+from typing import Optional, List, Callable, Awaitable, Any
+
+from .chain_providers import ChainProvider
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentWatcher:
+    """
+    Polls the chain provider and completes orders that were paid on chain
+
+    Every cycle collects the wallets of all pending orders with one query,
+    asks the provider for their transfers in one batch, stores new transfers
+    and pairs them with orders by wallet, amount and time window. A matched
+    order goes through the same transactional transition as a manual
+    approval, so stock, location and user notification are handled alike.
+    """
+
+    def __init__(self, provider: ChainProvider, interval: float = 60, window: int = 24 * 60 * 60,
+                 tolerance: float = 0.01, notify: Optional[Callable] = None,
+                 on_result: Optional[Callable[[Any, str, float], Awaitable[None]]] = None):
+        self.provider = provider
+        self.interval = interval
+        self.window = window
+        self.tolerance = tolerance
+        # notify(request, result) -> OutboxMessage, transition ile aynı transaction'da yazılır
+        self.notify = notify
+        # on_result(result, tx_id, amount): admin bildirimi vb.
+        self.on_result = on_result
+
+    async def poll_once(self, db) -> List[Any]:
+        """One watch cycle, returns the transition results of matched orders"""
+        targets = db.chain_payments.get_watch_targets(self.window)
+        if not targets:
+            return []
+
+        transfers = await asyncio.to_thread(self.provider.fetch_transfers, targets)
+        if transfers:
+            new = db.chain_payments.record_transfers(transfers)
+            if new:
+                logger.info(f"Payment watcher: {new} new transfers from {self.provider.name}")
+
+        results = []
+        for tx_id, request_id, amount in db.chain_payments.find_matches(self.window, self.tolerance):
+            request = db.get_purchase_request(request_id)
+            if not request:
+                continue
+            notify = None
+            if self.notify:
+                notify = lambda result, request=request: [self.notify(request, result)]
+            result = db.transition_purchase_request(request_id, 'completed', notify=notify)
+
+            if result.ok:
+                db.chain_payments.mark_transfer(tx_id, 'matched', request_id)
+                logger.info(f"Order #{request_id} auto-approved by transfer {tx_id} ({amount} USDT)")
+            else:
+                # Ödeme geldi ama sipariş tamamlanamadı (ör. stok yok): admin karar versin
+                db.chain_payments.mark_transfer(tx_id, 'review', request_id)
+                logger.warning(f"Transfer {tx_id} matched order #{request_id} but it could not be completed: {result.reason}")
+            results.append(result)
+
+            if self.on_result:
+                try:
+                    await self.on_result(result, tx_id, amount)
+                except Exception as e:
+                    logger.error(f"Error in payment watcher callback: {e}")
+        return results
+
+    async def run(self, db, on_cycle: Optional[Callable[[], None]] = None):
+        """Watch loop, runs until cancelled"""
+        logger.info(f"Payment watcher started with provider {self.provider.name}")
+        while True:
+            try:
+                results = await self.poll_once(db)
+                if results and on_cycle:
+                    on_cycle()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in payment watcher: {e}")
+            await asyncio.sleep(self.interval)
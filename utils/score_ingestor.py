@@ -0,0 +1,63 @@
+import asyncio
+import logging
+from typing import Optional, List, Tuple
+
+from database.scores import ScoreResult
+
+logger = logging.getLogger(__name__)
+
+
+class ScoreIngestor:
+    """
+    Group-commits submitted game scores
+
+    Scores arriving within flush_interval of each other are validated and
+    written in a single transaction (one fsync) instead of one commit per
+    game. Callers await their own result, which is resolved only after the
+    batch is committed.
+    """
+
+    def __init__(self, flush_interval: float = 0.005, max_batch: int = 200):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending: List[Tuple[Tuple[int, str, int], asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._db = None
+
+    @property
+    def pending(self) -> int:
+        """Scores waiting for the next batch commit"""
+        return len(self._pending)
+
+    async def submit(self, db, user_id: int, session_id: str, score: int) -> ScoreResult:
+        """Queue a score and wait until its batch is committed"""
+        self._db = db
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(((user_id, session_id, score), future))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+        return await future
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self.flush()
+
+    def flush(self):
+        """Write everything queued so far"""
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            results = self._db.scores.record_batch([item for item, _ in batch])
+        except Exception as e:
+            logger.error(f"Error flushing score batch: {e}")
+            results = [ScoreResult(False, item[2], reason='error') for item, _ in batch]
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+        logger.debug(f"Committed {len(batch)} game scores in one batch")
+
+
+score_ingestor = ScoreIngestor()
@@ -0,0 +1,209 @@
+import os
+import re
+import sys
+import gzip
+import asyncio
+import hashlib
+import logging
+from typing import Optional, Dict, NamedTuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from .http_server import MiniHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Oyunun sesleri bu CDN'den geliyordu; indirilmiş kopyaları Static/sounds/ altında tutulur
+SOUND_URL_RE = re.compile(r"https://assets\.mixkit\.co/active_storage/sfx/\d+/([\w-]+\.mp3)")
+STYLE_RE = re.compile(r"<style>(.*?)</style>", re.S)
+SCRIPT_RE = re.compile(r"<script>(.*?)</script>", re.S)
+
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.js': 'application/javascript; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.mp3': 'audio/mpeg',
+}
+COMPRESSIBLE = ('.html', '.js', '.css')
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+# Sayfanın kendisi her açılışta ETag ile doğrulanır (değişmediyse 304)
+REVALIDATE_CACHE = 'no-cache'
+
+
+class Asset(NamedTuple):
+    body: bytes
+    content_type: str
+    # Kodlamasız gövdenin ETag'i; gzip/br gövdeleri "-gz"/"-br" ekli kendi ETag'lerini alır
+    etag: str
+    cache_control: str
+    gzip: Optional[bytes] = None
+    br: Optional[bytes] = None
+
+
+def _make_asset(body: bytes, ext: str, immutable: bool) -> Asset:
+    etag = hashlib.sha256(body).hexdigest()[:16]
+    gzipped = compressed = None
+    if ext in COMPRESSIBLE:
+        gzipped = gzip.compress(body, 9, mtime=0)
+        if brotli is not None:
+            compressed = brotli.compress(body, quality=11)
+    return Asset(
+        body, CONTENT_TYPES[ext], etag,
+        IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE,
+        gzipped if gzipped and len(gzipped) < len(body) else None,
+        compressed if compressed and len(compressed) < len(body) else None
+    )
+
+
+def _hashed_name(name: str, body: bytes) -> str:
+    stem, ext = os.path.splitext(name)
+    return f"assets/{stem}.{hashlib.sha256(body).hexdigest()[:10]}{ext}"
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    # If-None-Match zayıf karşılaştırma kullanır: W/ öneki yok sayılır
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in (tag[2:] if tag.startswith('W/') else tag for tag in tags)
+
+
+def build_site(static_dir: str = 'Static', page: str = 'game.html') -> Dict[str, Asset]:
+    """
+    Split the game page into content-hashed assets
+
+    Inline CSS and JS become assets/game.<hash>.css/.js, and vendored sounds
+    replace the CDN URLs. References are relative to the page, so the site
+    also works under a path prefix (GAME_BASE_URL or a reverse proxy).
+    Every asset is precompressed once, at startup.
+    """
+    with open(os.path.join(static_dir, page), encoding='utf-8') as f:
+        html = f.read()
+    assets: Dict[str, Asset] = {}
+
+    def add(name: str, body: bytes) -> str:
+        path = _hashed_name(name, body)
+        assets['/' + path] = _make_asset(body, os.path.splitext(name)[1], immutable=True)
+        return path
+
+    def vendor_sound(match: re.Match) -> str:
+        local = os.path.join(static_dir, 'sounds', match.group(1))
+        if not os.path.exists(local):
+            # İndirilmemiş ses CDN'den yüklenmeye devam eder
+            return match.group(0)
+        with open(local, 'rb') as f:
+            return add(match.group(1), f.read())
+
+    style = STYLE_RE.search(html)
+    if style:
+        css_path = add('game.css', style.group(1).encode('utf-8'))
+        html = html[:style.start()] + f'<link rel="stylesheet" href="{css_path}">' + html[style.end():]
+
+    script = SCRIPT_RE.search(html)
+    if script:
+        js = SOUND_URL_RE.sub(vendor_sound, script.group(1))
+        js_path = add('game.js', js.encode('utf-8'))
+        html = html[:script.start()] + f'<script src="{js_path}"></script>' + html[script.end():]
+
+    page_asset = _make_asset(html.encode('utf-8'), '.html', immutable=False)
+    assets['/' + page] = page_asset
+    assets['/'] = page_asset
+    return assets
+
+
+def vendor_sounds(static_dir: str = 'Static', page: str = 'game.html') -> int:
+    """
+    Download the CDN sounds used by the page into static_dir/sounds
+
+    Already downloaded files are skipped, so this is cheap to run on every
+    start. A failed download is logged and that sound keeps its CDN URL.
+    """
+    import requests
+
+    with open(os.path.join(static_dir, page), encoding='utf-8') as f:
+        html = f.read()
+    target_dir = os.path.join(static_dir, 'sounds')
+    os.makedirs(target_dir, exist_ok=True)
+    downloaded = 0
+    for match in SOUND_URL_RE.finditer(html):
+        target = os.path.join(target_dir, match.group(1))
+        if os.path.exists(target):
+            continue
+        try:
+            response = requests.get(match.group(0), timeout=30)
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Could not vendor sound {match.group(1)}, it will load from the CDN: {e}")
+            continue
+        # Yarım kalan indirme build_site tarafından geçerli dosya sanılmasın
+        with open(target + '.part', 'wb') as f:
+            f.write(response.content)
+        os.replace(target + '.part', target)
+        downloaded += 1
+    return downloaded
+
+
+class StaticServer(MiniHTTPServer):
+    """
+    HTTP server for the game web app
+
+    Serves the prebuilt assets from memory: GET/HEAD only, keep-alive,
+    ETag/If-None-Match revalidation and br/gzip negotiation.
+    """
+
+    def __init__(self, static_dir: str = 'Static', host: str = '0.0.0.0', port: int = 8080):
+        super().__init__(host, port)
+        self.static_dir = static_dir
+        self.assets: Dict[str, Asset] = {}
+
+    async def start(self):
+        # Sesler ilk açılışta indirilir; sonraki açılışlarda diskteki kopyalar kullanılır
+        try:
+            downloaded = await asyncio.to_thread(vendor_sounds, self.static_dir)
+            if downloaded:
+                logger.info(f"Vendored {downloaded} game sounds")
+        except Exception as e:
+            logger.warning(f"Could not vendor game sounds: {e}")
+        self.assets = await asyncio.to_thread(build_site, self.static_dir)
+        await super().start()
+        logger.info(f"Game server listening on {self.host}:{self.port} ({len(self.assets)} assets)")
+
+    def respond(self, writer, method: str, path: str, headers: Dict[str, str], keep_alive: bool):
+        if method not in ('GET', 'HEAD'):
+            self._write(writer, 405, {'Allow': 'GET, HEAD'}, b'', keep_alive)
+            return
+        asset = self.assets.get(path)
+        if asset is None:
+            self._write(writer, 404, {}, b'', keep_alive, head=method == 'HEAD')
+            return
+
+        body, encoding = asset.body, None
+        accepted = headers.get('accept-encoding', '')
+        if asset.br and 'br' in accepted:
+            body, encoding = asset.br, 'br'
+        elif asset.gzip and 'gzip' in accepted:
+            body, encoding = asset.gzip, 'gzip'
+        # Her kodlamanın gövdesi farklı olduğundan güçlü ETag'i de farklıdır
+        etag = {None: f'"{asset.etag}"', 'gzip': f'"{asset.etag}-gz"', 'br': f'"{asset.etag}-br"'}[encoding]
+
+        response_headers = {
+            'Content-Type': asset.content_type,
+            'Cache-Control': asset.cache_control,
+            'ETag': etag,
+            'Vary': 'Accept-Encoding',
+        }
+        if _etag_matches(etag, headers.get('if-none-match', '')):
+            self._write(writer, 304, response_headers, b'', keep_alive)
+            return
+
+        if encoding:
+            response_headers['Content-Encoding'] = encoding
+        self._write(writer, 200, response_headers, body, keep_alive, head=method == 'HEAD')
+
+
+if __name__ == '__main__':
+    # python -m utils.static_server vendor : sesleri Static/sounds altına indir
+    if len(sys.argv) > 1 and sys.argv[1] == 'vendor':
+        print(f"{vendor_sounds()} sounds downloaded")
@@ -0,0 +1,137 @@
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+# Silinmek üzere takip edilen mesaj ID alanları
+MESSAGE_ID_FIELDS = (
+    'menu_message_id', 'last_bot_message_id', 'current_message_id',
+    'password_message_id', 'last_payment_message_id', 'payment_prev_message_id'
+)
+
+
+class UserState:
+    """Compact per-user record, only IDs and timestamps"""
+    __slots__ = (
+        'user_id', 'last_payment_message_id', 'adding_to_cart', 'menu_message_id',
+        'last_bot_message_id', 'current_message_id', 'password_message_id',
+        'payment_prev_message_id', 'discount_coupon_id', 'last_seen'
+    )
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.last_payment_message_id = None
+        self.adding_to_cart = None
+        self.menu_message_id = None
+        self.last_bot_message_id = None
+        self.current_message_id = None
+        self.password_message_id = None
+        self.payment_prev_message_id = None
+        # Sepete uygulanan kuponun ID'si; oran ve kod kupon önbelleğinden okunur
+        self.discount_coupon_id = None
+        self.last_seen = time.monotonic()
+
+    def pop_message_ids(self, fields=MESSAGE_ID_FIELDS):
+        """Clear the given message ID fields and return the IDs that were set"""
+        message_ids = [getattr(self, field) for field in fields if getattr(self, field)]
+        for field in fields:
+            setattr(self, field, None)
+        return message_ids
+
+
+class UserStateStore:
+    """LRU store of UserState records with idle-timeout eviction and a size cap"""
+
+    def __init__(self, idle_timeout=6 * 60 * 60, max_users=10000):
+        self.idle_timeout = idle_timeout
+        self.max_users = max_users
+        self._states = OrderedDict()
+
+    def __len__(self):
+        return len(self._states)
+
+    def __contains__(self, user_id):
+        return user_id in self._states
+
+    def get(self, user_id):
+        """Return the user's record, creating it if needed, and mark it as recently used"""
+        state = self._states.get(user_id)
+        if state is None:
+            state = UserState(user_id)
+            self._states[user_id] = state
+            self._enforce_cap()
+        else:
+            state.last_seen = time.monotonic()
+            self._states.move_to_end(user_id)
+        return state
+
+    def touch(self, user_id):
+        """Mark a user as active"""
+        self.get(user_id)
+
+    def pop(self, user_id):
+        return self._states.pop(user_id, None)
+
+    # Kalıcılık için kaydedilen alanlar (last_seen hariç); yeni alanlar sona eklenir,
+    # eski kısa anlık görüntüler zip ile yine yüklenir
+    PERSISTED_FIELDS = (
+        'last_payment_message_id', 'adding_to_cart', 'menu_message_id', 'last_bot_message_id',
+        'current_message_id', 'password_message_id', 'payment_prev_message_id', 'discount_coupon_id'
+    )
+
+    def snapshot(self, user_id):
+        """Return the persisted fields of a user's record as a tuple"""
+        state = self._states.get(user_id)
+        if state is None:
+            return None
+        return tuple(getattr(state, field) for field in self.PERSISTED_FIELDS)
+
+    def restore(self, user_id, values):
+        """Restore a record from a snapshot tuple"""
+        state = self.get(user_id)
+        if not values:
+            return
+        for field, value in zip(self.PERSISTED_FIELDS, values):
+            setattr(state, field, value)
+
+    def _enforce_cap(self):
+        while len(self._states) > self.max_users:
+            user_id, _ = self._states.popitem(last=False)
+            logger.debug(f"User state evicted (memory cap): {user_id}")
+
+    def evict_idle(self):
+        """Drop records idle longer than idle_timeout, returns evicted user IDs"""
+        cutoff = time.monotonic() - self.idle_timeout
+        evicted = []
+        # OrderedDict en eski kullanılandan başlar, ilk aktif kayıtta dur
+        for user_id, state in self._states.items():
+            if state.last_seen >= cutoff:
+                break
+            evicted.append(user_id)
+        for user_id in evicted:
+            del self._states[user_id]
+        return evicted
+
+
+def evict_stale_user_data(application, store, tracker=None):
+    """Evict idle records and free PTB user_data/chat_data of users no longer in the store"""
+    evicted = store.evict_idle()
+    dropped = 0
+    for user_id in list(application.user_data.keys()):
+        if user_id not in store:
+            application.drop_user_data(user_id)
+            dropped += 1
+    for chat_id in list(application.chat_data.keys()):
+        # Özel sohbetlerde chat_id == user_id
+        if chat_id > 0 and chat_id not in store:
+            application.drop_chat_data(chat_id)
+    if tracker is not None:
+        for user_id in evicted:
+            tracker.pop_all(user_id)
+    return len(evicted), dropped
+
+
+# Tüm handler modülleri aynı depoyu kullanır, ayarlar bot.py içinde config'den verilir
+user_states = UserStateStore()
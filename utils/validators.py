@@ -1,3 +1,12 @@
+import re
+import hashlib
+from typing import List, Tuple, Optional
+
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+TRC20_ADDRESS_RE = re.compile(r'T[1-9A-HJ-NP-Za-km-z]{33}')
+# Toplu içe aktarmada satırdaki alanlar (CSV, noktalı virgül veya boşluk)
+FIELD_SEPARATOR_RE = re.compile(r'[,;\s]+')
+
 def validate_trc20_address(address: str) -> bool:
     """Validate TRC20 wallet address format"""
     if not isinstance(address, str):
@@ -15,4 +24,39 @@ def validate_trc20_address(address: str) -> bool:
     if not all(c in valid_chars for c in address[1:]):
         return False
         
-    return True
\ No newline at end of file
+    return True
+
+
+def _base58_checksum_ok(address: str) -> bool:
+    """Tron addresses are base58check encoded: 0x41 + 20 bytes + 4 byte checksum"""
+    number = 0
+    for char in address:
+        number = number * 58 + BASE58_ALPHABET.index(char)
+    raw = number.to_bytes(25, 'big')
+    return raw[0] == 0x41 and hashlib.sha256(hashlib.sha256(raw[:21]).digest()).digest()[:4] == raw[21:]
+
+
+def parse_wallet_lines(text: str) -> List[Tuple[int, str, Optional[str]]]:
+    """
+    Parse a pasted list or CSV of wallet addresses
+
+    Returns (line number, address, error) for every non-empty line; the
+    address is the first field that looks like one (so CSV exports with an
+    extra column work) and error is None when it is a valid TRC20 address.
+    A header line without any address is skipped.
+    """
+    results = []
+    for line_no, line in enumerate(text.splitlines(), 1):
+        fields = [f.strip('"\'') for f in FIELD_SEPARATOR_RE.split(line.strip()) if f]
+        if not fields:
+            continue
+        address = next((f for f in fields if TRC20_ADDRESS_RE.fullmatch(f)), None)
+        if address is None:
+            if line_no == 1 and not any(f.startswith('T') for f in fields):
+                continue
+            results.append((line_no, fields[0], 'format'))
+        elif not _base58_checksum_ok(address):
+            results.append((line_no, address, 'checksum'))
+        else:
+            results.append((line_no, address, None))
+    return results